@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Check that the analysis and report writing of the Convergence class scale
+linearly with the number of grids. Run from the command line:
+
+    python benchmarks/bench_scaling.py [max_grids]
+
+The time per grid is printed for each series length, along with the slope
+of log(time) against log(grids) between successive lengths, which should be
+close to one. The script exits with an error if the slope of the longest
+series exceeds the given limit.
+"""
+
+import argparse
+import math
+import sys
+import time
+import warnings
+
+from convergence import Convergence
+
+
+def make_grids(n_grids):
+    
+    # Smoothly converging values on slowly growing grid spacings
+    grids = []
+    
+    for i in range(n_grids):
+        spacing = 1. + 10. * i / n_grids
+        grids.append((spacing, 1. + 0.01 * spacing ** 1.5))
+    
+    return grids
+
+
+def time_convergence(n_grids, repeats=3):
+    
+    grids = make_grids(n_grids)
+    
+    analysis = report = float("inf")
+    
+    for _ in range(repeats):
+        
+        convergence = Convergence()
+        
+        start = time.perf_counter()
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            convergence.add_grids(grids)
+        
+        middle = time.perf_counter()
+        str(convergence)
+        end = time.perf_counter()
+        
+        analysis = min(analysis, middle - start)
+        report = min(report, end - middle)
+    
+    return analysis, report
+
+
+def main(max_grids=100000, max_slope=1.3):
+    
+    n_grids = 10
+    last = None
+    slope = None
+    
+    print("%10s %16s %16s %8s" % ("grids",
+                                  "analysis (us)",
+                                  "report (us)",
+                                  "slope"))
+    
+    while n_grids <= max_grids:
+        
+        repeats = 3 if n_grids < 10000 else 1
+        analysis, report = time_convergence(n_grids, repeats)
+        total = analysis + report
+        
+        if last is None:
+            slope_str = ""
+        else:
+            slope = (math.log(total / last[1]) /
+                     math.log(float(n_grids) / last[0]))
+            slope_str = "%8.2f" % slope
+        
+        print("%10d %16.2f %16.2f %s" % (n_grids,
+                                         1e6 * analysis / n_grids,
+                                         1e6 * report / n_grids,
+                                         slope_str))
+        
+        last = (n_grids, total)
+        n_grids *= 10
+    
+    if slope is not None and slope > max_slope:
+        sys.exit("Scaling is worse than linear: slope = %.2f" % slope)
+    
+    return
+
+
+if __name__ == "__main__":
+    
+    parser = argparse.ArgumentParser(description="Convergence scaling "
+                                                 "benchmark")
+    parser.add_argument("max_grids",
+                        type=int,
+                        nargs="?",
+                        default=100000,
+                        help="largest number of grids to examine")
+    parser.add_argument("--max-slope",
+                        type=float,
+                        default=1.3,
+                        help="largest acceptable log-log slope")
+    
+    args = parser.parse_args()
+    
+    main(args.max_grids, args.max_slope)
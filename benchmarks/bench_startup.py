@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Check the start up time of the package and the command line interface, which
+matters when the CLI is called from shell loops or the package is imported by
+worker processes. Run from the command line:
+
+    python benchmarks/bench_startup.py [repeats]
+
+The best time over the repeats is printed for a bare interpreter, for
+"import convergence" and for "grid-convergence --help", along with the
+overhead of the last two over the bare interpreter. The script exits with an
+error if an overhead exceeds the given limit or if "import convergence"
+loads modules that should only be imported on demand.
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+# Modules that must not be loaded by "import convergence"
+LAZY_MODULES = ("argparse",
+                "numpy",
+                "convergence.functions",
+                "convergence.interface",
+                "convergence.tables")
+
+COMMANDS = (("python", "pass"),
+            ("import convergence", "import convergence"),
+            ("grid-convergence --help",
+             "import sys; sys.argv = ['grid-convergence', '--help']; "
+             "from convergence.interface import cl_interface; "
+             "cl_interface()"))
+
+
+def time_command(code, repeats):
+    
+    best = float("inf")
+    
+    for _ in range(repeats):
+        
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code],
+                       check=True,
+                       stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    
+    return best
+
+
+def get_loaded_modules():
+    
+    code = ("import sys; import convergence; "
+            "print(' '.join(m for m in {!r} if m in sys.modules))".format(
+                                                                LAZY_MODULES))
+    
+    result = subprocess.run([sys.executable, "-c", code],
+                            check=True,
+                            stdout=subprocess.PIPE,
+                            universal_newlines=True)
+    
+    return result.stdout.split()
+
+
+def main(repeats=20, max_import_ms=25., max_help_ms=100.):
+    
+    times = [time_command(code, repeats) for _, code in COMMANDS]
+    base = times[0]
+    
+    print("%24s %12s %14s" % ("command", "time (ms)", "overhead (ms)"))
+    
+    for (name, _), total in zip(COMMANDS, times):
+        print("%24s %12.1f %14.1f" % (name,
+                                      1e3 * total,
+                                      1e3 * (total - base)))
+    
+    errors = []
+    loaded = get_loaded_modules()
+    
+    if loaded:
+        errors.append("import convergence loads: %s" % ", ".join(loaded))
+    
+    for (name, _), total, limit in zip(COMMANDS[1:],
+                                       times[1:],
+                                       (max_import_ms, max_help_ms)):
+        
+        overhead = 1e3 * (total - base)
+        
+        if overhead > limit:
+            errors.append("%s overhead of %.1f ms exceeds %.1f ms" % (name,
+                                                                    overhead,
+                                                                    limit))
+    
+    if errors:
+        sys.exit("\n".join(errors))
+    
+    return
+
+
+if __name__ == "__main__":
+    
+    parser = argparse.ArgumentParser(description="Convergence start up "
+                                                 "benchmark")
+    parser.add_argument("repeats",
+                        type=int,
+                        nargs="?",
+                        default=20,
+                        help="number of times to run each command")
+    parser.add_argument("--max-import-ms",
+                        type=float,
+                        default=25.,
+                        help="largest acceptable import overhead")
+    parser.add_argument("--max-help-ms",
+                        type=float,
+                        default=100.,
+                        help="largest acceptable CLI help overhead")
+    
+    args = parser.parse_args()
+    
+    main(args.repeats, args.max_import_ms, args.max_help_ms)
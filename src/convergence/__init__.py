@@ -18,6 +18,47 @@
 #    You should have received a copy of the GNU General Public License
 #    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
 
-__all__ = ["Convergence", "simple_read"]
+__all__ = ["Convergence", "Diagnostics", "iter_grids", "simple_read"]
 
-from .interface import Convergence, simple_read
+import importlib
+
+# Names are imported from their submodules on first access, so that
+# importing the package (or a single submodule) stays cheap
+_LAZY_NAMES = {"Convergence": "interface",
+               "Diagnostics": "diagnostics",
+               "iter_grids": "interface",
+               "simple_read": "interface"}
+
+_SUBMODULES = ("arrays",
+               "cache",
+               "columnar",
+               "diagnostics",
+               "fields",
+               "functions",
+               "interface",
+               "memo",
+               "norms",
+               "reports",
+               "sets",
+               "sketches",
+               "tables")
+
+
+def __getattr__(name):
+    
+    if name in _LAZY_NAMES:
+        module = importlib.import_module("." + _LAZY_NAMES[name], __name__)
+        value = getattr(module, name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError("module {!r} has no attribute "
+                             "{!r}".format(__name__, name))
+    
+    globals()[name] = value
+    
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_SUBMODULES))
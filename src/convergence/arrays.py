@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+ -- convergence package  -------------------------------------------------------
+
+   Array versions of the calculations in convergence.functions. Many
+   triplets of grids (or many points of a field) are solved together using
+   NumPy. Failures are reported per element rather than raised.
+
+ --------------------------------------------------------------------------
+"""
+
+import numpy as np
+
+from .functions import (CLASS_NAMES,
+                        DEGENERATE,
+                        DEGENERATE_TOL,
+                        DIVERGENT,
+                        MONOTONIC,
+                        OSCILLATORY,
+                        triplet_values)
+
+# Status codes for array solutions
+CONVERGED = 0
+INVALID = 1
+DIVERGED = 2
+
+
+def _as_float_arrays(*args):
+    
+    arrays = [np.asarray(arg, dtype=float) for arg in args]
+    
+    return np.broadcast_arrays(*arrays)
+
+
+def classify_array(value_1, value_2, value_3, rtol=DEGENERATE_TOL):
+    
+    """ Array version of convergence_class. The arguments are broadcast
+    together and an array of the class codes (MONOTONIC, OSCILLATORY,
+    DIVERGENT or DEGENERATE) is returned.
+    """
+    
+    value_1, value_2, value_3 = _as_float_arrays(value_1, value_2, value_3)
+    
+    classes = np.full(value_1.shape, MONOTONIC, dtype=np.int8)
+    
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        
+        epsilon21 = value_2 - value_1
+        epsilon32 = value_3 - value_2
+        ratio = epsilon21 / epsilon32
+        
+        classes[ratio < 0] = OSCILLATORY
+        classes[(np.abs(ratio) >= 1) | (epsilon32 == 0)] = DIVERGENT
+        
+        degenerate = ~(np.isfinite(value_1) &
+                       np.isfinite(value_2) &
+                       np.isfinite(value_3))
+        degenerate |= np.abs(epsilon21) <= rtol * np.maximum(np.abs(value_1),
+                                                             np.abs(value_2))
+    
+    classes[degenerate] = DEGENERATE
+    
+    return classes
+
+
+def order_of_convergence_array(value_1, value_2, value_3, ratio_21, ratio_32,
+                               omega=0.5, tol=1.E-4, max_iter=1e6,
+                               classes=None):
+    
+    """ Calculate the order of convergence for arrays of values generated
+    with three grids of reducing resolution (ie grid_1 is finest). The
+    arguments are broadcast together and all elements are iterated at once
+    using the under-relaxed method of order_of_convergence. Elements are
+    removed from the active set as soon as they converge and elements with a
+    constant refinement ratio are solved without iteration. Degenerate
+    elements (see classify_array) are never iterated. If the classes have
+    already been found they can be given, otherwise they are calculated.
+    
+    Returns an array of p (NaN where no solution was found) and an array of
+    status codes: CONVERGED, INVALID (the scalar function would raise an
+    arithmetic error) or DIVERGED (the scalar function would raise a
+    RuntimeError).
+    """
+    
+    # Set a maximum residual
+    max_res = 1.E6
+    
+    if classes is None: classes = classify_array(value_1, value_2, value_3)
+    
+    (value_1,
+     value_2,
+     value_3,
+     ratio_21,
+     ratio_32,
+     classes) = _as_float_arrays(value_1,
+                                 value_2,
+                                 value_3,
+                                 ratio_21,
+                                 ratio_32,
+                                 classes)
+    
+    shape = value_1.shape
+    p = np.full(value_1.size, np.nan)
+    status = np.full(value_1.size, INVALID, dtype=np.int8)
+    degenerate = classes.ravel() == DEGENERATE
+    
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        
+        # calculate the epsilons.
+        epsilon32 = value_3.ravel() - value_2.ravel()
+        epsilon21 = value_2.ravel() - value_1.ravel()
+        
+        # Calculate the fraction and the signed unit, s
+        epfrac = epsilon32 / epsilon21
+        s = np.sign(epfrac)
+        log_epfrac = np.log(np.abs(epfrac))
+        log_r21 = np.log(ratio_21.ravel())
+        
+        # Initial guess at order of convergence, p
+        p1 = np.abs(log_epfrac) / log_r21
+        
+        # Only iterate the elements that the scalar function would accept
+        valid = np.isfinite(p1) & (s != 0) & ~degenerate
+        
+        # The initial guess is exact for a constant refinement ratio
+        constant = valid & (ratio_21.ravel() == ratio_32.ravel())
+        p[constant] = p1[constant]
+        status[constant] = CONVERGED
+        
+        active = np.flatnonzero(valid & ~constant)
+        p1 = p1[active]
+        s = s[active]
+        log_epfrac = log_epfrac[active]
+        log_r21 = log_r21[active]
+        r21 = ratio_21.ravel()[active]
+        r32 = ratio_32.ravel()[active]
+        residual = np.ones(active.size)
+        
+        iterations = 0
+        
+        while active.size:
+            
+            # Give up on elements that have gone bad
+            if iterations > max_iter:
+                status[active] = DIVERGED
+                break
+            
+            keep = residual <= max_res
+            
+            if not keep.all():
+                status[active[~keep]] = DIVERGED
+                active, p1, s, log_epfrac, log_r21, r21, r32 = (
+                        arr[keep] for arr in (active, p1, s, log_epfrac,
+                                              log_r21, r21, r32))
+                if not active.size: break
+            
+            # Get the last value
+            p0 = p1
+            
+            # Calculate q
+            q = np.log((r21 ** p0 - s) / (r32 ** p0 - s))
+            
+            # Calculate the p iteration
+            pnew = np.abs(log_epfrac + q) / log_r21
+            
+            # Calculate the relaxation step.
+            p1 = (1. - omega) * p0 + omega * pnew
+            
+            residual = p1 - p0
+            
+            iterations += 1
+            
+            # Record converged elements and drop them from the active set
+            finite = np.isfinite(p1)
+            done = finite & (np.abs(residual) <= tol)
+            
+            p[active[done]] = p1[done]
+            status[active[done]] = CONVERGED
+            
+            keep = finite & ~done
+            
+            if not keep.all():
+                active, p1, s, log_epfrac, log_r21, r21, r32, residual = (
+                        arr[keep] for arr in (active, p1, s, log_epfrac,
+                                              log_r21, r21, r32, residual))
+    
+    return p.reshape(shape), status.reshape(shape)
+
+
+def triplet_values_array(value_1, value_2, value_3, ratio_21, ratio_32, p):
+    
+    """ Array version of triplet_values. The arguments are broadcast together
+    and all of the derived quantities are calculated in one pass. Elements
+    where a quantity can not be calculated are NaN or infinite, rather than
+    raising an error.
+    """
+    
+    (value_1,
+     value_2,
+     value_3,
+     ratio_21,
+     ratio_32,
+     p) = _as_float_arrays(value_1,
+                           value_2,
+                           value_3,
+                           ratio_21,
+                           ratio_32,
+                           p)
+    
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        result = triplet_values(value_1,
+                                value_2,
+                                value_3,
+                                ratio_21,
+                                ratio_32,
+                                p)
+    
+    return result
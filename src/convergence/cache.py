@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+ -- convergence package  -------------------------------------------------------
+
+   A persistent cache of the results of Convergence studies, stored in an
+   SQLite database and keyed by a hash of the grids and the settings of the
+   study, so that unchanged studies are not calculated again.
+
+ --------------------------------------------------------------------------
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+from array import array
+from contextlib import contextmanager
+
+# Change this when the stored results or the calculations change
+_VERSION = "3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed INTEGER NOT NULL
+)
+"""
+
+
+class ResultCache(object):
+    """ A persistent cache of Convergence results. The results are stored in
+    an SQLite database at the given path, which defaults to the file
+    "results.sqlite" in the directory given by default_cache_dir. When the
+    total size of the stored results exceeds max_size bytes, the least
+    recently used results are removed. Each access is made in a single
+    transaction, so the cache can be shared by many processes, which wait
+    for up to timeout seconds for the database to be unlocked.
+    """
+    
+    def __init__(self, path=None, max_size=100 * 1024 ** 2, timeout=30.):
+        
+        if path is None:
+            path = os.path.join(default_cache_dir(), "results.sqlite")
+        
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.isdir(cache_dir): os.makedirs(cache_dir)
+        
+        self.path = path
+        self.max_size = max_size
+        
+        # Transactions are started explicitly by _transaction
+        self._connection = sqlite3.connect(path,
+                                           timeout=timeout,
+                                           isolation_level=None)
+        self._connection.execute("PRAGMA busy_timeout = %d" %
+                                                         int(timeout * 1000))
+        
+        with self._transaction():
+            self._connection.execute(_SCHEMA)
+        
+        return
+    
+    def get(self, key):
+        
+        """ Return the bytes stored for the given key, or None. """
+        
+        with self._transaction():
+            
+            row = self._connection.execute("SELECT value FROM results "
+                                           "WHERE key = ?",
+                                           (key,)).fetchone()
+            
+            if row is None: return None
+            
+            self._connection.execute("UPDATE results SET accessed = ? "
+                                     "WHERE key = ?",
+                                     (self._next_access(), key))
+        
+        return bytes(row[0])
+    
+    def set(self, key, blob):
+        
+        """ Store the given bytes for the given key and remove old results
+        if the cache is too large.
+        """
+        
+        with self._transaction():
+            
+            self._connection.execute("INSERT OR REPLACE INTO results "
+                                     "VALUES (?, ?, ?, ?)",
+                                     (key,
+                                      sqlite3.Binary(blob),
+                                      len(blob),
+                                      self._next_access()))
+            
+            self._evict()
+        
+        return
+    
+    def clear(self):
+        
+        with self._transaction():
+            self._connection.execute("DELETE FROM results")
+        
+        return
+    
+    def close(self):
+        
+        self._connection.close()
+        
+        return
+    
+    def size(self):
+        
+        """ Return the total size of the stored results, in bytes. """
+        
+        row = self._connection.execute("SELECT COALESCE(SUM(size), 0) "
+                                       "FROM results").fetchone()
+        
+        return row[0]
+    
+    @contextmanager
+    def _transaction(self):
+        
+        # Take the write lock at the start, so that concurrent processes can
+        # not interleave their reads and updates
+        self._connection.execute("BEGIN IMMEDIATE")
+        
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        
+        self._connection.execute("COMMIT")
+        
+        return
+    
+    def _next_access(self):
+        
+        row = self._connection.execute("SELECT COALESCE(MAX(accessed), 0) "
+                                       "FROM results").fetchone()
+        
+        return row[0] + 1
+    
+    def _evict(self):
+        
+        excess = self.size() - self.max_size
+        
+        if excess <= 0: return
+        
+        # Remove the least recently used results until small enough
+        rows = self._connection.execute("SELECT key, size FROM results "
+                                        "ORDER BY accessed")
+        
+        keys = []
+        
+        for key, size in rows:
+            
+            if excess <= 0: break
+            
+            keys.append((key,))
+            excess -= size
+        
+        self._connection.executemany("DELETE FROM results WHERE key = ?",
+                                     keys)
+        
+        return
+    
+    def __len__(self):
+        
+        row = self._connection.execute("SELECT COUNT(*) "
+                                       "FROM results").fetchone()
+        
+        return row[0]
+
+
+def default_cache_dir():
+    
+    """ Return the directory for the cache, given by the CONVERGENCE_CACHE_DIR
+    environment variable, or the convergence directory within the user's
+    cache directory.
+    """
+    
+    cache_dir = os.environ.get("CONVERGENCE_CACHE_DIR")
+    if cache_dir: return cache_dir
+    
+    base_dir = os.environ.get("XDG_CACHE_HOME",
+                              os.path.join(os.path.expanduser("~"), ".cache"))
+    
+    return os.path.join(base_dir, "convergence")
+
+
+def make_key(grids, f_anal, zero_tol, method):
+    
+    """ Return a hash of the given grids and settings of a study. """
+    
+    if f_anal is not None: f_anal = float(f_anal)
+    
+    content = [_VERSION,
+               [[float(size), float(value)] for size, value in grids],
+               f_anal,
+               float(zero_tol),
+               method]
+    
+    text = json.dumps(content, separators=(',', ':'))
+    
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pack(rows, records):
+    
+    """ Pack rows of floats (or None) of equal length, and a list of records
+    which can be serialised as JSON, into bytes. The floats are stored in
+    binary, in the byte order of this machine.
+    """
+    
+    n_columns = len(rows[0]) if rows else 0
+    values = array('d')
+    missing = bytearray()
+    
+    for row in rows:
+        values.extend([0. if value is None else value for value in row])
+        missing.extend([value is None for value in row])
+    
+    header = json.dumps({"rows": len(rows),
+                         "columns": n_columns,
+                         "records": records},
+                        separators=(',', ':')).encode("utf-8")
+    
+    return b"".join([struct.pack("<I", len(header)),
+                     header,
+                     bytes(missing),
+                     values.tobytes()])
+
+
+def unpack(blob):
+    
+    """ Unpack bytes created by pack, returning the rows and records. """
+    
+    header_size, = struct.unpack_from("<I", blob)
+    start = 4 + header_size
+    header = json.loads(blob[4:start].decode("utf-8"))
+    
+    n_values = header["rows"] * header["columns"]
+    missing = blob[start:start + n_values]
+    
+    values = array('d')
+    values.frombytes(blob[start + n_values:])
+    values = [None if flag else value
+                            for value, flag in zip(values.tolist(), missing)]
+    
+    n_columns = max(header["columns"], 1)
+    rows = [values[i:i + n_columns] for i in range(0, n_values, n_columns)]
+    
+    return rows, header["records"]
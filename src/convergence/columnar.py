@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+ -- convergence package  -------------------------------------------------------
+
+   Writes the results of convergence studies to columnar files, in the Arrow
+   IPC (Feather) or Parquet formats, using pyarrow. The results are streamed
+   in record batches, with one row per triplet of grids.
+
+ --------------------------------------------------------------------------
+"""
+
+import pyarrow as pa
+
+from .interface import Convergence, results_dtype
+
+# Supported formats and their file extensions
+FORMATS = {"feather": ".feather",
+           "parquet": ".parquet"}
+
+
+def write_results(out_path, studies, out_format="feather", analytic=False,
+                                     batch_size=65536):
+    
+    """ Write the results of the given studies to a columnar file. The
+    studies are given as (input path, study) pairs, where the study is a
+    Convergence or ConvergenceSet object, or a list of (metric name, array)
+    pairs with the arrays given by Convergence.to_numpy. The columns are the
+    input path, the metric name and the fields of Convergence.to_numpy,
+    including the analytical fields if analytic is True. Values which could
+    not be calculated are null. At most batch_size rows are converted at a
+    time.
+    
+    Feather files are written uncompressed, so they can be memory-mapped
+    when read.
+    """
+    
+    if out_format not in FORMATS:
+        raise ValueError("Unrecognised format {!r}. Should be one of "
+                         "{}".format(out_format, ", ".join(FORMATS)))
+    
+    schema = results_schema(analytic)
+    
+    if out_format == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(out_path, schema)
+    else:
+        writer = pa.ipc.new_file(out_path, schema)
+    
+    with writer:
+        
+        for in_path, study in studies:
+            for metric, array in _iter_arrays(study, batch_size):
+                writer.write_batch(_make_batch(schema, in_path, metric, array))
+    
+    return
+
+
+def results_schema(analytic=False):
+    
+    """ Return the schema of the files written by write_results. """
+    
+    fields = [pa.field("input", pa.string()),
+              pa.field("metric", pa.string())]
+    
+    for name, dtype in results_dtype(analytic):
+        if dtype == "i8":
+            fields.append(pa.field(name, pa.int64()))
+        else:
+            fields.append(pa.field(name, pa.float64()))
+    
+    return pa.schema(fields)
+
+
+def _iter_arrays(study, batch_size):
+    
+    if isinstance(study, list):
+        
+        for metric, array in study:
+            for start in range(0, len(array), batch_size):
+                yield metric, array[start:start + batch_size]
+        
+        return
+    
+    if isinstance(study, Convergence):
+        convergences = [study]
+    else:
+        convergences = [study[name] for name in study]
+    
+    for convergence in convergences:
+        for start in range(0, len(convergence), batch_size):
+            yield (convergence.met_name,
+                   convergence._results_array(start, start + batch_size))
+
+
+def _make_batch(schema, in_path, metric, array):
+    
+    n_rows = len(array)
+    columns = [pa.repeat(pa.scalar(in_path, pa.string()), n_rows),
+               pa.repeat(pa.scalar(metric, pa.string()), n_rows)]
+    
+    # Missing values are NaN in the arrays and null in the files
+    for field in list(schema)[2:]:
+        columns.append(pa.array(array[field.name],
+                                type=field.type,
+                                from_pandas=True))
+    
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
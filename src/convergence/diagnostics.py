@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+ -- convergence package  -------------------------------------------------------
+
+   Collects the failures of the calculations for each triplet of grids, so
+   that they can be counted and examined by code rather than only being
+   issued as warnings.
+
+ --------------------------------------------------------------------------
+"""
+
+import warnings
+from collections import namedtuple
+
+# Failure codes
+ORDER_INVALID = "order_invalid"
+ORDER_DIVERGED = "order_diverged"
+EXTRAPOLATION = "extrapolation"
+ERROR_ESTIMATE = "error_estimate"
+GCI = "gci"
+ANALYTIC_ERROR = "analytic_error"
+ASYMPTOTIC_RATIO = "asymptotic_ratio"
+MISSING_RESULT = "missing_result"
+
+# Modes
+MODES = ("warnings", "aggregated", "silent")
+
+Diagnostic = namedtuple("Diagnostic", ["code", "tripdex", "stage", "message"])
+
+
+class Diagnostics(object):
+    """ Collect the failures of the calculations for each triplet of grids.
+    Each failure is recorded with a failure code, the index of the triplet
+    (at the time of the calculation) and the stage of the calculation, one
+    of "shared", "fine", "coarse" or "ratios". The mode sets what is done
+    with each failure:
+    
+        "warnings":   record the failure and issue its message as a warning
+        "aggregated": record the failure without a warning
+        "silent":     only count the failure
+    
+    The number of failures of each type is available from summary in all
+    modes.
+    """
+    
+    def __init__(self, mode="warnings"):
+        
+        if mode not in MODES:
+            
+            mode_str = ", ".join(MODES)
+            err_msg = ("Unrecognised value passed to mode. Should be one "
+                       "of {}").format(mode_str)
+            
+            raise ValueError(err_msg)
+        
+        self.mode = mode
+        self._records = []
+        self._counts = {}
+        
+        return
+    
+    def record(self, code, tripdex, stage, message):
+        
+        self._counts[code] = self._counts.get(code, 0) + 1
+        
+        if self.mode == "silent": return
+        
+        self._records.append(Diagnostic(code, tripdex, stage, message))
+        
+        if self.mode == "warnings": warnings.warn(message)
+        
+        return
+    
+    def summary(self):
+        
+        """ Return a dictionary of the number of failures for each failure
+        code.
+        """
+        
+        return dict(self._counts)
+    
+    def clear(self):
+        
+        self._records = []
+        self._counts = {}
+        
+        return
+    
+    def __len__(self):
+        return sum(self._counts.values())
+    
+    def __iter__(self):
+        return iter(self._records)
+    
+    def __str__(self):
+        
+        msgs = ['Failures: %d ' % len(self)]
+        
+        for code in sorted(self._counts):
+            msgs.append('%24s: %d ' % (code, self._counts[code]))
+        
+        return "\n".join(msgs)
@@ -0,0 +1,520 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+ -- convergence package  -------------------------------------------------------
+
+   Performs the verification calculations of the Convergence class for
+   whole solution fields, given as values at common points for each grid.
+
+ --------------------------------------------------------------------------
+"""
+
+import argparse
+import os
+import warnings
+
+import numpy as np
+
+from .arrays import (INVALID,
+                     classify_array,
+                     order_of_convergence_array,
+                     triplet_values_array)
+from .functions import error_estimates
+
+
+class FieldConvergence(object):
+    """ Calculate convergence for a set of grids where each grid provides a
+    field of values, already interpolated onto common points. The values are
+    given as an array of shape (n_grids, n_points), or (n_grids, ...) for
+    fields of any shape, along with the spacing of each grid. The results for
+    each triplet of grids are arrays of the same shape as a single field.
+    
+    Unlike Convergence, values below zero_tol do not remove a grid from the
+    analysis. Instead, the affected points are marked as INVALID in the
+    status array of each triplet that uses the grid. The class of
+    convergence of each point (see convergence.arrays.classify_array) is
+    given by the classes array of each triplet.
+    
+    If jobs is greater than one, the points are split into chunks of
+    chunk_size points (by default, four chunks per job) which are solved by
+    a pool of that many processes. The values and results are passed to the
+    processes in shared memory, rather than being copied, and the results
+    are identical to those found in a single process.
+    """
+    
+    def __init__(self, f_anal=None, zero_tol=1E-4, jobs=1, chunk_size=None):
+        
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        
+        self._f_anal = f_anal
+        self._zero_tol = zero_tol
+        self._jobs = jobs
+        self._chunk_size = chunk_size
+        self._spacings = None
+        self._values = None
+        self._grid_nspaces = None
+        
+        return
+    
+    def add_grids(self, grid_spacings, values):
+        
+        self._set_grids(grid_spacings, values)
+        self._make_attributes()
+        
+        return
+    
+    def _set_grids(self, grid_spacings, values):
+        
+        spacings = np.asarray(grid_spacings, dtype=float)
+        values = np.asarray(values, dtype=float)
+        
+        if spacings.ndim != 1 or values.shape[:1] != spacings.shape:
+            raise ValueError("values must have one field per grid spacing")
+        
+        if self._spacings is not None:
+            
+            if values.shape[1:] != self._values.shape[1:]:
+                raise ValueError("Field shape does not match existing grids")
+            
+            spacings = np.concatenate((self._spacings, spacings))
+            values = np.concatenate((self._values, values))
+        
+        order = np.argsort(spacings, kind="stable")
+        self._spacings = spacings[order]
+        self._values = values[order]
+        
+        if len(self._spacings) < 3:
+            warnings.warn("Insufficient grids for analysis")
+        
+        return
+    
+    def _make_attributes(self):
+        
+        grid_nspaces = {}
+        n_grids = len(self._spacings)
+        n_triplets = max(n_grids - 2, 0)
+        
+        ratios = [(float(self._spacings[i + 1] / self._spacings[i]),
+                   float(self._spacings[i + 2] / self._spacings[i + 1]))
+                                                for i in range(n_triplets)]
+        
+        # Solve the points of all triplets as flat arrays
+        values = self._values.reshape(n_grids, -1)
+        
+        if self._jobs > 1 and n_triplets:
+            results = _solve_parallel(values,
+                                      ratios,
+                                      self._zero_tol,
+                                      self._jobs,
+                                      self._chunk_size)
+        else:
+            results = _solve_serial(values, ratios, self._zero_tol)
+        
+        results = results.reshape((n_triplets, _N_RESULTS) +
+                                                      self._values.shape[1:])
+        
+        for tripdex, (ratio_21, ratio_32) in enumerate(ratios):
+            
+            sizes = self._spacings[tripdex:tripdex + 3]
+            values = self._values[tripdex:tripdex + 3]
+            
+            p = results[tripdex, _P]
+            status = results[tripdex, _STATUS].astype(np.int8)
+            fine = tuple(results[tripdex, _FINE])
+            coarse = tuple(results[tripdex, _COARSE])
+            assym_ratio = results[tripdex, _ASSYM_RATIO]
+            classes = results[tripdex, _CLASS].astype(np.int8)
+            
+            fine = self._get_nsdict(fine, values[0], values[1])
+            coarse = self._get_nsdict(coarse, values[1], values[2])
+            
+            for nsdict in (fine, coarse):
+                nsdict["p"] = p
+                nsdict["r21"] = ratio_21
+                nsdict["r32"] = ratio_32
+            
+            grids_string = '%d %d %d' % (tripdex + 1, tripdex + 2, tripdex + 3)
+            
+            nspace = argparse.Namespace(**{"grids": grids_string,
+                                           "sizes": sizes.tolist(),
+                                           "fine": argparse.Namespace(**fine),
+                                           "coarse": argparse.Namespace(
+                                                                    **coarse),
+                                           "asymptotic_ratio": assym_ratio,
+                                           "status": status,
+                                           "classes": classes})
+            
+            grid_nspaces[tripdex] = nspace
+        
+        self._grid_nspaces = grid_nspaces
+        
+        return
+    
+    def _get_nsdict(self, results, values_one, values_two):
+        
+        """ Collect the results for the given grids into a dictionary, adding
+        the errors relative to the analytical value, if given.
+        """
+        
+        f_exact, e_approx, e_extrap, gci_fine, gci_coarse = results
+        
+        nsdict = {"e_approx": e_approx,
+                  "e_extrap": e_extrap,
+                  "f_exact": f_exact,
+                  "gci_coarse": gci_coarse,
+                  "gci_fine": gci_fine}
+        
+        if self._f_anal is not None:
+            
+            f_anal = float(self._f_anal)
+            
+            with np.errstate(divide="ignore", invalid="ignore"):
+                _, e_anal = error_estimates(values_one, values_two, f_anal)
+            
+            nsdict['e_analytic'] = e_anal
+            nsdict['f_analytic'] = f_anal
+            nsdict['f_delta'] = f_anal - f_exact
+        
+        return nsdict
+    
+    def __len__(self):
+        
+        if self._grid_nspaces is None:
+            result = 0
+        else:
+            result = len(self._grid_nspaces)
+        
+        return result
+    
+    def __getitem__(self, key):
+        
+        if self._grid_nspaces is None:
+            raise IndexError(key)
+        
+        if not isinstance(key, int):
+            raise TypeError(type(key))
+        
+        try:
+            nspace = self._grid_nspaces[key]
+        except KeyError:
+            raise IndexError(key)
+        
+        return nspace
+
+
+# Rows of the results solved for each triplet
+_P = 0
+_STATUS = 1
+_FINE = slice(2, 7)
+_COARSE = slice(7, 12)
+_ASSYM_RATIO = 12
+_CLASS = 13
+_N_RESULTS = 14
+
+# Results written by memmap_convergence, with their rows and types
+_MEMMAP_RESULTS = (("p", _P, float),
+                   ("status", _STATUS, np.int8),
+                   ("f_exact", 2, float),
+                   ("gci_fine", 5, float),
+                   ("gci_coarse", 6, float),
+                   ("asymptotic_ratio", _ASSYM_RATIO, float),
+                   ("classes", _CLASS, np.int8))
+
+# Approximate number of float values held in memory per point when solving
+_VALUES_PER_POINT = 40
+
+
+def _solve_points(values, ratio_21, ratio_32, zero_tol, out):
+    
+    """ Solve the points of a triplet, given the values of the three grids
+    as an array of shape (3, n_points), and write the results into out, an
+    array of shape (_N_RESULTS, n_points).
+    """
+    
+    # Degenerate points are not passed to the solver
+    classes = classify_array(values[0], values[1], values[2])
+    
+    p, status = order_of_convergence_array(values[0],
+                                           values[1],
+                                           values[2],
+                                           ratio_21,
+                                           ratio_32,
+                                           classes=classes)
+    
+    # Points with values near zero are excluded
+    small = (np.abs(values) <= zero_tol).any(axis=0)
+    p[small] = np.nan
+    status[small] = INVALID
+    
+    fine, coarse, assym_ratio = triplet_values_array(values[0],
+                                                     values[1],
+                                                     values[2],
+                                                     ratio_21,
+                                                     ratio_32,
+                                                     p)
+    
+    out[_P] = p
+    out[_STATUS] = status
+    out[_FINE] = fine
+    out[_COARSE] = coarse
+    out[_ASSYM_RATIO] = assym_ratio
+    out[_CLASS] = classes
+    
+    return
+
+
+def _solve_serial(values, ratios, zero_tol):
+    
+    results = np.empty((len(ratios), _N_RESULTS, values.shape[1]))
+    
+    for tripdex, (ratio_21, ratio_32) in enumerate(ratios):
+        _solve_points(values[tripdex:tripdex + 3],
+                      ratio_21,
+                      ratio_32,
+                      zero_tol,
+                      results[tripdex])
+    
+    return results
+
+
+def _solve_parallel(values, ratios, zero_tol, jobs, chunk_size=None):
+    
+    """ Solve the points of all triplets in chunks, using a pool of jobs
+    processes. The values and results are held in shared memory.
+    """
+    
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing.shared_memory import SharedMemory
+    
+    n_points = values.shape[1]
+    results_shape = (len(ratios), _N_RESULTS, n_points)
+    
+    if chunk_size is None:
+        chunk_size = max(-(-n_points // (4 * jobs)), 1)
+    
+    # Shared memory blocks can not be empty
+    values_shm = SharedMemory(create=True, size=max(values.nbytes, 1))
+    results_shm = SharedMemory(create=True,
+                               size=max(8 * int(np.prod(results_shape)), 1))
+    
+    try:
+        
+        shared_values = np.ndarray(values.shape,
+                                   dtype=float,
+                                   buffer=values_shm.buf)
+        shared_values[:] = values
+        del shared_values
+        
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            
+            futures = [executor.submit(_solve_chunk,
+                                       values_shm.name,
+                                       results_shm.name,
+                                       values.shape,
+                                       tripdex,
+                                       ratio_21,
+                                       ratio_32,
+                                       zero_tol,
+                                       start,
+                                       start + chunk_size)
+                            for tripdex, (ratio_21, ratio_32)
+                                                    in enumerate(ratios)
+                                for start in range(0, n_points, chunk_size)]
+            
+            # Raise any errors from the processes
+            for future in futures: future.result()
+        
+        results = np.ndarray(results_shape,
+                             dtype=float,
+                             buffer=results_shm.buf).copy()
+    
+    finally:
+        
+        values_shm.close()
+        values_shm.unlink()
+        results_shm.close()
+        results_shm.unlink()
+    
+    return results
+
+
+def _solve_chunk(values_name, results_name, shape, tripdex, ratio_21,
+                 ratio_32, zero_tol, start, stop):
+    
+    from multiprocessing.shared_memory import SharedMemory
+    
+    values_shm = SharedMemory(name=values_name)
+    results_shm = SharedMemory(name=results_name)
+    values = results = None
+    
+    try:
+        
+        values = np.ndarray(shape, dtype=float, buffer=values_shm.buf)
+        results = np.ndarray((shape[0] - 2, _N_RESULTS, shape[1]),
+                             dtype=float,
+                             buffer=results_shm.buf)
+        
+        _solve_points(values[tripdex:tripdex + 3, start:stop],
+                      ratio_21,
+                      ratio_32,
+                      zero_tol,
+                      results[tripdex, :, start:stop])
+    
+    finally:
+        
+        # Release the buffers before closing
+        del values, results
+        
+        values_shm.close()
+        results_shm.close()
+    
+    return
+
+
+def memmap_convergence(grid_spacings, sources, out_dir, zero_tol=1E-4,
+                       memory_budget=256 * 1024 ** 2):
+    
+    """ Calculate convergence for fields which are too large to hold in
+    memory. The values of each grid are given in sources, in the same order
+    as grid_spacings, either as paths to .npy files, which are opened as
+    memory maps, or as arrays (such as np.memmap objects). All fields must
+    have the same shape. If all of the fields are stored in Fortran order,
+    the points are read, and the results written, in that order, so that
+    the fields are never copied.
+    
+    The points are solved in chunks, sized so that the memory used while
+    solving stays within memory_budget bytes. The results for each triplet
+    of grids are written straight into .npy files in out_dir, named after
+    the result and the grids, such as "p_1_2_3.npy". The results are the
+    order of convergence (p), the status of each point (see
+    convergence.arrays) and the extrapolated value, GCI fine and GCI coarse
+    of the fine analysis, the asymptotic ratio and the class of convergence
+    of each point.
+    
+    Returns a list containing an object for each triplet, with the
+    attributes grids, sizes and each of the results as a memory-mapped
+    array.
+    """
+    
+    spacings = np.asarray(grid_spacings, dtype=float)
+    
+    if spacings.ndim != 1 or len(sources) != len(spacings):
+        raise ValueError("sources must have one field per grid spacing")
+    
+    if len(spacings) < 3:
+        warnings.warn("Insufficient grids for analysis")
+    
+    fields = [_open_field(source) for source in sources]
+    shape = fields[0].shape
+    
+    if any(field.shape != shape for field in fields):
+        raise ValueError("Fields must all have the same shape")
+    
+    n_points = int(np.prod(shape))
+    chunk_size = max(memory_budget // (8 * _VALUES_PER_POINT), 1)
+    buffer = np.empty((_N_RESULTS, min(chunk_size, n_points)))
+    
+    if not os.path.isdir(out_dir): os.makedirs(out_dir)
+    
+    # Follow the memory layout of the fields, to avoid copying them
+    fortran = all(np.isfortran(field) for field in fields)
+    layout = "F" if fortran else "C"
+    
+    order = np.argsort(spacings, kind="stable")
+    spacings = spacings[order]
+    fields = [_flatten(fields[i], layout) for i in order]
+    
+    triplets = []
+    
+    for tripdex in range(len(spacings) - 2):
+        
+        sizes = spacings[tripdex:tripdex + 3]
+        ratio_21 = float(sizes[1] / sizes[0])
+        ratio_32 = float(sizes[2] / sizes[1])
+        
+        grids_string = '%d %d %d' % (tripdex + 1, tripdex + 2, tripdex + 3)
+        suffix = grids_string.replace(" ", "_") + ".npy"
+        
+        outputs = {}
+        
+        for name, row, dtype in _MEMMAP_RESULTS:
+            path = os.path.join(out_dir, name + "_" + suffix)
+            outputs[name] = np.lib.format.open_memmap(path,
+                                                      mode="w+",
+                                                      dtype=dtype,
+                                                      shape=shape,
+                                                      fortran_order=fortran)
+        
+        for start in range(0, n_points, chunk_size):
+            
+            stop = min(start + chunk_size, n_points)
+            values = np.array([_read_chunk(field, start, stop, layout)
+                                for field in fields[tripdex:tripdex + 3]],
+                              dtype=float)
+            out = buffer[:, :stop - start]
+            
+            _solve_points(values, ratio_21, ratio_32, zero_tol, out)
+            
+            for name, row, _ in _MEMMAP_RESULTS:
+                outputs[name].ravel(order=layout)[start:stop] = out[row]
+        
+        for output in outputs.values(): output.flush()
+        
+        nspace = argparse.Namespace(grids=grids_string,
+                                    sizes=sizes.tolist(),
+                                    **outputs)
+        triplets.append(nspace)
+    
+    return triplets
+
+
+def _flatten(field, layout):
+    
+    # Return a flat view of the field, in the given memory layout, or the
+    # field itself if that would need a copy
+    if field.ndim <= 1: return field.reshape(-1)
+    
+    if layout == "F":
+        contiguous = field.flags.f_contiguous
+    else:
+        contiguous = field.flags.c_contiguous
+    
+    if contiguous: return field.ravel(order=layout)
+    
+    return field
+
+
+def _read_chunk(field, start, stop, layout):
+    
+    if field.ndim == 1: return field[start:stop]
+    
+    # Fields that can not be flattened are indexed point by point
+    index = np.unravel_index(np.arange(start, stop), field.shape, order=layout)
+    
+    return field[index]
+
+
+def _open_field(source):
+    
+    if isinstance(source, (str, os.PathLike)):
+        return np.load(source, mmap_mode="r")
+    
+    return np.asanyarray(source)
@@ -43,24 +43,49 @@ Adapted from:
 """
 
 # Import built-in modules
-from math import log
+import sys
+from math import copysign, exp, isfinite, log, log1p
+
+# Set a maximum residual
+_MAX_RES = 1.E6
+_EPS = sys.float_info.epsilon
+
+# Classes of convergence for a triplet of values
+MONOTONIC = 0
+OSCILLATORY = 1
+DIVERGENT = 2
+DEGENERATE = 3
+
+CLASS_NAMES = ("monotonic", "oscillatory", "divergent", "degenerate")
+
+# Relative size of epsilon21 below which a triplet is degenerate
+DEGENERATE_TOL = 1.E-12
 
 
 def order_of_convergence (value_1, value_2, value_3, ratio_21, ratio_32, 
-                          omega=0.5, tol=1.E-4, max_iter=1e6): #, start_p=1.):
+                          omega=0.5, tol=1.E-4, max_iter=1e6,
+                          method="fixed-point", full_output=False):
     
     """ Calculate the order of convergence values generated with three
     grids of reducing resolution (ie grid_1 is finest). The values of the grids
     are needed along with the ratios between them.
     
-    An iterative method with under-relaxation is used to calculate the order
-    of convergence as the refinement ratio is not necessarily constant.
+    The order of convergence is the root of the equation given by Celik
+    (2008), which must be solved iteratively as the refinement ratio is not
+    necessarily constant. The solver is chosen using method:
     
-    This has been modified to the method of Celik (2008).
+        "fixed-point": iterate the equation with under-relaxation, omega
+        "newton": use Newton's method with the analytic derivative
+        "brent": use Brent's method on a bracket around the initial guess
+    
+    If the refinement ratios are equal, the closed form solution is returned
+    without iteration. If full_output is True, a tuple of p and the number of
+    iterations used is returned.
     """
     
-    # Set a maximum residual
-    max_res = 1.E6
+    if method not in _SOLVERS:
+        raise ValueError("Unrecognised value passed to method. Should be one "
+                         "of {}".format(", ".join(repr(x) for x in _SOLVERS)))
     
     # calculate the epsilons.
     epsilon32 = float(value_3 - value_2)
@@ -72,8 +97,97 @@ def order_of_convergence (value_1, value_2, value_3, ratio_21, ratio_32,
     # Get the signed unit, s
     s = epfrac / abs(epfrac)
     
-    # Initial guess at order of convergence, p
-    p1 = (1. / log(ratio_21)) * abs(log(abs(epfrac))) # start_p
+    # Initial guess at order of convergence, p. This is exact for a constant
+    # refinement ratio.
+    log_epfrac = log(abs(epfrac))
+    p = (1. / log(ratio_21)) * abs(log_epfrac)
+    iterations = 0
+    
+    if ratio_21 != ratio_32:
+        solver = _SOLVERS[method]
+        p, iterations = solver(log_epfrac, s, ratio_21, ratio_32, p,
+                               omega, tol, max_iter)
+    
+    if full_output: return p, iterations
+    
+    return p
+
+
+def _celik_residual(p, log_epfrac, s, ratio_21, ratio_32):
+    
+    """ Return the difference between p and the order of convergence
+    equation of Celik (2008) evaluated at p, and its derivative.
+    """
+    
+    log_r21 = log(ratio_21)
+    log_r32 = log(ratio_32)
+    
+    log_q21, w21 = _power_terms(p * log_r21, s)
+    log_q32, w32 = _power_terms(p * log_r32, s)
+    
+    a = log_epfrac + log_q21 - log_q32
+    f = p - abs(a) / log_r21
+    
+    dq = w21 * log_r21 - w32 * log_r32
+    df = 1. - copysign(1., a) * dq / log_r21
+    
+    return f, df
+
+
+def _power_terms(x, s):
+    
+    """ Return log|r^p - s| and r^p / (r^p - s), given x = p log(r). The
+    terms are found from exp(-x) when x is positive, so that r^p does not
+    overflow for large orders of convergence.
+    """
+    
+    if x > 0.:
+        t = s * exp(-x)
+        return x + log1p(-t), 1. / (1. - t)
+    
+    rp = exp(x)
+    
+    # The terms are undefined for a refinement ratio of one
+    if rp == s:
+        raise ZeroDivisionError("Refinement ratio must not equal one")
+    
+    return log(abs(rp - s)), rp / (rp - s)
+
+
+def _bracket(func, p, max_iter):
+    
+    """ Find an interval, starting from p, where the residual of the order of
+    convergence equation changes from negative to positive. The interval is
+    grown by doubling, so it can step over narrow intervals where the
+    residual is positive, in which case the solvers fall back to the
+    fixed-point iteration.
+    """
+    
+    if p <= 0.: p = 1.
+    
+    a = b = p
+    fa = fb = func(p)
+    iterations = 0
+    
+    while fa > 0.:
+        if iterations > max_iter or a < 1. / _MAX_RES:
+            raise RuntimeError('Unable to bracket order of convergence')
+        a /= 2.
+        fa = func(a)
+        iterations += 1
+    
+    while fb < 0.:
+        if iterations > max_iter or b > _MAX_RES:
+            raise RuntimeError('Unable to bracket order of convergence')
+        b *= 2.
+        fb = func(b)
+        iterations += 1
+    
+    return a, fa, b, fb, iterations
+
+
+def _fixed_point(log_epfrac, s, ratio_21, ratio_32, p1, omega, tol,
+                 max_iter):
     
     # Initialise the residual and number of iterations
     residual = 1.
@@ -82,7 +196,7 @@ def order_of_convergence (value_1, value_2, value_3, ratio_21, ratio_32,
     while abs(residual) > tol:
         
         # Break if it's all gone bad
-        if iterations > max_iter or residual > max_res:
+        if iterations > max_iter or residual > _MAX_RES:
             raise RuntimeError('Residual out of range or too many iterations')
         
         # Get the last value
@@ -92,7 +206,7 @@ def order_of_convergence (value_1, value_2, value_3, ratio_21, ratio_32,
         q = log((ratio_21 ** p0 - s) / (ratio_32 ** p0 - s))
         
         # Calculate the p iteration
-        pnew = (1. / log(ratio_21)) * abs(log(abs(epfrac)) + q)
+        pnew = (1. / log(ratio_21)) * abs(log_epfrac + q)
         
         # Calculate the relaxation step.
         p1 = (1. - omega) * p0 + omega * pnew
@@ -101,7 +215,146 @@ def order_of_convergence (value_1, value_2, value_3, ratio_21, ratio_32,
         
         iterations += 1
     
-    return p1
+    return p1, iterations
+
+
+def _newton(log_epfrac, s, ratio_21, ratio_32, p, omega, tol, max_iter):
+    
+    """ Newton's method, safeguarded by bisection, as given in Numerical
+    Recipes (rtsafe).
+    """
+    
+    def func(x):
+        return _celik_residual(x, log_epfrac, s, ratio_21, ratio_32)
+    
+    try:
+        a, fa, b, fb, iterations = _bracket(lambda x: func(x)[0], p, max_iter)
+    except RuntimeError:
+        return _fixed_point(log_epfrac, s, ratio_21, ratio_32, p, omega, tol,
+                            max_iter)
+    
+    if fa == 0.: return a, iterations
+    if fb == 0.: return b, iterations
+    
+    # Start from the end of the bracket closest to the root
+    p = a if abs(fa) < abs(fb) else b
+    dx = dx_old = b - a
+    f, df = func(p)
+    
+    while True:
+        
+        if iterations > max_iter:
+            raise RuntimeError('Residual out of range or too many iterations')
+        
+        # Bisect if Newton's step leaves the bracket or is converging slowly
+        if (df == 0. or
+            not a < p - f / df < b or
+            abs(2. * f) > abs(dx_old * df)):
+            dx_old = dx
+            dx = 0.5 * (b - a)
+            p = a + dx
+        else:
+            dx_old = dx
+            dx = f / df
+            p -= dx
+        
+        iterations += 1
+        
+        if abs(dx) <= tol: break
+        
+        f, df = func(p)
+        
+        if f < 0.:
+            a = p
+        else:
+            b = p
+    
+    return p, iterations
+
+
+def _brent(log_epfrac, s, ratio_21, ratio_32, p, omega, tol, max_iter):
+    
+    """ Brent's method, as given in Numerical Recipes (zbrent), on a bracket
+    around the initial guess, p.
+    """
+    
+    def func(x):
+        return _celik_residual(x, log_epfrac, s, ratio_21, ratio_32)[0]
+    
+    try:
+        a, fa, b, fb, iterations = _bracket(func, p, max_iter)
+    except RuntimeError:
+        return _fixed_point(log_epfrac, s, ratio_21, ratio_32, p, omega, tol,
+                            max_iter)
+    
+    if fa == 0.: return a, iterations
+    if fb == 0.: return b, iterations
+    
+    c, fc = b, fb
+    d = e = b - a
+    
+    while True:
+        
+        if iterations > max_iter:
+            raise RuntimeError('Residual out of range or too many iterations')
+        
+        if (fb > 0.) == (fc > 0.):
+            c, fc = a, fa
+            d = e = b - a
+        
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        
+        tol1 = 2. * _EPS * abs(b) + 0.5 * tol
+        xm = 0.5 * (c - b)
+        
+        if abs(xm) <= tol1 or fb == 0.: break
+        
+        if abs(e) >= tol1 and abs(fa) > abs(fb):
+            
+            # Attempt inverse quadratic interpolation
+            sa = fb / fa
+            
+            if a == c:
+                pp = 2. * xm * sa
+                qq = 1. - sa
+            else:
+                qq = fa / fc
+                rr = fb / fc
+                pp = sa * (2. * xm * qq * (qq - rr) - (b - a) * (rr - 1.))
+                qq = (qq - 1.) * (rr - 1.) * (sa - 1.)
+            
+            if pp > 0.: qq = -qq
+            pp = abs(pp)
+            
+            if 2. * pp < min(3. * xm * qq - abs(tol1 * qq), abs(e * qq)):
+                e = d
+                d = pp / qq
+            else:
+                d = e = xm
+        
+        else:
+            
+            # Bisect
+            d = e = xm
+        
+        a, fa = b, fb
+        
+        if abs(d) > tol1:
+            b += d
+        else:
+            b += copysign(tol1, xm)
+        
+        fb = func(b)
+        iterations += 1
+    
+    return b, iterations
+
+
+_SOLVERS = {"fixed-point": _fixed_point,
+            "newton": _newton,
+            "brent": _brent}
 
 
 def richardson_extrapolate(value_1, value_2, ratio_21, p):
@@ -162,6 +415,83 @@ def asymptotic_ratio(gci_fine_21, gci_fine_32, ratio_21, p):
     
     return ratio
 
+
+def triplet_values(value_1, value_2, value_3, ratio_21, ratio_32, p):
+    
+    """ Calculate all of the quantities derived from the order of convergence,
+    p, for three grids of reducing resolution (ie grid_1 is finest) in a single
+    pass. The results are the same as calling richardson_extrapolate,
+    error_estimates and gci for the fine (1 and 2) and coarse (2 and 3) grids,
+    followed by asymptotic_ratio, but the powers of the refinement ratios are
+    only calculated once.
+    
+    Returns a tuple for the fine grids, a tuple for the coarse grids and the
+    asymptotic ratio. The grid tuples contain the extrapolated value, the
+    approximate and extrapolated relative errors and the fine and coarse GCI.
+    
+    Only arithmetic operations are used, so NumPy arrays may also be given.
+    """
+    
+    # Using a fixed safety factor as per Celik (2008)
+    safety_factor = 1.25
+    
+    r21p = ratio_21**p
+    r32p = ratio_32**p
+    
+    f_exact_21 = ( r21p * value_1 - value_2 ) / ( r21p - 1.0 )
+    e21a = abs( (value_1 - value_2) / value_1 )
+    e21ext = abs( ( f_exact_21 - value_1 ) / f_exact_21 )
+    gci_fine_21 = safety_factor * e21a / (r21p - 1.0)
+    gci_coarse_21 = r21p * gci_fine_21
+    
+    f_exact_32 = ( r32p * value_2 - value_3 ) / ( r32p - 1.0 )
+    e32a = abs( (value_2 - value_3) / value_2 )
+    e32ext = abs( ( f_exact_32 - value_2 ) / f_exact_32 )
+    gci_fine_32 = safety_factor * e32a / (r32p - 1.0)
+    gci_coarse_32 = r32p * gci_fine_32
+    
+    ratio = r21p * ( gci_fine_21 / gci_fine_32)
+    
+    fine = (f_exact_21, e21a, e21ext, gci_fine_21, gci_coarse_21)
+    coarse = (f_exact_32, e32a, e32ext, gci_fine_32, gci_coarse_32)
+    
+    return fine, coarse, ratio
+
+
+def convergence_class(value_1, value_2, value_3, rtol=DEGENERATE_TOL):
+    
+    """ Classify the convergence of the values generated with three grids of
+    reducing resolution (ie grid_1 is finest) using the ratio of successive
+    changes, R = epsilon21 / epsilon32. Returns one of:
+    
+        MONOTONIC: 0 < R < 1
+        OSCILLATORY: -1 < R < 0
+        DIVERGENT: |R| >= 1
+        DEGENERATE: epsilon21 is zero, relative to the values, within rtol,
+                    or any value is not finite
+    
+    The order of convergence can not be found for degenerate triplets.
+    """
+    
+    if not (isfinite(value_1) and isfinite(value_2) and isfinite(value_3)):
+        return DEGENERATE
+    
+    epsilon21 = value_2 - value_1
+    epsilon32 = value_3 - value_2
+    
+    if abs(epsilon21) <= rtol * max(abs(value_1), abs(value_2)):
+        return DEGENERATE
+    
+    if epsilon32 == 0: return DIVERGENT
+    
+    ratio = epsilon21 / epsilon32
+    
+    if abs(ratio) >= 1: return DIVERGENT
+    if ratio < 0: return OSCILLATORY
+    
+    return MONOTONIC
+
+
 def required_resolution(gci, gci12, p, h1):
     """Calculate the grid resolution required to achieve a given GCI, given
     a fine-grid GCI, order of convergence, p, and the grid resolution of the
@@ -42,16 +42,30 @@ Adapted from:
     Nov '11: Updated to reflect Celik et al 2008.
 """
 
-import argparse
+import operator
+import os
 import warnings
+from bisect import bisect_right
 
 from .functions import (order_of_convergence,
                         richardson_extrapolate,
                         error_estimates,
                         gci,
                         asymptotic_ratio,
-                        required_resolution)
-from .tables import Record, Table
+                        required_resolution,
+                        convergence_class,
+                        CLASS_NAMES,
+                        DEGENERATE)
+from .diagnostics import (ANALYTIC_ERROR,
+                          ASYMPTOTIC_RATIO,
+                          ERROR_ESTIMATE,
+                          EXTRAPOLATION,
+                          GCI,
+                          MISSING_RESULT,
+                          ORDER_DIVERGED,
+                          ORDER_INVALID,
+                          Diagnostics)
+from .tables import iter_table
 
 
 class Convergence(object):
@@ -60,21 +74,56 @@ class Convergence(object):
     extrapolated value to zero, GCI, and test whether the grids are in the
     asmptotic range. It will also calculate errors with an analytical value.
     Each of these tests can be carried out independantly and written to a file.
-    The outputs are stored in dictionaries for easy access by parameter.
+    The outputs for each triplet of grids are available as attributes of the
+    items of the object.
+    
+    If lazy is True, adding grids only stores them and the results for each
+    triplet are calculated when they are first needed.
+    
+    Failures of the calculations are passed to the diagnostics attribute,
+    which is a Diagnostics object. The diagnostics argument can either be a
+    Diagnostics object (which may be shared between studies) or one of its
+    modes, "warnings", "aggregated" or "silent".
+    
+    If a ResultCache object (see convergence.cache) is given as cache, the
+    results of studies that are calculated from scratch are loaded from the
+    cache when the same grids and settings have been calculated before, and
+    stored in it otherwise. The failures of cached studies are passed to the
+    diagnostics again when loaded.
+    
+    If a TripletMemo object (see convergence.memo) is given as memo, the order
+    of convergence and the derived values of each triplet are looked up in
+    the memo before they are calculated.
+    
+    If distribution is True, the report ends with a summary of the
+    distribution of the order of convergence and the fine grid GCIs over
+    the triplets (see get_distribution). Requires NumPy.
     """
     
-    def __init__(self, met_name=None, f_anal=None, zero_tol=1E-4):
+    def __init__(self, met_name=None, f_anal=None, zero_tol=1E-4,
+                       method="fixed-point", lazy=False,
+                       diagnostics="warnings", cache=None, memo=None,
+                       distribution=False):
+        
+        if not isinstance(diagnostics, Diagnostics):
+            diagnostics = Diagnostics(diagnostics)
     
         self.met_name = met_name
+        self.diagnostics = diagnostics
         self._f_anal = f_anal
         self._zero_tol = zero_tol
+        self._method = method
+        self._lazy = lazy
+        self._cache = cache
+        self._memo = memo
+        self._distribution = distribution
         self._grids = []
-        self._grid_shared = None
-        self._grid_fine = None
-        self._grid_coarse = None
-        self._grid_ratios = None
-        self._grid_triplets = None
-        self._grid_nspaces = None
+        self._grid_sizes = []
+        self._numbered_grids = []
+        self._numbered_sizes = []
+        self._grid_triplets = []
+        self._grid_results = []
+        self._pending = []
         
         return
     
@@ -82,44 +131,144 @@ class Convergence(object):
         
         self._set_grids(grids)
         self._set_grid_triplets()
+        
+        if not self._lazy: self._calculate()
+        
+        return
+    
+    def _calculate(self, tripdexes=None):
+        
+        """ Calculate the results for the given triplet indices, or for all
+        triplets, if they have not already been calculated.
+        """
+        
+        if tripdexes is None: tripdexes = range(len(self._grid_results))
+        
+        self._pending = [tripdex for tripdex in tripdexes
+                                    if self._grid_results[tripdex] is None]
+        
+        if not self._pending: return
+        
+        # Studies calculated from scratch can use the cache
+        if (self._cache is not None and
+            len(self._pending) == len(self._grid_results)):
+            self._calculate_cached()
+        else:
+            self._calculate_pending()
+        
+        self._pending = []
+        
+        return
+    
+    def _calculate_pending(self):
+        
         self._get_shared()
         self._get_fine_values()
         self._get_coarse_values()
         self._get_ratios()
-        self._make_attributes()
+        
+        return
+    
+    def _calculate_cached(self):
+        
+        from .cache import make_key, pack, unpack
+        
+        key = make_key(self._grids, self._f_anal, self._zero_tol, self._method)
+        blob = self._cache.get(key)
+        
+        if blob is not None:
+            
+            rows, records = unpack(blob)
+            
+            if len(rows) == len(self._grid_results):
+                
+                self._grid_results = [_decode_results(row) for row in rows]
+                
+                for record in records:
+                    self.diagnostics.record(*record)
+                
+                return
+        
+        # Collect the failures, so that they can be stored
+        diagnostics = self.diagnostics
+        self.diagnostics = Diagnostics("aggregated")
+        
+        try:
+            self._calculate_pending()
+        finally:
+            records = list(self.diagnostics)
+            self.diagnostics = diagnostics
+        
+        for record in records:
+            diagnostics.record(*record)
+        
+        rows = [_encode_results(results) for results in self._grid_results]
+        self._cache.set(key, pack(rows, [list(record) for record in records]))
         
         return
     
     def _set_grids(self, grids):
         
-        pre_sort = list(self._grids)
-        pre_sort.extend(grids)
-        sorted_grids = sorted(pre_sort, key=lambda grid: grid[0])
-        self._grids = tuple(sorted_grids)
+        """ Insert the given grids in order of grid spacing. Grids with values
+        above the zero tolerance are numbered and the triplets that contain
+        them are marked for calculation.
+        """
+        
+        for grid in grids:
+            
+            # Grids of equal spacing are kept in the order they were added
+            griddex = bisect_right(self._grid_sizes, grid[0])
+            self._grids.insert(griddex, grid)
+            self._grid_sizes.insert(griddex, grid[0])
+            
+            if abs(grid[1]) <= self._zero_tol: continue
+            
+            numdex = bisect_right(self._numbered_sizes, grid[0])
+            self._numbered_grids.insert(numdex, grid)
+            self._numbered_sizes.insert(numdex, grid[0])
+            
+            self._splice_triplets(numdex)
         
         if len(self._grids) < 3:
             warnings.warn("Insufficient grids for analysis")
         
         return
     
-    def _set_grid_triplets(self):
+    def _splice_triplets(self, numdex):
+        
+        """ Replace the triplets which span the position of a newly numbered
+        grid with placeholders for the triplets that now contain it.
+        """
         
-        numbered_grids = []
+        n_old = max(len(self._numbered_grids) - 3, 0)
+        n_new = max(len(self._numbered_grids) - 2, 0)
         
-        grid_num = 1
+        start = max(numdex - 2, 0)
+        stop_old = min(numdex, n_old)
+        stop_new = min(numdex + 1, n_new)
         
-        for grid, value in self._grids:
-            
-            if abs(value) > self._zero_tol:
-                numbered_grids.append([grid_num, grid, value])
-                grid_num += 1
+        placeholders = [None] * (stop_new - start)
         
-        grid_trips = []
+        self._grid_triplets[start:stop_old] = placeholders
+        self._grid_results[start:stop_old] = placeholders
         
-        for trip in _triplets(numbered_grids):
-            grid_trips.append(trip)
+        return
+    
+    def _set_grid_triplets(self):
+        
+        """ Fill the triplets which replaced placeholders and record the
+        indices of all triplets awaiting calculation. Triplet i contains
+        numbered grids i + 1, i + 2 and i + 3.
+        """
+        
+        for tripdex, trip in enumerate(self._grid_triplets):
+            if trip is not None: continue
+            trip = tuple(self._numbered_grids[tripdex:tripdex + 3])
+            self._grid_triplets[tripdex] = trip
         
-        self._grid_triplets = grid_trips
+        results = enumerate(self._grid_results)
+        self._pending = [tripdex for tripdex, values in results
+                                                        if values is None]
         
         return
     
@@ -129,34 +278,39 @@ class Convergence(object):
         of the triplets in grid_trips.
         """
         
-        # Initialise the shared data list
-        self._grid_shared = []
-        
-        for trip in self._grid_triplets:
+        for tripdex in self._pending:
             
-            # Calculate the refinement ratios
-            ratio_21 = float(trip[1][1] / trip[0][1])
-            ratio_32 = float(trip[2][1] / trip[1][1])
+            trip = self._grid_triplets[tripdex]
             
-            # Default p to None
-            p = None
+            # Calculate the refinement ratios
+            ratio_21 = float(trip[1][0] / trip[0][0])
+            ratio_32 = float(trip[2][0] / trip[1][0])
             
             # Get order of convergence if possible
-            try:
-                p = order_of_convergence(trip[0][2],
-                                         trip[1][2],
-                                         trip[2][2],
-                                         ratio_21,
-                                         ratio_32)
-            except (ArithmeticError, RuntimeError) as e:
-                warnings.warn(str(e))
-            
-            # Make a dictionary
-            shared_dict = {'ratio_21' : ratio_21, 'ratio_32' : ratio_32,
-                           'p' : p}
+            args = (trip[0][1],
+                    trip[1][1],
+                    trip[2][1],
+                    ratio_21,
+                    ratio_32,
+                    self._method)
+            
+            if self._memo is None:
+                p, failure = _calc_order(*args)
+            else:
+                p, failure = self._memo.lookup(("order",) + args,
+                                               _calc_order,
+                                               *args)
+            
+            if failure is not None:
+                self.diagnostics.record(failure[0],
+                                        tripdex,
+                                        "shared",
+                                        failure[1])
             
             # Add the results to the list
-            self._grid_shared.append(shared_dict)
+            self._grid_results[tripdex] = _TripletValues(ratio_21,
+                                                         ratio_32,
+                                                         p)
     
     def _get_fine_values(self):
         
@@ -165,55 +319,20 @@ class Convergence(object):
         fine and coarse.
         """
         
-        # Initialise the fine grid results list
-        self._grid_fine = []
-        
-        for trip in self._grid_triplets:
-            
-            tripdex = self._grid_triplets.index(trip)
+        for tripdex in self._pending:
             
-            ratio_21 = self._grid_shared[tripdex]['ratio_21']
-            p = self._grid_shared[tripdex]['p']
+            trip = self._grid_triplets[tripdex]
+            results = self._grid_results[tripdex]
             
             # if p is None then nothing can be done
-            if p is None:
-                self._grid_fine.append(None)
-                continue
-            
-            # Get the values for the fine grids
-            f_exact, e21a, e21ext, gci_f, gci_c = self._get_values(trip[0],
-                                                                   trip[1],
-                                                                   ratio_21,
-                                                                   p)
-            
-            # Make a dictionary
-            fine_dict = {'f_exact' : f_exact, 'e_a' : e21a, 'e_ext' : e21ext,
-                         'gci_f' : gci_f, 'gci_c' : gci_c}
-                         
-            # If there is an anlytical value than do more work
-            if self._f_anal is not None:
-                
-                f_delta = e21_anal = None
-                
-                if f_exact is not None:
-                    f_delta = float(self._f_anal) - f_exact
-                
-                try:
-                    _, e21_anal = error_estimates(trip[0][2],
-                                                  trip[1][2],
-                                                  float(self._f_anal))
-                except ArithmeticError as e:
-                    warnings.warn(str(e))
-                
-                # Add these to the dictionary
-                anal_dict = {'f_anal': float(self._f_anal), 
-                             'f_delta' : f_delta, 
-                             'e_anal' : e21_anal}
-                
-                fine_dict.update(anal_dict)
+            if results.p is None: continue
             
-            # Write the results to the list.
-            self._grid_fine.append(fine_dict)
+            results.fine = self._get_grid_values(trip[0],
+                                                 trip[1],
+                                                 results.ratio_21,
+                                                 results.p,
+                                                 tripdex,
+                                                 "fine")
     
     def _get_coarse_values(self):
         
@@ -222,57 +341,93 @@ class Convergence(object):
         fine and coarse.
         """
         
-        # Initialise the coarse grid results list
-        self._grid_coarse = []
-        
-        for trip in self._grid_triplets:
-            
-            tripdex = self._grid_triplets.index(trip)
+        for tripdex in self._pending:
             
-            ratio_32 = self._grid_shared[tripdex]['ratio_32']
-            p = self._grid_shared[tripdex]['p']
+            trip = self._grid_triplets[tripdex]
+            results = self._grid_results[tripdex]
             
             # if p is None then nothing can be done
-            if p is None:
-                self._grid_coarse.append(None)
-                continue
-            
-            # Get the values for the coarse grids
-            f_exact, e32a, e32ext, gci_f, gci_c = self._get_values(trip[1],
-                                                                   trip[2],
-                                                                   ratio_32,
-                                                                   p)
-                                                                   
-            # Make a dictionary
-            coarse_dict = {'f_exact' : f_exact, 'e_a' : e32a,
-                           'e_ext' : e32ext, 'gci_f' : gci_f, 'gci_c' : gci_c}
-                           
-            # If there is an anlytical value than do more work
-            if self._f_anal is not None:
-                
-                f_delta = e23_anal = None
-                
-                if f_exact is not None:
-                    f_delta = float(self._f_anal) - f_exact
-                
-                try:
-                    _, e23_anal = error_estimates(trip[1][2],
-                                                  trip[2][2],
-                                                  float(self._f_anal))
-                except ArithmeticError as e:
-                    warnings.warn(str(e))
-                
-                # Add these to the dictionary
-                anal_dict = {'f_anal': float(self._f_anal), 
-                             'f_delta' : f_delta, 
-                             'e_anal' : e23_anal}
-                
-                coarse_dict.update(anal_dict)
+            if results.p is None: continue
+            
+            results.coarse = self._get_grid_values(trip[1],
+                                                   trip[2],
+                                                   results.ratio_32,
+                                                   results.p,
+                                                   tripdex,
+                                                   "coarse")
+    
+    def _get_grid_values(self, grid_one, grid_two, ratio, p, tripdex=None,
+                               stage=None):
+        
+        """ Collect the values for the given grids, including the errors
+        relative to the analytical value, if given.
+        """
+        
+        values = _GridValues(*self._get_values(grid_one,
+                                               grid_two,
+                                               ratio,
+                                               p,
+                                               tripdex,
+                                               stage))
+        self._add_analytic(values, grid_one, grid_two, tripdex, stage)
+        
+        return values
+    
+    def _add_analytic(self, values, grid_one, grid_two, tripdex=None,
+                            stage=None):
+        
+        # If there is an anlytical value than do more work
+        if self._f_anal is None: return
+        
+        values.f_anal = float(self._f_anal)
+        
+        if values.f_exact is not None:
+            values.f_delta = values.f_anal - values.f_exact
+        
+        try:
+            _, values.e_anal = error_estimates(grid_one[1],
+                                               grid_two[1],
+                                               values.f_anal)
+        except ArithmeticError as e:
+            self.diagnostics.record(ANALYTIC_ERROR, tripdex, stage, str(e))
+        
+        return
+    
+    def _set_values(self, tripdex, ratio_21, ratio_32, p, fine, coarse,
+                          assym_ratio):
+        
+        """ Store the results for a triplet which were calculated elsewhere,
+        for instance in a batch with other triplets. The fine and coarse
+        values are given in the order returned by _get_values and any values
+        which could not be calculated must be None.
+        """
+        
+        trip = self._grid_triplets[tripdex]
+        results = _TripletValues(ratio_21, ratio_32, p)
+        
+        if p is not None:
+            
+            results.fine = _GridValues(*fine)
+            results.coarse = _GridValues(*coarse)
+            results.assym_ratio = assym_ratio
             
-            # Write the results to the list.
-            self._grid_coarse.append(coarse_dict)
+            self._add_analytic(results.fine,
+                               trip[0],
+                               trip[1],
+                               tripdex,
+                               "fine")
+            self._add_analytic(results.coarse,
+                               trip[1],
+                               trip[2],
+                               tripdex,
+                               "coarse")
+        
+        self._grid_results[tripdex] = results
+        
+        return
     
-    def _get_values(self, grid_one, grid_two, ratio, p):
+    def _get_values(self, grid_one, grid_two, ratio, p, tripdex=None,
+                          stage=None):
         
         """ Get the values (for the given grids) of the 
         extrapolated value, relative and extrapolated relative error and GCI 
@@ -280,220 +435,111 @@ class Convergence(object):
         required.
         """
         
-        # Default the values to None
-        f_exact = e21a = e21ext = gci_f = gci_c = None
+        args = (grid_one[1], grid_two[1], ratio, p)
         
-        # Perform Richardson extrapolation to estimate a zero grid value.
-        try:
-            f_exact = richardson_extrapolate(grid_one[2],
-                                             grid_two[2],
-                                             ratio,
-                                             p)
-        except ArithmeticError as e:
-            warnings.warn(str(e))
-            return f_exact, e21a, e21ext, gci_f, gci_c
-        
-        # Get the approximate and extrapolated relative errors
-        try:
-            e21a, e21ext = error_estimates(grid_one[2],
-                                           grid_two[2],
-                                           f_exact)
-        except ArithmeticError as e:
-            warnings.warn(str(e))
-            return f_exact, e21a, e21ext, gci_f, gci_c
+        if self._memo is None:
+            values, failure = _calc_values(*args)
+        else:
+            values, failure = self._memo.lookup(("values",) + args,
+                                                _calc_values,
+                                                *args)
         
-        # Get the gcis
-        try:
-            gci_f, gci_c = gci(ratio, e21a, p)
-        except ArithmeticError as e:
-            warnings.warn(str(e))
+        if failure is not None:
+            self.diagnostics.record(failure[0], tripdex, stage, failure[1])
         
-        return f_exact, e21a, e21ext, gci_f, gci_c
+        return values
     
     def _get_ratios(self):
         
         """ Get the asymptotic ratios for the triplets to check to see if the
         simulations are in the asymptotic range."""
         
-        # If the fine are coarse values are not calculated then they need to be
-        if self._grid_fine is None: self.get_fine_values()
-        if self._grid_coarse is None: self.get_coarse_values()
-        
-        # Initialise the ratios list
-        self._grid_ratios = []
-        
-        for shared, fine, coarse in zip(self._grid_shared,
-                                        self._grid_fine,
-                                        self._grid_coarse):
+        for tripdex in self._pending:
             
-            # Set a default ratio
-            ratio = None
+            results = self._grid_results[tripdex]
+            fine = results.fine
+            coarse = results.coarse
             
             # By this point there might be loads of issues. Check for Nones.
-            none_check = (fine and coarse and shared['ratio_21']
-                          and fine['gci_f'] and coarse['gci_f'])
+            none_check = (fine and coarse and results.ratio_21
+                          and fine.gci_f and coarse.gci_f)
             
             if none_check is not None:
                 
-                ratio_21 = shared['ratio_21']
-                p = shared['p']
-                
-                gci_fine_21 = fine['gci_f']
-                gci_fine_32 = coarse['gci_f']
-                
                 try:
-                    ratio = asymptotic_ratio(gci_fine_21,
-                                             gci_fine_32,
-                                             ratio_21, p)
+                    results.assym_ratio = asymptotic_ratio(fine.gci_f,
+                                                           coarse.gci_f,
+                                                           results.ratio_21,
+                                                           results.p)
                 except ArithmeticError as e:
-                    warnings.warn(str(e))
+                    self.diagnostics.record(ASYMPTOTIC_RATIO,
+                                            tripdex,
+                                            "ratios",
+                                            str(e))
             
             else:
                 
-                warnings.warn('get_ratios: failed none_check')
-                warnings.warn('Some required result not available')
-            
-            # Add the result to the list as a dictionary
-            self._grid_ratios.append({'assym_ratio' : ratio})
+                self.diagnostics.record(MISSING_RESULT,
+                                        tripdex,
+                                        "ratios",
+                                        "get_ratios: failed none_check, "
+                                        "some required result not available")
     
-    def _make_attributes(self):
-        
-        grid_nspaces = {}
+    def write_report(self, fileobj):
         
-        for trip in self._grid_triplets:
-            
-            tripdex = self._grid_triplets.index(trip)
-            
-            grids_string = '%d %d %d' % (trip[0][0], trip[1][0], trip[2][0])
-            grids_sizes = [trip[0][1], trip[1][1], trip[2][1]]
-            grids_values = [trip[0][2], trip[1][2], trip[2][2]]
-            
-            # Add the shared and fine dictionaries
-            total_dict = dict(self._grid_shared[tripdex])
-            if self._grid_fine[tripdex] is not None:
-                total_dict.update(self._grid_fine[tripdex])
-            
-            nsdict = {"r21": total_dict['ratio_21'],
-                      "r32": total_dict['ratio_32']}
-            
-            if total_dict['p'] is not None:
-            
-                nsdict["e_approx"] = total_dict['e_a']
-                nsdict["e_extrap"] = total_dict['e_ext']
-                nsdict["f_exact"] = total_dict['f_exact']
-                nsdict["gci_coarse"] = total_dict['gci_c']
-                nsdict["gci_fine"] = total_dict['gci_f']
-                nsdict["p"] = total_dict['p']
-                nsdict["r21"] = total_dict['ratio_21']
-                nsdict["r32"] = total_dict['ratio_32']
-                
-                if self._f_anal is not None:
-                    
-                    nsdict['e_analytic'] = total_dict['e_anal']
-                    nsdict['f_analytic'] = total_dict['f_anal']
-                    nsdict['f_delta'] = total_dict['f_delta']
-            
-            fspace = argparse.Namespace(**nsdict)
-            
-            # Add the shared and coarse dictionaries
-            total_dict = dict(self._grid_shared[tripdex])
-            if self._grid_fine[tripdex] is not None:
-                total_dict.update(self._grid_coarse[tripdex])
-            
-            nsdict = {"r21": total_dict['ratio_21'],
-                      "r32": total_dict['ratio_32']}
-            
-            if total_dict['p'] is not None:
-            
-                nsdict["e_approx"] = total_dict['e_a']
-                nsdict["e_extrap"] = total_dict['e_ext']
-                nsdict["f_exact"] = total_dict['f_exact']
-                nsdict["gci_coarse"] = total_dict['gci_c']
-                nsdict["gci_fine"] = total_dict['gci_f']
-                nsdict["p"] = total_dict['p']
-                nsdict["r21"] = total_dict['ratio_21']
-                nsdict["r32"] = total_dict['ratio_32']
-            
-                if self._f_anal is not None:
-                    
-                    nsdict['e_analytic'] = total_dict['e_anal']
-                    nsdict['f_analytic'] = total_dict['f_anal']
-                    nsdict['f_delta'] = total_dict['f_delta']
-            
-            cspace = argparse.Namespace(**nsdict)
-            
-            assym_ratio = self._grid_ratios[tripdex]['assym_ratio']
-            
-            nspace = argparse.Namespace(**{"grids": grids_string,
-                                           "sizes": grids_sizes,
-                                           "values": grids_values,
-                                           "fine": fspace,
-                                           "coarse": cspace,
-                                           "asymptotic_ratio": assym_ratio})
-            
-            grid_nspaces[tripdex] = nspace
+        """ Write the report, as given by str, to the given file-like object.
+        The report is written in chunks as it is generated, so the whole
+        report is never held in memory.
+        """
         
-        self._grid_nspaces = grid_nspaces
+        _write_lines(fileobj, self._iter_report())
         
         return
     
-    def _write_header(self, msgs):
-        
-        msgs.append('')
-        
-        # Check if the metric is named
-        if self.met_name is not None:
-            msgs.append('--- Examining metric: %24s --- ' % self.met_name)
-            msgs.append('')
-        
-        msgs.append('Number of grids to be examined = %d ' % len(self._grids))
-        msgs.append('')
+    def _iter_report(self):
         
-        if len(self._grids) == 0: return msgs
+        self._calculate()
         
-        msgs.append('     Grid Size     Quantity ')
-        msgs.append('')
+        yield from self._iter_header()
         
-        # Write out the grids
-        for grid in self._grids:
-            msgs.append('%13.6f %13.6f ' % (grid[0], grid[1]))
+        if self._grid_results:
+            yield from self._iter_errors("fine")
+            yield from self._iter_errors("coarse")
+            yield from self._iter_ratios()
+            yield from self._iter_classes()
             
-        msgs.append('')
+            if self._distribution:
+                yield from self._iter_distribution()
         
-        return msgs
+        yield from self._iter_trailer()
     
-    def _write_fine(self, msgs):
+    def _iter_header(self):
         
-        # OK, get the strings for the table using the fine errors
-        tab_strings = self._write_errors_tab(self._grid_fine)
+        yield ''
         
-        # Write to the file
-        msgs.append('')
-        msgs.append('Discretisation errors for fine grids: ')
-        msgs.append('')
-        
-        for line in tab_strings: msgs.append(line)
+        # Check if the metric is named
+        if self.met_name is not None:
+            yield '--- Examining metric: %24s --- ' % self.met_name
+            yield ''
         
-        return msgs
-    
-    def _write_coarse(self, msgs):
+        yield 'Number of grids to be examined = %d ' % len(self._grids)
+        yield ''
         
-        # OK, get the strings for the table using the fine errors
-        tab_strings = self._write_errors_tab(self._grid_coarse)
+        if len(self._grids) == 0: return
         
-        # Write to the file
-        msgs.append('')
-        msgs.append('Discretisation errors for coarse grids: ')
-        msgs.append('')
+        yield '     Grid Size     Quantity '
+        yield ''
         
-        for line in tab_strings: msgs.append(line)
+        # Write out the grids
+        for grid in self._grids:
+            yield '%13.6f %13.6f ' % (grid[0], grid[1])
         
-        return msgs
+        yield ''
     
-    def _write_errors_tab(self, errors_list):
+    def _iter_errors(self, grid):
         
         record_headings = ['r21', 'r32', 'p', 'f_exact']
-        head_keys = ['ratio_21', 'ratio_32', 'p', 'f_exact']
+        head_keys = ['f_exact']
         
         if self._f_anal is not None:
             record_headings += ["f_analytic", "f_delta"]
@@ -509,96 +555,88 @@ class Convergence(object):
         record_headings += ['gci_fine', 'gci_coarse']
         head_keys += ['gci_f', 'gci_c']
         
-        # OK, better make a table
-        fine_table = Table('Grids')
+        missing = [None] * len(head_keys)
         
-        # Right now loop through the triplets making a record for each and
-        # adding it to the table.
-        for trip in self._grid_triplets:
-            
-            # Get the index
-            tripdex = self._grid_triplets.index(trip)
+        def get_rows():
             
-            # Get the grid numbers that are being used.
-            grids_string = '%d %d %d' % (trip[0][0], trip[1][0], trip[2][0])
-            
-            # Set up a list to store the values.
-            vals_list = []
-            
-            # Add the shared and fine dictionaries
-            total_dict = dict(self._grid_shared[tripdex])
-            if errors_list[tripdex] is not None:
-                total_dict.update(errors_list[tripdex])
-            
-            # Match the values to the headings list
-            for key in head_keys:
-                if key in total_dict:
-                    vals_list.append(total_dict[key])
+            # Make a row for each triplet, in the order of the grid numbers
+            for tripdex in _label_order(len(self._grid_triplets)):
+                
+                # Set up a list to store the values, starting with the shared
+                # values
+                results = self._grid_results[tripdex]
+                vals_list = [results.ratio_21, results.ratio_32, results.p]
+                
+                # Match the values for the grids to the headings list
+                values = getattr(results, grid)
+                
+                if values is None:
+                    vals_list.extend(missing)
                 else:
-                    vals_list.append(None)
-            
-            # Build a record
-            new_record = Record(record_headings, vals_list, grids_string)
-            
-            # Add the record to the table
-            fine_table.add_record(new_record)
+                    vals_list.extend(getattr(values, key)
+                                                    for key in head_keys)
+                
+                yield _grids_string(tripdex), vals_list
         
-        # OK, now get the table strings.
-        tab_strings = fine_table.write(12, 6)
+        yield ''
+        yield 'Discretisation errors for %s grids: ' % grid
+        yield ''
         
-        return tab_strings
+        yield from iter_table('Grids', record_headings, get_rows, 12, 6)
     
-    def _write_ratios(self, msgs):
+    def _iter_ratios(self):
         
-        # Single record heading
-        record_heading = ['Asymptotic ratio']
-                           
-        # OK, better make a table
-        ratio_table = Table('Grids')
-                           
-        # Right now loop through the triplets making a record for each and
-        # adding it to the table.
-        for trip in self._grid_triplets:
-            
-            # Get the index
-            tripdex = self._grid_triplets.index(trip)
-            
-            # Get the grid numbers that are being used.
-            grids_string = '%d %d %d' % (trip[0][0], trip[1][0], trip[2][0])
-            
-            # Set up a list to store the values.
-            vals_list = [self._grid_ratios[tripdex]['assym_ratio']]
-            
-            # Build a record
-            new_record = Record(record_heading, vals_list, grids_string)
-            
-            # Add the record to the table
-            ratio_table.add_record(new_record)
-            
-        # OK, now get the table strings.
-        tab_strings = ratio_table.write(16, 6)
+        def get_rows():
+            for tripdex in _label_order(len(self._grid_triplets)):
+                yield (_grids_string(tripdex),
+                       [self._grid_results[tripdex].assym_ratio])
         
-        # Write to the file
-        msgs.append('')
-        msgs.append('Asymptotic ratio test: ')
-        msgs.append('')
+        yield ''
+        yield 'Asymptotic ratio test: '
+        yield ''
         
-        for line in tab_strings: msgs.append(line)
+        yield from iter_table('Grids', ['Asymptotic ratio'], get_rows, 16, 6)
+    
+    def _iter_classes(self):
+        
+        def get_rows():
+            for name, count in self.get_classes().items():
+                yield name, [count]
         
-        return msgs
+        yield ''
+        yield 'Convergence classes: '
+        yield ''
+        
+        yield from iter_table('Class', ['Triplets'], get_rows, 12, 0)
     
-    def _write_trailer(self, msgs):
+    def _iter_distribution(self):
+        
+        sketches = self.get_distribution()
+        names = [name for name, _ in _DISTRIBUTION_FIELDS]
+        
+        def get_rows():
+            
+            summaries = [sketches[name].summary() for name in names]
+            
+            for i, (statistic, _) in enumerate(summaries[0]):
+                yield statistic, [summary[i][1] for summary in summaries]
+        
+        yield ''
+        yield 'Distribution over triplets for fine grids: '
+        yield ''
         
-        if len(self._grid_triplets) > 0: return msgs
+        yield from iter_table('Statistic', names, get_rows, 12, 6)
+    
+    def _iter_trailer(self):
         
-        msgs.append(' *** Insufficient grids for analysis *** ')
-        msgs.append('')
+        if len(self._grid_triplets) > 0: return
         
-        return msgs
+        yield ' *** Insufficient grids for analysis *** '
+        yield ''
     
     def get_resolution(self, gci, estimate="fine"):
         
-        if not self._grid_coarse:
+        if not self._grid_results:
             raise RuntimeError("Insufficient grids")
         
         if estimate == "fine":
@@ -615,125 +653,1057 @@ class Convergence(object):
         
         
         return required_resolution(gci, gci12, p, h1)
+    
+    def get_classes(self):
         
-    def __len__(self):
+        """ Return a dictionary of the number of triplets in each class of
+        convergence (see convergence.functions.convergence_class), keyed by
+        the class name.
+        """
         
-        if self._grid_nspaces is None:
-            result = 0
-        else:
-            result = len(self._grid_nspaces)
+        counts = [0] * len(CLASS_NAMES)
+        
+        for trip in self._grid_triplets:
+            counts[convergence_class(trip[0][1],
+                                     trip[1][1],
+                                     trip[2][1])] += 1
+        
+        return dict(zip(CLASS_NAMES, counts))
+    
+    def get_distribution(self, chunk_size=65536):
+        
+        """ Return a dictionary of QuantileSketch objects (see
+        convergence.sketches) summarising the distributions of the order of
+        convergence, p, and gci_fine and gci_coarse for the fine grids over
+        all triplets. The triplets are added in chunks of chunk_size.
+        Requires NumPy.
+        """
+        
+        from .sketches import QuantileSketch
+        
+        sketches = {name: QuantileSketch() for name, _ in _DISTRIBUTION_FIELDS}
+        
+        for start in range(0, len(self), chunk_size):
+            
+            array = self._results_array(start, start + chunk_size)
+            
+            for name, field in _DISTRIBUTION_FIELDS:
+                sketches[name].add(array[field])
         
-        return result
+        return sketches
+    
+    def to_numpy(self):
+        
+        """ Return the results as a NumPy structured array with one row per
+        triplet. The fields hold the numbers, sizes and values of the grids,
+        the refinement ratios, order of convergence and asymptotic ratio and
+        the fine and coarse values, with names prefixed by "fine_" or
+        "coarse_". The analytical fields are only included if an analytical
+        value was given. Values which could not be calculated are NaN.
+        Requires NumPy.
+        """
+        
+        return self._results_array()
+    
+    def _results_array(self, start=0, stop=None):
+        
+        """ Return the results of the triplets from start to stop (or the
+        last triplet) as a structured array, as given by to_numpy.
+        """
+        
+        import numpy as np
+        
+        tripdexes = range(len(self))[start:stop]
+        self._calculate(tripdexes)
+        
+        analytic = self._f_anal is not None
+        array = np.empty(len(tripdexes), dtype=results_dtype(analytic))
+        
+        for i, name in enumerate(_ARRAY_GRID_FIELDS, 1):
+            array[name] = np.arange(tripdexes.start + i, tripdexes.stop + i)
+        
+        if not len(tripdexes): return array
+        
+        # Convert all of the results at once; None becomes NaN
+        triplets = self._grid_triplets[tripdexes.start:tripdexes.stop]
+        results = self._grid_results[tripdexes.start:tripdexes.stop]
+        rows = np.array([[grid[0] for grid in trip] +
+                         [grid[1] for grid in trip] +
+                         _encode_results(values)
+                                for trip, values in zip(triplets, results)],
+                        dtype=float)
+        
+        for name, column, is_analytic in _ARRAY_FIELDS:
+            if analytic or not is_analytic:
+                array[name] = rows[:, column]
+        
+        return array
+    
+    def to_dataframe(self):
+        
+        """ Return the results as a pandas DataFrame, with the columns given
+        by the fields of to_numpy. Requires NumPy and pandas.
+        """
+        
+        import pandas as pd
+        
+        return pd.DataFrame(self.to_numpy())
+    
+    def __len__(self):
+        
+        return len(self._grid_results)
     
     def __getitem__(self, key):
         
-        if self._grid_nspaces is None:
-            raise IndexError(key)
+        if isinstance(key, slice):
+            return ResultsView(self, range(len(self))[key])
         
-        if not isinstance(key, int):
+        try:
+            tripdex = operator.index(key)
+        except TypeError:
             raise TypeError(type(key))
         
-        try:
-            nspace = self._grid_nspaces[key]
-        except KeyError:
+        if tripdex < 0: tripdex += len(self)
+        
+        if not 0 <= tripdex < len(self):
             raise IndexError(key)
         
-        return nspace
+        self._calculate([tripdex])
+        
+        return TripletResults(tripdex,
+                              self._grid_triplets[tripdex],
+                              self._grid_results[tripdex],
+                              self._f_anal is not None)
     
     def __str__(self):
         
-        msgs = []
-        
-        msgs = self._write_header(msgs)
-        if self._grid_fine: msgs = self._write_fine(msgs)
-        if self._grid_coarse: msgs = self._write_coarse(msgs)
-        if self._grid_ratios: msgs = self._write_ratios(msgs)
-        msgs = self._write_trailer(msgs)
-        
-        return "\n".join(msgs)
+        return "\n".join(self._iter_report())
 
 
-def _triplets(lst):
-    
-    if len(lst) < 2: return
+class TripletResults(object):
+    """ The results for a triplet of grids, as returned by the items of a
+    Convergence object. The values shared by the fine and coarse analyses are
+    available as attributes, and the values for each analysis are stored in
+    the fine and coarse attributes.
+    """
     
-    i = iter(lst)
-    first = next(i)
-    second = next(i)
+    __slots__ = ("_tripdex", "_triplet", "_results", "_analytic")
     
-    for item in i:
-        yield first, second, item
-        first = second
-        second = item
-
-
-def main(in_path, out_path, analytical=None):
+    def __init__(self, tripdex, triplet, results, analytic):
+        
+        self._tripdex = tripdex
+        self._triplet = triplet
+        self._results = results
+        self._analytic = analytic
+        
+        return
     
-    # Read in the file
-    main_list = simple_read(in_path)
+    @property
+    def grids(self):
+        return _grids_string(self._tripdex)
     
-    # Run convergence study
-    convergence = Convergence(f_anal=analytical)
-    convergence.add_grids(main_list)
+    @property
+    def sizes(self):
+        return [grid[0] for grid in self._triplet]
     
-    # Write the report
-    with open(out_path, 'w') as f:
-        f.write(str(convergence))
+    @property
+    def values(self):
+        return [grid[1] for grid in self._triplet]
     
-    return
-
-
-def simple_read(file_name):
-    """ Read in grids from a simple file. """
+    @property
+    def fine(self):
+        return GridResults(self._results, self._results.fine, self._analytic)
     
-    # Open the file
-    grid_file = open(file_name, 'r')
+    @property
+    def coarse(self):
+        return GridResults(self._results,
+                           self._results.coarse,
+                           self._analytic)
     
-    # Get each grid
-    grid_list = []
+    @property
+    def asymptotic_ratio(self):
+        return self._results.assym_ratio
     
-    for line in grid_file.readlines():
+    @property
+    def convergence_class(self):
         
-        # split the line
-        values = line.split()
+        """ The name of the class of convergence of the triplet (see
+        convergence.functions.convergence_class).
+        """
         
-        values = [float(i) for i in values]
+        return CLASS_NAMES[convergence_class(*self.values)]
+    
+    @property
+    def __dict__(self):
+        
+        return {"grids": self.grids,
+                "sizes": self.sizes,
+                "values": self.values,
+                "fine": self.fine,
+                "coarse": self.coarse,
+                "asymptotic_ratio": self.asymptotic_ratio}
+    
+    def __eq__(self, other):
         
-        # Add the grid to the list
-        grid_list.append(values)
+        if not isinstance(other, TripletResults):
+            return NotImplemented
         
-    # Close the file
-    grid_file.close()
+        return vars(self) == vars(other)
     
-    return grid_list
+    def __repr__(self):
+        return _repr(self)
 
 
-def cl_interface():
+class GridResults(object):
+    """ The results of the fine or coarse analysis of a triplet of grids. If
+    the order of convergence could not be found only the refinement ratios
+    are available.
+    """
     
-    # Prepare command line parser
-    desStr = "Perform grid convergence study on input file."
+    __slots__ = ("_results", "_values", "_analytic")
     
-    parser = argparse.ArgumentParser(description=desStr)
+    _names = (("e_approx", "e_a"),
+              ("e_extrap", "e_ext"),
+              ("f_exact", "f_exact"),
+              ("gci_coarse", "gci_c"),
+              ("gci_fine", "gci_f"))
     
-    parser.add_argument("-o", "--out",
-                        type=str,
-                        help=("output file path"),
-                        default='verify_report.txt')
-                        
-    parser.add_argument("-a", "--analytical",
-                        type=str,
-                        help=("Expected analytical value"))
-                        
-    parser.add_argument("file",
-                        type=str,
-                        help=("Input file path"))
+    _analytic_names = (("e_analytic", "e_anal"),
+                       ("f_analytic", "f_anal"),
+                       ("f_delta", "f_delta"))
     
-    args = parser.parse_args()
+    _keys = dict(_names)
+    _analytic_keys = dict(_analytic_names)
     
-    in_path = args.file
-    out_path = args.out 
-    analytical = args.analytical
+    def __init__(self, results, values, analytic):
+        
+        self._results = results
+        self._values = values
+        self._analytic = analytic
+        
+        return
+    
+    @property
+    def __dict__(self):
+        
+        results = self._results
+        values = self._values
+        
+        attributes = {"r21": results.ratio_21,
+                      "r32": results.ratio_32}
+        
+        if values is None: return attributes
+        
+        for name, key in self._names:
+            attributes[name] = getattr(values, key)
+        
+        attributes["p"] = results.p
+        
+        if self._analytic:
+            for name, key in self._analytic_names:
+                attributes[name] = getattr(values, key)
+        
+        return attributes
+    
+    def __getattr__(self, name):
+        
+        # Look up the single attribute, rather than building __dict__
+        if name == "r21": return self._results.ratio_21
+        if name == "r32": return self._results.ratio_32
+        
+        if name.startswith("_") or self._values is None:
+            raise AttributeError(name)
+        
+        if name == "p": return self._results.p
+        if name in self._keys: return getattr(self._values, self._keys[name])
+        
+        if self._analytic and name in self._analytic_keys:
+            return getattr(self._values, self._analytic_keys[name])
+        
+        raise AttributeError(name)
+    
+    def __eq__(self, other):
+        
+        if not isinstance(other, GridResults):
+            return NotImplemented
+        
+        return vars(self) == vars(other)
+    
+    def __repr__(self):
+        return _repr(self)
+
+
+class ResultsView(object):
+    """ A view of a range of the items of a Convergence object, as returned
+    by slicing. Results are fetched from the Convergence object when they are
+    accessed.
+    """
+    
+    __slots__ = ("_convergence", "_range")
+    
+    def __init__(self, convergence, tripdexes):
+        
+        self._convergence = convergence
+        self._range = tripdexes
+        
+        return
+    
+    def __len__(self):
+        return len(self._range)
+    
+    def __getitem__(self, key):
+        
+        if isinstance(key, slice):
+            return ResultsView(self._convergence, self._range[key])
+        
+        try:
+            tripdex = self._range[key]
+        except TypeError:
+            raise TypeError(type(key))
+        
+        return self._convergence[tripdex]
+    
+    def __repr__(self):
+        return "ResultsView(%r)" % list(self)
+
+
+class _TripletValues(object):
+    
+    __slots__ = ("ratio_21", "ratio_32", "p", "fine", "coarse", "assym_ratio")
+    
+    def __init__(self, ratio_21, ratio_32, p):
+        
+        self.ratio_21 = ratio_21
+        self.ratio_32 = ratio_32
+        self.p = p
+        self.fine = None
+        self.coarse = None
+        self.assym_ratio = None
+        
+        return
+
+
+class _GridValues(object):
+    
+    __slots__ = ("f_exact", "e_a", "e_ext", "gci_f", "gci_c",
+                 "f_anal", "f_delta", "e_anal")
+    
+    def __init__(self, f_exact, e_a, e_ext, gci_f, gci_c):
+        
+        self.f_exact = f_exact
+        self.e_a = e_a
+        self.e_ext = e_ext
+        self.gci_f = gci_f
+        self.gci_c = gci_c
+        self.f_anal = None
+        self.f_delta = None
+        self.e_anal = None
+        
+        return
+
+
+# Message for triplets which can not be solved (see convergence_class)
+_DEGENERATE_MESSAGE = "Degenerate triplet: the fine and middle values are equal"
+
+
+def _calc_order(value_1, value_2, value_3, ratio_21, ratio_32, method):
+    
+    """ Calculate the order of convergence, returning p (or None) and the
+    failure code and message (or None). Degenerate triplets are not passed
+    to the solver, as in order_of_convergence_array.
+    """
+    
+    if convergence_class(value_1, value_2, value_3) == DEGENERATE:
+        return None, (ORDER_INVALID, _DEGENERATE_MESSAGE)
+    
+    try:
+        p = order_of_convergence(value_1,
+                                 value_2,
+                                 value_3,
+                                 ratio_21,
+                                 ratio_32,
+                                 method=method)
+    except ArithmeticError as e:
+        return None, (ORDER_INVALID, str(e))
+    except RuntimeError as e:
+        return None, (ORDER_DIVERGED, str(e))
+    
+    return p, None
+
+
+def _calc_values(value_one, value_two, ratio, p):
+    
+    """ Calculate the extrapolated value, relative and extrapolated relative
+    error and GCI fine and coarse for a pair of grids, returning the values
+    and the failure code and message (or None).
+    """
+    
+    # Default the values to None
+    f_exact = e21a = e21ext = gci_f = gci_c = None
+    
+    # Perform Richardson extrapolation to estimate a zero grid value.
+    try:
+        f_exact = richardson_extrapolate(value_one, value_two, ratio, p)
+    except ArithmeticError as e:
+        return ((f_exact, e21a, e21ext, gci_f, gci_c),
+                (EXTRAPOLATION, str(e)))
+    
+    # Get the approximate and extrapolated relative errors
+    try:
+        e21a, e21ext = error_estimates(value_one, value_two, f_exact)
+    except ArithmeticError as e:
+        return ((f_exact, e21a, e21ext, gci_f, gci_c),
+                (ERROR_ESTIMATE, str(e)))
+    
+    # Get the gcis
+    try:
+        gci_f, gci_c = gci(ratio, e21a, p)
+    except ArithmeticError as e:
+        return ((f_exact, e21a, e21ext, gci_f, gci_c),
+                (GCI, str(e)))
+    
+    return (f_exact, e21a, e21ext, gci_f, gci_c), None
+
+
+def _encode_results(results):
+    
+    # Convert triplet results to a flat list, for storage in a cache. The
+    # fine and coarse values are missing if p was not found.
+    values = [results.ratio_21, results.ratio_32, results.p,
+              results.assym_ratio]
+    
+    for grid_values in (results.fine, results.coarse):
+        
+        if grid_values is None:
+            values.extend(_MISSING_GRID_VALUES)
+        else:
+            values.extend([getattr(grid_values, name)
+                                        for name in _GridValues.__slots__])
+    
+    return values
+
+
+def _decode_results(values):
+    
+    results = _TripletValues(*values[:3])
+    results.assym_ratio = values[3]
+    
+    if results.p is None: return results
+    
+    n_values = len(_GridValues.__slots__)
+    
+    for name, start in (("fine", 4), ("coarse", 4 + n_values)):
+        
+        decoded = _GridValues(*values[start:start + 5])
+        (decoded.f_anal,
+         decoded.f_delta,
+         decoded.e_anal) = values[start + 5:start + n_values]
+        
+        setattr(results, name, decoded)
+    
+    return results
+
+
+_MISSING_GRID_VALUES = [None] * len(_GridValues.__slots__)
+
+
+# Fields of the array returned by Convergence.to_numpy. The other fields are
+# given with their column in the rows of sizes, values and encoded results
+# and whether they require an analytical value.
+_ARRAY_GRID_FIELDS = ("grid_1", "grid_2", "grid_3")
+_ARRAY_FIELDS = (("size_1", 0, False),
+                 ("size_2", 1, False),
+                 ("size_3", 2, False),
+                 ("value_1", 3, False),
+                 ("value_2", 4, False),
+                 ("value_3", 5, False),
+                 ("r21", 6, False),
+                 ("r32", 7, False),
+                 ("p", 8, False),
+                 ("asymptotic_ratio", 9, False),
+                 ("fine_f_exact", 10, False),
+                 ("fine_e_approx", 11, False),
+                 ("fine_e_extrap", 12, False),
+                 ("fine_gci_fine", 13, False),
+                 ("fine_gci_coarse", 14, False),
+                 ("fine_f_analytic", 15, True),
+                 ("fine_f_delta", 16, True),
+                 ("fine_e_analytic", 17, True),
+                 ("coarse_f_exact", 18, False),
+                 ("coarse_e_approx", 19, False),
+                 ("coarse_e_extrap", 20, False),
+                 ("coarse_gci_fine", 21, False),
+                 ("coarse_gci_coarse", 22, False),
+                 ("coarse_f_analytic", 23, True),
+                 ("coarse_f_delta", 24, True),
+                 ("coarse_e_analytic", 25, True))
+
+
+# Distributions given by Convergence.get_distribution, with the fields of
+# Convergence.to_numpy that they summarise
+_DISTRIBUTION_FIELDS = (("p", "p"),
+                        ("gci_fine", "fine_gci_fine"),
+                        ("gci_coarse", "fine_gci_coarse"))
+
+
+def results_dtype(analytic=False):
+    
+    """ Return the fields of the structured array returned by
+    Convergence.to_numpy, as a list of (name, type) pairs, including the
+    analytical fields if analytic is True.
+    """
+    
+    dtype = [(name, "i8") for name in _ARRAY_GRID_FIELDS]
+    dtype += [(name, "f8") for name, _, is_analytic in _ARRAY_FIELDS
+                                            if analytic or not is_analytic]
+    
+    return dtype
+
+
+def _grids_string(tripdex):
+    return '%d %d %d' % (tripdex + 1, tripdex + 2, tripdex + 3)
+
+
+def _label_order(n_triplets):
+    
+    """ Yield the triplet indices in the sorted order of their grid labels,
+    as used by the report tables. The labels start with the number of the
+    first grid followed by a space, so they sort in the lexical order of
+    the numbers 1 to n_triplets, which is found without sorting.
+    """
+    
+    number = 1
+    
+    for _ in range(n_triplets):
+        
+        yield number - 1
+        
+        if number * 10 <= n_triplets:
+            number *= 10
+            continue
+        
+        while number % 10 == 9 or number >= n_triplets:
+            number //= 10
+        
+        number += 1
+
+
+def _write_lines(fileobj, lines, chunk_size=1000):
+    
+    """ Write the given lines to fileobj, separated by new lines, as in
+    "\\n".join(lines), collecting them into chunks of chunk_size lines.
+    """
+    
+    chunk = []
+    separator = ''
+    
+    for line in lines:
+        
+        chunk.append(line)
+        
+        if len(chunk) < chunk_size: continue
+        
+        fileobj.write(separator + "\n".join(chunk))
+        chunk = []
+        separator = '\n'
+    
+    if chunk: fileobj.write(separator + "\n".join(chunk))
+    
+    return
+
+
+def _repr(obj):
+    
+    kwargs = ", ".join("%s=%r" % item for item in vars(obj).items())
+    
+    return "%s(%s)" % (type(obj).__name__, kwargs)
+
+
+def main(in_path, out_path, analytical=None, wide=False, cache=None,
+                            out_format="text"):
+    
+    """ Run a convergence study on the given input file and write the
+    report to out_path. If out_format is "feather" or "parquet", the results
+    are written as a columnar file instead (see convergence.columnar).
+    """
+    
+    convergence = _run_study(in_path, analytical, wide, cache)
+    
+    if out_format != "text":
+        
+        from .columnar import write_results
+        
+        write_results(out_path,
+                      [(in_path, convergence)],
+                      out_format,
+                      analytical is not None)
+        
+        return
+    
+    # Write the report
+    with open(out_path, 'w') as f:
+        convergence.write_report(f)
+    
+    return
+
+
+def batch_main(in_paths, out_path=None, out_dir=None, analytical=None,
+                          wide=False, jobs=1, cache=None, out_format="text"):
+    
+    """ Run a convergence study for each of the given input files in one
+    process. If out_dir is given, a report is written for each input file
+    into out_dir, named after the input file. Otherwise all of the reports
+    are written to out_path, each headed by the name of its input file. If
+    jobs is greater than one, the input files are spread across a pool of
+    that many processes. The reports are always written in the order of
+    in_paths. If cache is given, it is the path of a ResultCache database
+    used for the studies. If out_format is "feather" or "parquet", the results
+    are written as columnar files rather than reports.
+    """
+    
+    if out_dir is None and out_path is None:
+        raise ValueError("One of out_path or out_dir must be given")
+    
+    if out_dir is not None:
+        
+        out_paths = [os.path.join(out_dir, _report_name(in_path,
+                                                        out_format))
+                                                    for in_path in in_paths]
+        
+        if len(set(out_paths)) != len(out_paths):
+            raise ValueError("Input files with the same name can not be "
+                             "written to the same directory")
+        
+        if not os.path.isdir(out_dir): os.makedirs(out_dir)
+    
+    n_paths = len(in_paths)
+    
+    if jobs > 1 and n_paths > 1:
+        
+        from concurrent.futures import ProcessPoolExecutor
+        
+        if out_format == "text":
+            worker = make_report
+        else:
+            worker = make_results
+        
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            
+            reports = executor.map(worker,
+                                   in_paths,
+                                   [analytical] * n_paths,
+                                   [wide] * n_paths,
+                                   [cache] * n_paths,
+                                   chunksize=max(n_paths // (4 * jobs), 1))
+            
+            _write_reports(in_paths,
+                           reports,
+                           out_path,
+                           out_dir,
+                           analytical,
+                           out_format)
+    
+    else:
+        
+        # Stream each report rather than building it in memory
+        studies = (_run_study(in_path, analytical, wide, cache)
+                                                    for in_path in in_paths)
+        _write_reports(in_paths,
+                       studies,
+                       out_path,
+                       out_dir,
+                       analytical,
+                       out_format)
+    
+    return
+
+
+def make_report(in_path, analytical=None, wide=False, cache=None):
+    
+    """ Run a convergence study on the given input file and return the
+    report.
+    """
+    
+    return str(_run_study(in_path, analytical, wide, cache))
+
+
+def make_results(in_path, analytical=None, wide=False, cache=None):
+    
+    """ Run a convergence study on the given input file and return a list of
+    (metric name, array) pairs, with the arrays given by
+    Convergence.to_numpy. Requires NumPy.
+    """
+    
+    study = _run_study(in_path, analytical, wide, cache)
+    
+    if isinstance(study, Convergence):
+        convergences = [study]
+    else:
+        convergences = [study[name] for name in study]
+    
+    return [(convergence.met_name, convergence.to_numpy())
+                                            for convergence in convergences]
+
+
+def _run_study(in_path, analytical=None, wide=False, cache=None):
+    
+    if wide:
+        
+        from .sets import ConvergenceSet
+        
+        # Read in the file and run a study for each metric
+        names, main_list = wide_read(in_path)
+        convergence = ConvergenceSet(names, f_anal=analytical)
+    
+    else:
+        
+        # Read in the file
+        main_list = simple_read(in_path)
+        
+        if cache is not None: cache = _open_cache(cache)
+        
+        # Run convergence study
+        convergence = Convergence(f_anal=analytical, cache=cache)
+    
+    convergence.add_grids(main_list)
+    
+    return convergence
+
+
+# Caches opened by this process, by path
+_caches = {}
+
+
+def _open_cache(path):
+    
+    from .cache import ResultCache
+    
+    if path not in _caches: _caches[path] = ResultCache(path)
+    
+    return _caches[path]
+
+
+def _write_reports(in_paths, reports, out_path, out_dir, analytical=None,
+                                                   out_format="text"):
+    
+    if out_format != "text":
+        _write_columnar(in_paths, reports, out_path, out_dir, analytical,
+                        out_format)
+        return
+    
+    if out_dir is not None:
+        
+        for in_path, report in zip(in_paths, reports):
+            
+            report_path = os.path.join(out_dir, _report_name(in_path))
+            
+            with open(report_path, 'w') as f:
+                _write_report(f, report)
+        
+        return
+    
+    with open(out_path, 'w') as f:
+        
+        for in_path, report in zip(in_paths, reports):
+            
+            f.write('\n')
+            f.write('=== Input file: %s === \n' % in_path)
+            _write_report(f, report)
+    
+    return
+
+
+def _write_report(fileobj, report):
+    
+    # Reports are either strings or studies that can write themselves
+    if isinstance(report, str):
+        fileobj.write(report)
+    else:
+        report.write_report(fileobj)
+    
+    return
+
+
+def _write_columnar(in_paths, studies, out_path, out_dir, analytical,
+                                                     out_format):
+    
+    from .columnar import write_results
+    
+    analytic = analytical is not None
+    
+    if out_dir is None:
+        write_results(out_path,
+                      zip(in_paths, studies),
+                      out_format,
+                      analytic)
+        return
+    
+    for in_path, study in zip(in_paths, studies):
+        
+        results_path = os.path.join(out_dir, _report_name(in_path,
+                                                          out_format))
+        write_results(results_path, [(in_path, study)], out_format, analytic)
+    
+    return
+
+
+def _report_name(in_path, out_format="text"):
+    
+    stem = os.path.splitext(os.path.basename(in_path))[0]
+    
+    if out_format == "text": return stem + "_report.txt"
+    
+    from .columnar import FORMATS
+    
+    return stem + "_results" + FORMATS[out_format]
+
+
+def expand_paths(patterns, manifest=None):
+    
+    """ Get the list of input files from the given paths or glob patterns
+    and, optionally, a manifest file listing one path or pattern per line.
+    Relative paths in the manifest are relative to its directory. Glob
+    patterns are expanded in sorted order. Raises ValueError if a pattern
+    matches no files.
+    """
+    
+    import glob
+    
+    patterns = list(patterns)
+    
+    if manifest is not None:
+        
+        manifest_dir = os.path.dirname(manifest)
+        
+        with open(manifest, 'r') as f:
+            for line in f:
+                pattern = line.split("#", 1)[0].strip()
+                if not pattern: continue
+                patterns.append(os.path.join(manifest_dir, pattern))
+    
+    in_paths = []
+    
+    for pattern in patterns:
+        
+        if not any(char in pattern for char in "*?["):
+            in_paths.append(pattern)
+            continue
+        
+        matches = sorted(glob.glob(pattern))
+        
+        if not matches:
+            raise ValueError("No files match pattern '{}'".format(pattern))
+        
+        in_paths.extend(matches)
+    
+    return in_paths
+
+
+def simple_read(file_name):
+    """ Read in grids from a simple file. """
+    
+    return [list(grid) for grid in iter_grids(file_name)]
+
+
+def iter_grids(source, comment="#"):
+    """ Yield grids, as (grid spacing, value) tuples, one at a time from a
+    simple file. The source can be a path or a file-like object. Blank lines
+    and comments are skipped and any columns after the first two are ignored.
+    """
+    
+    if hasattr(source, "read"):
+        yield from _parse_grids(source, comment)
+        return
+    
+    with open(source, 'r') as grid_file:
+        yield from _parse_grids(grid_file, comment)
+
+
+def simple_read_array(source, comment="#"):
+    """ Read grids from a simple file directly into a NumPy array of shape
+    (number of grids, 2), holding the grid spacings and values. The source
+    can be a path or a file-like object. Requires NumPy.
+    """
+    
+    import numpy as np
+    
+    return np.loadtxt(source,
+                      comments=comment,
+                      usecols=(0, 1),
+                      ndmin=2)
+
+
+def wide_read(source, comment="#"):
+    """ Read grids for several metrics from a file with a header line naming
+    the columns. The first column is the grid spacing and each further column
+    holds the values of a metric. The source can be a path or a file-like
+    object. Blank lines and comments are skipped.
+    
+    Returns a list of the metric names and a list of grids, each of the form
+    [grid spacing, value_1, value_2, ...].
+    """
+    
+    if not hasattr(source, "read"):
+        with open(source, 'r') as grid_file:
+            return wide_read(grid_file, comment)
+    
+    names = None
+    grid_list = []
+    
+    for line_num, line in enumerate(source, 1):
+        
+        # Remove comments and split the line
+        values = line.split(comment, 1)[0].split()
+        
+        if not values: continue
+        
+        if names is None:
+            names = values
+            continue
+        
+        if len(values) != len(names):
+            raise ValueError("Line {}: expected {} columns but found "
+                             "{}".format(line_num, len(names), len(values)))
+        
+        grid_list.append([float(value) for value in values])
+    
+    if names is None:
+        raise ValueError("No header line found")
+    
+    return names[1:], grid_list
+
+
+def _parse_grids(lines, comment):
+    
+    for line_num, line in enumerate(lines, 1):
+        
+        # Remove comments and split the line
+        values = line.split(comment, 1)[0].split()
+        
+        if not values: continue
+        
+        if len(values) < 2:
+            raise ValueError("Line {}: expected a grid spacing and "
+                             "value".format(line_num))
+        
+        try:
+            grid = float(values[0]), float(values[1])
+        except ValueError:
+            raise ValueError("Line {}: expected numbers but found "
+                             "{!r}".format(line_num,
+                                          line.rstrip("\n"))) from None
+        
+        yield grid
+
+
+def cl_interface():
+    
+    import argparse
+    
+    # Prepare command line parser
+    desStr = ("Perform grid convergence study on input files. Reports for "
+              "multiple input files are written to the output file in turn, "
+              "unless an output directory is given.")
+    
+    parser = argparse.ArgumentParser(description=desStr)
+    
+    parser.add_argument("-o", "--out",
+                        type=str,
+                        help=("output file path (default: "
+                              "verify_report.txt, or verify_results with "
+                              "the extension of the format)"))
+    
+    parser.add_argument("-d", "--out-dir",
+                        type=str,
+                        help=("write one report per input file to this "
+                              "directory"))
+                        
+    parser.add_argument("-a", "--analytical",
+                        type=str,
+                        help=("Expected analytical value"))
+    
+    parser.add_argument("-w", "--wide",
+                        help=("input file has a header and one column per "
+                              "metric (requires NumPy)"),
+                        action="store_true")
+    
+    parser.add_argument("-f", "--format",
+                        choices=("text", "feather", "parquet"),
+                        help=("output format; feather and parquet write "
+                              "the results of each triplet as columns "
+                              "(requires NumPy and pyarrow)"),
+                        default="text")
+    
+    parser.add_argument("-m", "--manifest",
+                        type=str,
+                        help=("file listing input file paths or glob "
+                              "patterns, one per line"))
+    
+    parser.add_argument("--cache",
+                        help=("load and store results in the result cache, "
+                              "results.sqlite in $CONVERGENCE_CACHE_DIR or "
+                              "~/.cache/convergence"),
+                        action="store_true")
+    
+    parser.add_argument("--cache-path",
+                        type=str,
+                        help=("path of the result cache database (implies "
+                              "--cache)"))
+    
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        help=("number of processes used for multiple input "
+                              "files"),
+                        default=1)
+                        
+    parser.add_argument("files",
+                        type=str,
+                        nargs="*",
+                        help=("Input file paths or glob patterns"))
+    
+    args = parser.parse_args()
+    
+    if not args.files and args.manifest is None:
+        parser.error("at least one input file or a manifest is required")
+    
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    
+    if args.wide and (args.cache or args.cache_path is not None):
+        parser.error("the result cache can not be used with --wide")
+    
+    try:
+        in_paths = expand_paths(args.files, args.manifest)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    out_path = args.out
+    out_format = args.format
+    
+    if out_path is None:
+        out_path = _report_name("verify", out_format)
+    
+    analytical = args.analytical
+    wide = args.wide
+    
+    if args.cache_path is not None:
+        cache = args.cache_path
+    elif args.cache:
+        from .cache import default_cache_dir
+        cache = os.path.join(default_cache_dir(), "results.sqlite")
+    else:
+        cache = None
     
-    main(in_path, out_path, analytical)
+    if len(in_paths) == 1 and args.out_dir is None:
+        main(in_paths[0], out_path, analytical, wide, cache, out_format)
+    else:
+        batch_main(in_paths,
+                   out_path,
+                   args.out_dir,
+                   analytical,
+                   wide,
+                   args.jobs,
+                   cache,
+                   out_format)
     
     return
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+ -- convergence package  -------------------------------------------------------
+
+   An in-memory, least recently used cache of the calculations for triplets
+   of grids, which can be shared between Convergence objects.
+
+ --------------------------------------------------------------------------
+"""
+
+from collections import OrderedDict
+
+
+class TripletMemo(object):
+    """ A bounded, least recently used cache of the order of convergence and
+    the derived values calculated by Convergence objects. The entries are
+    keyed by the grid values, refinement ratios and solver method (or order
+    of convergence), so the same memo can be shared by studies with
+    different analytical values or overlapping grids. At most maxsize
+    entries are kept, or any number if maxsize is None.
+    
+    The number of lookups found in the memo and calculated afresh are given
+    by the hits and misses attributes.
+    """
+    
+    def __init__(self, maxsize=4096):
+        
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("maxsize must be None or at least zero")
+        
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        
+        return
+    
+    def lookup(self, key, func, *args):
+        
+        """ Return the stored result for the given key or, if not found,
+        store and return the result of func(*args).
+        """
+        
+        try:
+            result = self._entries[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return result
+        
+        self.misses += 1
+        result = func(*args)
+        self._entries[key] = result
+        
+        if self.maxsize is not None and len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        
+        return result
+    
+    def info(self):
+        
+        """ Return a dictionary of the hits, misses, maximum size and current
+        size of the memo.
+        """
+        
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "maxsize": self.maxsize,
+                "currsize": len(self._entries)}
+    
+    def clear(self):
+        
+        self.hits = 0
+        self.misses = 0
+        self._entries.clear()
+        
+        return
+    
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+ -- convergence package  -------------------------------------------------------
+
+   Accumulates global norms of the errors and GCIs of solution fields, which
+   are given in chunks of points, so that the full fields of results never
+   need to be stored.
+
+ --------------------------------------------------------------------------
+"""
+
+import argparse
+import warnings
+
+import numpy as np
+
+from .fields import (_CLASS,
+                     _COARSE,
+                     _FINE,
+                     _ASSYM_RATIO,
+                     _N_RESULTS,
+                     _P,
+                     _solve_points)
+from .functions import CLASS_NAMES
+from .sketches import QuantileSketch
+
+# Quantities reduced for the fine and coarse analyses, with their position
+# in the values of each analysis
+QUANTITIES = (("e_approx", 1),
+              ("e_extrap", 2),
+              ("gci_fine", 3),
+              ("gci_coarse", 4))
+
+# Distributions collected for each triplet, with their row in the solved
+# results
+DISTRIBUTIONS = (("p", _P),
+                 ("gci_fine", _FINE.start + 3),
+                 ("gci_coarse", _FINE.start + 4))
+
+
+class FieldNorms(object):
+    """ Accumulate the volume-weighted L1, L2 and Linf norms of e_approx,
+    e_extrap, gci_fine and gci_coarse, for the fine and coarse analyses of
+    each triplet of grids, and the fraction of points in the asymptotic
+    range. The fields are given in chunks of points using add_chunk and the
+    memory used does not depend on the number of points.
+    
+    The L1 and L2 norms are the volume-weighted mean of the absolute values
+    and the root of the volume-weighted mean of the squares. Points where a
+    quantity could not be calculated are left out of its norms. A point is in
+    the asymptotic range if its asymptotic ratio is within asymptotic_tol of
+    one. Points with values below zero_tol are treated as in
+    FieldConvergence. The number of points in each class of convergence
+    (see convergence.arrays.classify_array) is also counted.
+    
+    FieldNorms objects for the same grids, such as those filled by separate
+    processes, can be combined using merge.
+    
+    If distribution is True, the distributions of the order of convergence
+    and of gci_fine and gci_coarse for the fine analysis are also collected
+    in a QuantileSketch (see convergence.sketches) for each triplet. The
+    sketches are given by the distribution attribute of each item.
+    """
+    
+    def __init__(self, grid_spacings, zero_tol=1E-4, asymptotic_tol=0.1,
+                       distribution=False):
+        
+        spacings = np.asarray(grid_spacings, dtype=float)
+        
+        if spacings.ndim != 1:
+            raise ValueError("grid_spacings must be one dimensional")
+        
+        if len(spacings) < 3:
+            warnings.warn("Insufficient grids for analysis")
+        
+        self._order = np.argsort(spacings, kind="stable")
+        self._spacings = spacings[self._order]
+        self._zero_tol = zero_tol
+        self._asymptotic_tol = asymptotic_tol
+        
+        n_triplets = max(len(spacings) - 2, 0)
+        shape = (n_triplets, 2, len(QUANTITIES))
+        
+        # Sums of the weights, weighted absolute values and weighted squares
+        self._sums = np.zeros(shape + (3,))
+        self._max = np.full(shape, np.nan)
+        self._counts = np.zeros(shape, dtype=np.int64)
+        self._n_points = 0
+        self._n_asymptotic = np.zeros(n_triplets, dtype=np.int64)
+        self._class_counts = np.zeros((n_triplets, len(CLASS_NAMES)),
+                                      dtype=np.int64)
+        
+        if distribution:
+            self._sketches = [{name: QuantileSketch()
+                                    for name, _ in DISTRIBUTIONS}
+                                            for _ in range(n_triplets)]
+        else:
+            self._sketches = None
+        
+        return
+    
+    def add_chunk(self, values, volumes=None):
+        
+        """ Add a chunk of points. The values are given as an array of shape
+        (n_grids, n_points), in the same order as the grid spacings. The
+        volumes, if given, weight each point and are of shape (n_points,),
+        or (n_grids, n_points) to give the volumes of each grid. In the latter
+        case, the fine analysis of a triplet uses the volumes of its finest
+        grid and the coarse analysis uses its middle grid.
+        """
+        
+        values = np.asarray(values, dtype=float)
+        
+        if values.ndim != 2 or len(values) != len(self._spacings):
+            raise ValueError("values must have one row per grid spacing")
+        
+        n_points = values.shape[1]
+        
+        if volumes is None:
+            volumes = np.ones(n_points)
+        else:
+            volumes = np.asarray(volumes, dtype=float)
+        
+        if volumes.shape == values.shape:
+            volumes = volumes[self._order]
+        elif volumes.shape != (n_points,):
+            raise ValueError("volumes must have one value per point, or "
+                             "one row per grid spacing")
+        
+        values = values[self._order]
+        out = np.empty((_N_RESULTS, n_points))
+        
+        for tripdex in range(len(self._n_asymptotic)):
+            
+            sizes = self._spacings[tripdex:tripdex + 3]
+            
+            _solve_points(values[tripdex:tripdex + 3],
+                          float(sizes[1] / sizes[0]),
+                          float(sizes[2] / sizes[1]),
+                          self._zero_tol,
+                          out)
+            
+            for analysis, rows in enumerate((_FINE, _COARSE)):
+                
+                if volumes.ndim == 1:
+                    weights = volumes
+                else:
+                    weights = volumes[tripdex + analysis]
+                
+                self._add_norms(tripdex, analysis, out[rows], weights)
+            
+            assym_ratio = out[_ASSYM_RATIO]
+            
+            with np.errstate(invalid="ignore"):
+                in_range = (np.abs(assym_ratio - 1) <=
+                                                    self._asymptotic_tol)
+            
+            self._n_asymptotic[tripdex] += np.count_nonzero(in_range)
+            self._class_counts[tripdex] += np.bincount(
+                                            out[_CLASS].astype(np.intp),
+                                            minlength=len(CLASS_NAMES))
+            
+            if self._sketches is None: continue
+            
+            for name, row in DISTRIBUTIONS:
+                self._sketches[tripdex][name].add(out[row])
+        
+        self._n_points += n_points
+        
+        return
+    
+    def _add_norms(self, tripdex, analysis, results, weights):
+        
+        for quantity, (_, row) in enumerate(QUANTITIES):
+            
+            values = np.abs(results[row])
+            valid = np.isfinite(values)
+            
+            if not valid.any(): continue
+            
+            values = values[valid]
+            weight = weights[valid]
+            
+            sums = self._sums[tripdex, analysis, quantity]
+            sums[0] += weight.sum()
+            sums[1] += np.dot(weight, values)
+            sums[2] += np.dot(weight, values * values)
+            
+            self._max[tripdex, analysis, quantity] = np.fmax(
+                                self._max[tripdex, analysis, quantity],
+                                values.max())
+            self._counts[tripdex, analysis, quantity] += len(values)
+        
+        return
+    
+    def merge(self, other):
+        
+        """ Add the points accumulated by another FieldNorms object for the
+        same grids.
+        """
+        
+        if (not np.array_equal(self._spacings, other._spacings) or
+            self._zero_tol != other._zero_tol or
+            self._asymptotic_tol != other._asymptotic_tol or
+            (self._sketches is None) != (other._sketches is None)):
+            raise ValueError("FieldNorms objects must have the same grids, "
+                             "tolerances and distribution setting")
+        
+        if self._sketches is not None:
+            for sketches, other_sketches in zip(self._sketches,
+                                                other._sketches):
+                for name, _ in DISTRIBUTIONS:
+                    sketches[name].merge(other_sketches[name])
+        
+        self._sums += other._sums
+        self._max = np.fmax(self._max, other._max)
+        self._counts += other._counts
+        self._n_points += other._n_points
+        self._n_asymptotic += other._n_asymptotic
+        self._class_counts += other._class_counts
+        
+        return
+    
+    def _get_nsdict(self, tripdex, analysis):
+        
+        nsdict = {}
+        
+        for quantity, (name, _) in enumerate(QUANTITIES):
+            
+            weight, abs_sum, sq_sum = self._sums[tripdex, analysis, quantity]
+            
+            if weight > 0:
+                l1 = abs_sum / weight
+                l2 = np.sqrt(sq_sum / weight)
+            else:
+                l1 = l2 = np.nan
+            
+            nsdict[name] = argparse.Namespace(
+                            l1=float(l1),
+                            l2=float(l2),
+                            linf=float(self._max[tripdex, analysis, quantity]),
+                            n_points=int(self._counts[tripdex,
+                                                      analysis,
+                                                      quantity]))
+        
+        return nsdict
+    
+    def __len__(self):
+        
+        return len(self._n_asymptotic)
+    
+    def __getitem__(self, key):
+        
+        if not isinstance(key, int):
+            raise TypeError(type(key))
+        
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        
+        if self._n_points:
+            fraction = self._n_asymptotic[key] / self._n_points
+        else:
+            fraction = np.nan
+        
+        grids_string = '%d %d %d' % (key + 1, key + 2, key + 3)
+        
+        nspace = argparse.Namespace(
+                        grids=grids_string,
+                        sizes=self._spacings[key:key + 3].tolist(),
+                        fine=argparse.Namespace(**self._get_nsdict(key, 0)),
+                        coarse=argparse.Namespace(**self._get_nsdict(key, 1)),
+                        asymptotic_fraction=float(fraction),
+                        class_counts=dict(zip(
+                                        CLASS_NAMES,
+                                        self._class_counts[key].tolist())),
+                        n_points=self._n_points)
+        
+        if self._sketches is not None:
+            nspace.distribution = argparse.Namespace(**self._sketches[key])
+        
+        return nspace
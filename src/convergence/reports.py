@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+ -- convergence package  -------------------------------------------------------
+
+   Reads reports written by the Convergence class back into Table objects,
+   so that reports from separate runs can be merged and written again
+   without repeating the analysis.
+
+ --------------------------------------------------------------------------
+"""
+
+from itertools import islice
+
+from .tables import Table
+
+_METRIC_PREFIX = '--- Examining metric:'
+_GRIDS_PREFIX = 'Number of grids to be examined'
+_INPUT_PREFIX = '=== Input file:'
+
+_TABLE_TITLES = {'Discretisation errors for fine grids:': "fine",
+                 'Discretisation errors for coarse grids:': "coarse",
+                 'Asymptotic ratio test:': "ratios",
+                 'Convergence classes:': "classes",
+                 'Distribution over triplets for fine grids:': "distribution"}
+
+
+class Report(object):
+    """ The contents of the report for one metric, as written by a
+    Convergence object. The grids are held as a list of (grid spacing,
+    value) pairs and the fine, coarse, ratios, classes and distribution
+    tables as Table objects. Printing a Report gives the same text as the
+    original report.
+    """
+    
+    def __init__(self, met_name=None, input_path=None):
+        
+        self.met_name = met_name
+        self.input_path = input_path
+        self.grids = []
+        self.fine = Table('Grids')
+        self.coarse = Table('Grids')
+        self.ratios = Table('Grids')
+        self.classes = Table('Class')
+        self.distribution = Table('Statistic')
+        
+        return
+    
+    def merge(self, report):
+        
+        """ Merge another report into this one. The grid triplets are labelled
+        by the position of their grids, so the grids of one report must be
+        the first grids of the other, and the longer list of grids is kept.
+        The records of each table are added with Table.merge, so the values
+        for existing grid triplets are updated and new triplets are added.
+        The counts of the convergence classes are those of the report with
+        the most grids, as its triplets include those of the other report.
+        The distribution over the triplets can not be found from the
+        distributions of each report, so it is dropped from merged reports.
+        A ValueError is raised if the grids conflict.
+        """
+        
+        n_shared = min(len(self.grids), len(report.grids))
+        
+        if self.grids[:n_shared] != report.grids[:n_shared]:
+            
+            err_str = ("Reports for metric {} can not be merged as their "
+                       "grids differ").format(self.met_name)
+            raise ValueError(err_str)
+        
+        # The classes of the report with the most grids count every triplet
+        if (len(report.grids) > len(self.grids) or
+            (len(report.grids) == len(self.grids) and len(report.classes))):
+            self.classes = Table('Class')
+            self.classes.merge(report.classes)
+        
+        if len(report.grids) > n_shared:
+            self.grids = list(report.grids)
+        
+        self.fine.merge(report.fine)
+        self.coarse.merge(report.coarse)
+        self.ratios.merge(report.ratios)
+        self.distribution = Table('Statistic')
+        
+        return
+    
+    def _iter_report(self):
+        
+        yield ''
+        
+        # Check if the metric is named
+        if self.met_name is not None:
+            yield '--- Examining metric: %24s --- ' % self.met_name
+            yield ''
+        
+        yield 'Number of grids to be examined = %d ' % len(self.grids)
+        yield ''
+        
+        if self.grids:
+            
+            yield '     Grid Size     Quantity '
+            yield ''
+            
+            for grid in self.grids:
+                yield '%13.6f %13.6f ' % grid
+            
+            yield ''
+        
+        if len(self.fine):
+            
+            for title, table, col_width in (
+                        ('Discretisation errors for fine grids: ',
+                         self.fine,
+                         12),
+                        ('Discretisation errors for coarse grids: ',
+                         self.coarse,
+                         12),
+                        ('Asymptotic ratio test: ', self.ratios, 16)):
+                
+                yield ''
+                yield title
+                yield ''
+                yield from table.write(col_width, 6)
+            
+            # Reports written before the classes were added have none
+            if len(self.classes):
+                yield ''
+                yield 'Convergence classes: '
+                yield ''
+                yield from self.classes.write(12, 0, row_sort=False)
+            
+            if len(self.distribution):
+                yield ''
+                yield 'Distribution over triplets for fine grids: '
+                yield ''
+                yield from self.distribution.write(12, 6, row_sort=False)
+        
+        else:
+            
+            yield ' *** Insufficient grids for analysis *** '
+            yield ''
+    
+    def __str__(self):
+        
+        return "\n".join(self._iter_report())
+
+
+def read_report(source):
+    
+    """ Read a report written by Convergence, ConvergenceSet or the command
+    line interface (including reports for many input files) and return a
+    list of Report objects, one for each metric. The source can be a path or
+    a file-like object.
+    """
+    
+    if hasattr(source, "read"):
+        text = source.read()
+    else:
+        with open(source, 'r') as report_file:
+            text = report_file.read()
+    
+    lines = text.split('\n')
+    reports = []
+    report = None
+    input_path = None
+    linedex = 0
+    
+    while linedex < len(lines):
+        
+        line = lines[linedex]
+        stripped = line.strip()
+        linedex += 1
+        
+        if stripped.startswith(_INPUT_PREFIX):
+            
+            input_path = stripped[len(_INPUT_PREFIX):-len('===')].strip()
+            report = None
+        
+        elif stripped.startswith(_METRIC_PREFIX):
+            
+            met_name = stripped[len(_METRIC_PREFIX):-len('---')].strip()
+            report = Report(met_name, input_path)
+            reports.append(report)
+        
+        elif stripped.startswith(_GRIDS_PREFIX):
+            
+            # Unnamed metrics start at the number of grids
+            if report is None or report.grids:
+                report = Report(input_path=input_path)
+                reports.append(report)
+        
+        elif stripped == 'Grid Size     Quantity':
+            
+            linedex = _read_grids(lines, linedex + 1, report)
+        
+        elif stripped in _TABLE_TITLES:
+            
+            table = getattr(report, _TABLE_TITLES[stripped])
+            linedex = table.read(lines, linedex + 1)
+    
+    return reports
+
+
+def merge_reports(*report_lists):
+    
+    """ Merge lists of Report objects, as returned by read_report, matching
+    the reports by input file path and metric name. The reports in the
+    first list are updated and any reports not found in the first list are
+    added to the end.
+    """
+    
+    merged = list(report_lists[0]) if report_lists else []
+    named = {(report.input_path, report.met_name): report
+                                                        for report in merged}
+    
+    for reports in report_lists[1:]:
+        
+        for report in reports:
+            
+            key = (report.input_path, report.met_name)
+            
+            if key in named:
+                named[key].merge(report)
+            else:
+                named[key] = report
+                merged.append(report)
+    
+    return merged
+
+
+def _read_grids(lines, linedex, report):
+    
+    for line in islice(lines, linedex, None):
+        
+        words = line.split()
+        if not words: break
+        
+        report.grids.append((float(words[0]), float(words[1])))
+        linedex += 1
+    
+    return linedex
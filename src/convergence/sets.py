@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+ -- convergence package  -------------------------------------------------------
+
+   Performs the calculations of the Convergence class for several metrics
+   which share the same grids, such as the columns of a wide input file.
+
+ --------------------------------------------------------------------------
+"""
+
+import warnings
+from math import isfinite
+
+import numpy as np
+
+from .arrays import (CONVERGED,
+                     DIVERGED,
+                     order_of_convergence_array,
+                     triplet_values_array)
+from .diagnostics import (ASYMPTOTIC_RATIO,
+                          ERROR_ESTIMATE,
+                          EXTRAPOLATION,
+                          GCI,
+                          MISSING_RESULT,
+                          ORDER_DIVERGED,
+                          ORDER_INVALID)
+from .interface import Convergence, _write_lines
+
+# Message for failures found in the array calculations
+_MESSAGE = "Calculation produced a non-finite value"
+
+
+class ConvergenceSet(object):
+    """ Calculate convergence for several metrics using the same grids. Each
+    grid is of the form [grid spacing, value_1, value_2, ...] with one value
+    per metric name. The results for each metric are held in a Convergence
+    object, which is accessed by name.
+    
+    The refinement ratios and grid triplets are found once and, for all
+    metrics that use every grid, the order of convergence and derived values
+    are calculated together as arrays. Metrics where some values are below
+    zero_tol have different triplets and are calculated separately.
+    
+    The diagnostics and distribution arguments are passed to the Convergence
+    object of each metric. Give a Diagnostics object to collect the failures
+    of all metrics together.
+    """
+    
+    def __init__(self, names, f_anal=None, zero_tol=1E-4,
+                       diagnostics="warnings", distribution=False):
+        
+        self.names = list(names)
+        self._convergences = {name: Convergence(met_name=name,
+                                                f_anal=f_anal,
+                                                zero_tol=zero_tol,
+                                                lazy=True,
+                                                diagnostics=diagnostics,
+                                                distribution=distribution)
+                                                        for name in self.names}
+        
+        return
+    
+    def add_grids(self, grids):
+        
+        grids = [list(grid) for grid in grids]
+        n_columns = len(self.names) + 1
+        
+        for grid in grids:
+            if len(grid) != n_columns:
+                raise ValueError("Expected a grid spacing and {} values, "
+                                 "got {}".format(len(self.names), grid))
+        
+        # Warn once for the set, rather than once per metric
+        with warnings.catch_warnings():
+            
+            warnings.simplefilter("ignore")
+            
+            for column, name in enumerate(self.names, 1):
+                metric_grids = [(grid[0], grid[column]) for grid in grids]
+                self._convergences[name].add_grids(metric_grids)
+        
+        if len(self._convergences[self.names[0]]._grids) < 3:
+            warnings.warn("Insufficient grids for analysis")
+        
+        self._calculate()
+        
+        return
+    
+    def _calculate(self):
+        
+        batch = []
+        
+        for name in self.names:
+            
+            convergence = self._convergences[name]
+            
+            if len(convergence._numbered_grids) == len(convergence._grids):
+                batch.append(convergence)
+            else:
+                convergence._calculate()
+        
+        if not batch: return
+        
+        tripdexes = sorted(set(i for convergence in batch
+                                   for i, results in enumerate(
+                                               convergence._grid_results)
+                                                       if results is None))
+        
+        if not tripdexes: return
+        
+        # The grid spacings are shared by all metrics in the batch
+        triplets = batch[0]._grid_triplets
+        sizes = np.array([[grid[0] for grid in triplets[i]]
+                                                    for i in tripdexes],
+                         dtype=float)
+        
+        ratio_21 = sizes[:, 1] / sizes[:, 0]
+        ratio_32 = sizes[:, 2] / sizes[:, 1]
+        
+        values = np.array([[[grid[1] for grid in metric._grid_triplets[i]]
+                                                    for i in tripdexes]
+                                                        for metric in batch],
+                          dtype=float)
+        
+        p, status = order_of_convergence_array(values[..., 0],
+                                               values[..., 1],
+                                               values[..., 2],
+                                               ratio_21,
+                                               ratio_32)
+        
+        fine, coarse, assym_ratio = triplet_values_array(values[..., 0],
+                                                         values[..., 1],
+                                                         values[..., 2],
+                                                         ratio_21,
+                                                         ratio_32,
+                                                         p)
+        
+        fine = np.stack(fine, axis=-1).tolist()
+        coarse = np.stack(coarse, axis=-1).tolist()
+        assym_ratio = assym_ratio.tolist()
+        status = status.tolist()
+        p = p.tolist()
+        ratio_21 = ratio_21.tolist()
+        ratio_32 = ratio_32.tolist()
+        
+        for m, convergence in enumerate(batch):
+            
+            record = convergence.diagnostics.record
+            
+            for n, tripdex in enumerate(tripdexes):
+                
+                if status[m][n] != CONVERGED:
+                    
+                    if status[m][n] == DIVERGED:
+                        code = ORDER_DIVERGED
+                    else:
+                        code = ORDER_INVALID
+                    
+                    record(code,
+                           tripdex,
+                           "shared",
+                           "Order of convergence not found")
+                    record(MISSING_RESULT,
+                           tripdex,
+                           "ratios",
+                           "get_ratios: failed none_check, some required "
+                           "result not available")
+                    
+                    convergence._set_values(tripdex,
+                                            ratio_21[n],
+                                            ratio_32[n],
+                                            None,
+                                            None,
+                                            None,
+                                            None)
+                    
+                    continue
+                
+                fine_values, code = _clean_values(fine[m][n])
+                if code is not None: record(code, tripdex, "fine", _MESSAGE)
+                
+                coarse_values, code = _clean_values(coarse[m][n])
+                if code is not None: record(code, tripdex, "coarse", _MESSAGE)
+                
+                if fine_values[3] is None or coarse_values[3] is None:
+                    
+                    triplet_ratio = None
+                    record(MISSING_RESULT,
+                           tripdex,
+                           "ratios",
+                           "get_ratios: failed none_check, some required "
+                           "result not available")
+                
+                else:
+                    
+                    triplet_ratio = _clean(assym_ratio[m][n])
+                    
+                    if triplet_ratio is None:
+                        record(ASYMPTOTIC_RATIO, tripdex, "ratios", _MESSAGE)
+                
+                convergence._set_values(tripdex,
+                                        ratio_21[n],
+                                        ratio_32[n],
+                                        p[m][n],
+                                        fine_values,
+                                        coarse_values,
+                                        triplet_ratio)
+        
+        return
+    
+    def __len__(self):
+        
+        return len(self.names)
+    
+    def __iter__(self):
+        
+        return iter(self.names)
+    
+    def __getitem__(self, name):
+        
+        return self._convergences[name]
+    
+    def write_report(self, fileobj):
+        
+        """ Write the combined report, as given by str, to the given
+        file-like object, streaming the report of each metric in turn.
+        """
+        
+        _write_lines(fileobj, self._iter_report())
+        
+        return
+    
+    def _iter_report(self):
+        
+        for name in self.names:
+            yield from self._convergences[name]._iter_report()
+    
+    def __str__(self):
+        
+        return "\n".join(self._iter_report())
+
+
+def _clean(value):
+    
+    if not isfinite(value): return None
+    
+    return value
+
+
+def _clean_values(values):
+    
+    """ Replace values that could not be calculated with None, following the
+    dependencies of the calculations in Convergence._get_values. Returns the
+    values and the code of the failed calculation, or None.
+    """
+    
+    f_exact, e_a, e_ext, gci_f, gci_c = [_clean(value) for value in values]
+    
+    if f_exact is None:
+        return (None, None, None, None, None), EXTRAPOLATION
+    
+    if e_a is None or e_ext is None:
+        return (f_exact, None, None, None, None), ERROR_ESTIMATE
+    
+    if gci_f is None or gci_c is None:
+        return (f_exact, e_a, e_ext, None, None), GCI
+    
+    return (f_exact, e_a, e_ext, gci_f, gci_c), None
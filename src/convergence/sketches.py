@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+ -- convergence package  -------------------------------------------------------
+
+   A mergeable sketch of the distribution of a quantity, such as the order
+   of convergence or GCI, over very many points, from which quantiles are
+   estimated. Based on the merging t-digest of Dunning and Ertl (2019).
+
+ --------------------------------------------------------------------------
+"""
+
+import numpy as np
+
+# Quantiles written in distribution summaries
+SUMMARY_QUANTILES = (("min", 0.),
+                     ("p50", 0.5),
+                     ("p95", 0.95),
+                     ("p99", 0.99),
+                     ("max", 1.))
+
+
+class QuantileSketch(object):
+    """ Estimate quantiles of a stream of values, given in chunks using add,
+    in constant memory. The values are summarised by weighted centroids
+    which are smallest near the extremes, so the tails of the distribution
+    are estimated most accurately. The number of centroids is about half of
+    compression. Non-finite values are ignored.
+    
+    Sketches filled by separate workers are combined using merge and the
+    result does not depend on how the values were divided between them,
+    other than through the accuracy of the estimates.
+    """
+    
+    def __init__(self, compression=200, buffer_size=10000):
+        
+        self.compression = compression
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._buffer_size = buffer_size
+        self._means = np.empty(0)
+        self._weights = np.empty(0)
+        self._buffer = []
+        self._n_buffered = 0
+        
+        return
+    
+    def add(self, values):
+        
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        
+        if not values.size: return
+        
+        self._add_centroids(values, np.ones(values.size), values.min(),
+                            values.max())
+        
+        return
+    
+    def merge(self, other):
+        
+        """ Add the values summarised by another sketch. """
+        
+        other._compress()
+        
+        if not other.count: return
+        
+        self._add_centroids(other._means, other._weights, other.min,
+                            other.max)
+        
+        return
+    
+    def _add_centroids(self, means, weights, minimum, maximum):
+        
+        self.count += int(weights.sum())
+        self.min = min(self.min, float(minimum))
+        self.max = max(self.max, float(maximum))
+        
+        self._buffer.append((means, weights))
+        self._n_buffered += len(means)
+        
+        if self._n_buffered >= self._buffer_size: self._compress()
+        
+        return
+    
+    def _compress(self):
+        
+        if not self._buffer: return
+        
+        means = np.concatenate([self._means] +
+                               [means for means, _ in self._buffer])
+        weights = np.concatenate([self._weights] +
+                                 [weights for _, weights in self._buffer])
+        
+        self._buffer = []
+        self._n_buffered = 0
+        
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+        
+        # Group the centroids into clusters of unit width on the k1 scale
+        # of the t-digest, using the quantile at the middle of each centroid
+        q = (np.cumsum(weights) - weights / 2) / weights.sum()
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        clusters = np.floor(k)
+        
+        starts = np.flatnonzero(np.r_[True, clusters[1:] != clusters[:-1]])
+        cluster_weights = np.add.reduceat(weights, starts)
+        
+        self._means = np.add.reduceat(means * weights,
+                                      starts) / cluster_weights
+        self._weights = cluster_weights
+        
+        return
+    
+    def quantile(self, q):
+        
+        """ Estimate the value at quantile q (or an array of quantiles),
+        between 0 and 1. Returns NaN if no values have been added.
+        """
+        
+        self._compress()
+        
+        q = np.asarray(q, dtype=float)
+        
+        if not self.count: return np.full(q.shape, np.nan)[()]
+        
+        total = self._weights.sum()
+        mids = np.cumsum(self._weights) - self._weights / 2
+        
+        # Interpolate between the centroids, anchored at the extremes
+        ranks = np.concatenate(([0.], mids, [total]))
+        values = np.concatenate(([self.min], self._means, [self.max]))
+        
+        return np.interp(q * total, ranks, values)[()]
+    
+    def summary(self):
+        
+        """ Return a list of (name, value) pairs for the minimum, median,
+        95th and 99th percentiles and maximum. The values are None if no
+        values have been added.
+        """
+        
+        if not self.count:
+            return [(name, None) for name, _ in SUMMARY_QUANTILES]
+        
+        values = self.quantile([q for _, q in SUMMARY_QUANTILES])
+        
+        return [(name, float(value)) for (name, _), value
+                                            in zip(SUMMARY_QUANTILES, values)]
+    
+    def __len__(self):
+        
+        return self.count
@@ -42,10 +42,7 @@ Adapted from:
     Nov '11: Updated to reflect Celik et al 2008.
 """
 
-try:
-    from itertools import zip_longest
-except ImportError:
-    from itertools import izip_longest as zip_longest
+from itertools import islice
 
 
 class Record(object):
@@ -68,47 +65,39 @@ class Record(object):
         """
         
         self.data_point = data_point
-        self.col_pairs = [(col_name, None) for col_name in column_list]
+        self._values = dict.fromkeys(column_list)
         
         # If column values is given then call add_values
         if column_values is not None: self.add_values(column_values)
         
         return
     
+    @property
+    def col_pairs(self):
+        return list(self._values.items())
+    
+    @col_pairs.setter
+    def col_pairs(self, col_pairs):
+        self._values = dict(col_pairs)
+    
     def add_values(self, values):
         
-        for value, col_pair in zip_longest(values, self.col_pairs):
-            try:
-                coldex = self.col_pairs.index(col_pair)
-                self.col_pairs[coldex] = (col_pair[0], value)
-            except TypeError as e:
-#                self._log.error("Could be too many values for number of \
-#                                 columns.")
-                raise e
+        values = list(values)
+        
+        if len(values) > len(self._values):
+            raise ValueError("Too many values for the number of columns")
+        
+        # Columns without a value are set to None
+        values.extend([None] * (len(self._values) - len(values)))
+        
+        self._values = dict(zip(self._values, values))
         
         return
     
     def update_byrecord(self, record):
         
-        # OK, start by making lists of the existing columns and values
-        col_list = []
-        val_list = []
-        for column, value in self.col_pairs:
-            col_list.append(column)
-            val_list.append(value)
-        
-        # Now update the lists
-        for column, value in record.col_pairs:
-            try:
-                coldex = col_list.index(column)
-                val_list[coldex] = value
-            except:
-                col_list.append(column)
-                val_list.append(value)
-                
-        # Load up the col_pairs
-        self.col_pairs = [(column, value) for column, value in
-                                                    zip(col_list, val_list)]
+        # Update existing columns and add new ones
+        self._values.update(record._values)
         
         return
 
@@ -119,64 +108,150 @@ class Table(object):
     existing tables and update them. The columns can also be read separately.
     Unlike a report it doesn't handle files it just takes a list of strings 
     to read or will output a list of strings for writing.
+    
+    The values are stored by column, as lists with one entry per row, and the
+    row of each data point is found using an index.
     """
     
     def __init__(self, row_type=''):
         
         self.row_type = row_type
-        self._records = []
+        self._data_points = []
+        self._columns = {}
+        self._datdex = {}
         
         return
     
     def column_read(self, get_strings):
         """ Read in an existing table and return the name of the columns
         in a list and the values in those columns in a list of lists. Assume the
-        first string in the list is the right place to get the columns.
+        first string in the list is the right place to get the columns. The
+        first column holds the data points and blank entries are None.
+        """
+        
+        row_type, col_names, rows, _ = _read_chunk(get_strings, 0)
+        
+        col_list = [[data_point for data_point, _ in rows]]
+        col_list.extend([values[coldex] for _, values in rows]
+                                        for coldex in range(len(col_names)))
+        
+        return [row_type] + col_names, col_list
+    
+    def read(self, get_strings, start=0):
+        """ Read an existing table, as written by write, from the list of
+        strings beginning at index start and add its records to the table.
+        The chunks of columns are joined by data point, which are read as
+        strings. Returns the index of the first string after the table.
         """
         
-        # Collect the column headers
-        column_line = get_strings.pop(0)
-        col_list = column_line.split()
+        linedex = start
         
-        col_names = self._rep_line_reader(col_list)
+        while _is_chunk(get_strings, linedex):
+            
+            (self.row_type,
+             col_names,
+             rows,
+             linedex) = _read_chunk(get_strings, linedex)
+            
+            self._add_rows(col_names, rows)
         
-        # Collect a list of the rows
-        row_list = []
+        return linedex
+    
+    def iter_records(self):
+        """ Yield a Record for each data point, in the order they were
+        added. Values which are missing are not included.
+        """
         
-        # Split the entries into rows
-        for line in get_strings:
+        for datdex, data_point in enumerate(self._data_points):
+            
+            col_pairs = [(col_name, column[datdex])
+                            for col_name, column in self._columns.items()
+                                            if column[datdex] is not None]
             
-            # Protect the reader from data beyond the table
-            if len(line) < 2: break
+            record = Record([], data_point=data_point)
+            record.col_pairs = col_pairs
             
-            words = line.split()
-            row_entries = self._rep_line_reader(words)
-            row_list.append(row_entries)
+            yield record
+    
+    def merge(self, table):
+        """ Add the records of the given table using add_record, so the
+        values of existing data points are updated and new data points are
+        added. Values missing from the given table do not replace existing
+        values.
+        """
         
-        # set up the column list
-        col_list = [[] for entry in row_list[0]]
+        for col_name in table._columns:
+            if col_name not in self._columns:
+                self._columns[col_name] = [None] * len(self._data_points)
         
-        # Now turn the row list into a column list
-        for row in row_list:
-            for index, entry in enumerate(row):
-                col_list[index].append(entry)
+        for record in table.iter_records():
+            self.add_record(record)
         
-        return col_names, col_list
+        return
+    
+    def __len__(self):
+        return len(self._data_points)
     
     def add_record(self, get_record):
         """ Add or update a record for the given data point using the supplied
         record.
         """
         
-         # Add a new record to the records list or update an existing record
-        current_dat_points = [record.data_point for record in self._records]
+        # Find the row for the data point or add a new one
+        datdex = self._datdex.get(get_record.data_point)
         
-        # Check the given records data point against the existing data point.
-        if get_record.data_point in current_dat_points:
-            datdex = current_dat_points.index(get_record.data_point)
-            self._records[datdex].update_byrecord(get_record)
-        else:
-            self._records.append(get_record)
+        if datdex is None:
+            
+            datdex = len(self._data_points)
+            self._datdex[get_record.data_point] = datdex
+            self._data_points.append(get_record.data_point)
+            
+            for column in self._columns.values():
+                column.append(None)
+        
+        # Update the columns, adding any new ones
+        for col_name, value in get_record._values.items():
+            
+            column = self._columns.get(col_name)
+            
+            if column is None:
+                column = [None] * len(self._data_points)
+                self._columns[col_name] = column
+            
+            column[datdex] = value
+        
+        return
+    
+    def _add_rows(self, col_names, rows):
+        
+        # Equivalent to add_record for many rows with the same columns
+        columns = []
+        
+        for col_name in col_names:
+            
+            column = self._columns.get(col_name)
+            
+            if column is None:
+                column = [None] * len(self._data_points)
+                self._columns[col_name] = column
+            
+            columns.append(column)
+        
+        for data_point, values in rows:
+            
+            datdex = self._datdex.get(data_point)
+            
+            if datdex is None:
+                
+                datdex = len(self._data_points)
+                self._datdex[data_point] = datdex
+                self._data_points.append(data_point)
+                
+                for column in self._columns.values():
+                    column.append(None)
+            
+            for column, value in zip(columns, values):
+                column[datdex] = value
         
         return
     
@@ -188,33 +263,32 @@ class Table(object):
         # Initialise the list of strings
         table_strings = []
         
-        # Need to collect the column names from the records into a list
-        all_columns = []
-        for record in self._records:
-            for col_pair in list(record.col_pairs):
-                
-                # Collect the column headings
-                if col_pair[0] not in all_columns:
-                    all_columns.append(col_pair[0])
-                    
-                # Knock off any entries with no value
-                if col_pair[1] == None:
-                    record.col_pairs.remove(col_pair)
-        
-        all_columns.sort()
+        all_columns = sorted(self._columns)
         
         # Prepare the formatting strings
-        string_format = '%' + str(col_width) + 's | '
-        float_format = '%' + str(col_width) + '.' + str(dec_places) + 'f | '
+        string_format, float_format = _get_formats(col_width, dec_places)
+        
+        # Find the order of the rows, sorting by the data point value
+        if row_sort:
+            rowdexes = sorted(range(len(self._data_points)),
+                              key=self._data_points.__getitem__)
+        else:
+            rowdexes = range(len(self._data_points))
+        
+        # Want to allow strings and numbers for the data point so convert
+        # to a string
+        row_strings = [string_format % self._data_points[rowdex]
+                                                    for rowdex in rowdexes]
         
-        # I think some sort of while loop here should be used to keep writing
-        # the colums in useful chunks until we run out.
+        # Keep writing the columns in useful chunks until we run out.
         while all_columns:
             
-            onetab, all_columns = self._set_width_write( all_columns, 
-                                                         tab_width,
-                                                         string_format,
-                                                         float_format)
+            onetab, all_columns = self._set_width_write(all_columns,
+                                                        tab_width,
+                                                        string_format,
+                                                        float_format,
+                                                        rowdexes,
+                                                        row_strings)
             
             table_strings.extend(onetab)
             table_strings.append('')
@@ -222,62 +296,150 @@ class Table(object):
         # Return the list of string
         return table_strings
     
-    def _set_width_write( self, sorted_column_list, tab_width, string_format,
-                          float_format, row_sort=True ):
+    def _set_width_write(self, sorted_column_list, tab_width, string_format,
+                               float_format, rowdexes, row_strings):
         
-        # Copy the column list and reverse it
-        reverse_list = sorted_column_list[:]
-        reverse_list.reverse()
+        headings_string, n_write = _fit_columns(self.row_type,
+                                                sorted_column_list,
+                                                tab_width,
+                                                string_format)
         
-        write_columns = []
-        table_strings = []
+        # Format each column for all of the rows at once
+        blank = string_format % ''
+        cell_columns = [row_strings]
         
-        # Write the column headings checking the length and popping OK columns 
-        # into a new list
-        headings_string = string_format % self.row_type
-        for column in sorted_column_list:
+        for column in sorted_column_list[:n_write]:
             
-            col_string = string_format % column
-            
-            if len(headings_string + col_string) <= tab_width:
-                headings_string += col_string
-                write_columns.append(reverse_list.pop())
-            else:
-                break
-        
-        dashrule = ' ' + '-' * (len(headings_string) - 2) + ' '
-        eqrule = ' ' + '=' * (len(headings_string) - 2) + ' '
-        
-        # Record the headings string
-        table_strings.append(headings_string)
-        table_strings.append(eqrule)
-        
-        # Write out the records. First sort by the data_point value.
-        if row_sort: 
-            sorted_records = sorted(self._records, 
-                                    key=lambda record: record.data_point)
-        else:
-            sorted_records = self._records
+            values = self._columns[column]
+            cells = [blank if values[rowdex] is None
+                                    else float_format % values[rowdex]
+                                                    for rowdex in rowdexes]
+            cell_columns.append(cells)
+        
+        table_strings = [headings_string, _get_rule('=', headings_string)]
+        table_strings.extend("".join(cells) for cells in zip(*cell_columns))
+        table_strings.append(_get_rule('-', headings_string))
+        
+        # Return the strings and the unused columns
+        return table_strings, sorted_column_list[n_write:]
+
+
+def iter_table(row_type, col_names, get_rows, col_width=20, dec_places=8,
+                         tab_width=80):
+    
+    """ Yield the lines of a table, as written by Table.write, without
+    storing the rows. get_rows must return a new iterable of (data point,
+    values) pairs each time it is called, with the values in the order of
+    col_names, as the rows are read once for each chunk of columns that fits
+    in tab_width. The rows are written in the order given.
+    """
+    
+    string_format, float_format = _get_formats(col_width, dec_places)
+    blank = string_format % ''
+    
+    coldexes = sorted(range(len(col_names)), key=col_names.__getitem__)
+    
+    while coldexes:
         
-        for record in sorted_records:
+        headings_string, n_write = _fit_columns(row_type,
+                                                [col_names[coldex]
+                                                     for coldex in coldexes],
+                                                tab_width,
+                                                string_format)
+        
+        write_coldexes = coldexes[:n_write]
+        coldexes = coldexes[n_write:]
+        
+        yield headings_string
+        yield _get_rule('=', headings_string)
+        
+        for data_point, values in get_rows():
             
-            # Want to allow strings and numbers for the data point so convert
-            # to a string 
-            record_string = string_format % record.data_point
-            # Search for each column in write_columns within the record
-            col_list =  [col for col, val in record.col_pairs]
-            for column in write_columns:
-                if column in col_list:
-                    coldex = col_list.index(column)
-                    record_string += float_format % record.col_pairs[coldex][1]
-                else:
-                    record_string += string_format % ''
+            cells = [string_format % data_point]
+            cells.extend(blank if values[coldex] is None
+                                else float_format % values[coldex]
+                                                for coldex in write_coldexes)
             
-            # Record the record string
-            table_strings.append(record_string)
+            yield "".join(cells)
         
-        table_strings.append(dashrule)
-        reverse_list.reverse()
+        yield _get_rule('-', headings_string)
+        yield ''
+
+
+def _get_formats(col_width, dec_places):
+    
+    string_format = '%' + str(col_width) + 's | '
+    float_format = '%' + str(col_width) + '.' + str(dec_places) + 'f | '
+    
+    return string_format, float_format
+
+
+def _fit_columns(row_type, sorted_column_list, tab_width, string_format):
+    
+    # Write the column headings checking the length
+    headings_string = string_format % row_type
+    n_write = 0
+    
+    for column in sorted_column_list:
         
-        # Return the strings and the unused columns
-        return table_strings, reverse_list
+        col_string = string_format % column
+        
+        if len(headings_string + col_string) <= tab_width:
+            headings_string += col_string
+            n_write += 1
+        else:
+            break
+    
+    return headings_string, n_write
+
+
+def _get_rule(char, headings_string):
+    return ' ' + char * (len(headings_string) - 2) + ' '
+
+
+def _is_chunk(get_strings, linedex):
+    
+    # A chunk starts with a line of headings followed by a rule of "="
+    if linedex + 1 >= len(get_strings): return False
+    
+    return ('|' in get_strings[linedex] and
+            get_strings[linedex + 1].strip().startswith('='))
+
+
+def _read_chunk(get_strings, linedex):
+    
+    """ Read a chunk of columns, as written by _set_width_write, starting at
+    the headings. Returns the row type, the column names, a list of (data
+    point, values) pairs and the index of the first string after the chunk.
+    """
+    
+    headings = [word.strip() for word in get_strings[linedex].split('|')]
+    row_type = headings[0]
+    col_names = headings[1:-1]
+    n_columns = len(col_names)
+    
+    rows = []
+    linedex += 2
+    
+    for line in islice(get_strings, linedex, None):
+        
+        linedex += 1
+        
+        # Stop at the closing rule or data beyond the table
+        if '|' not in line: break
+        
+        entries = line.split('|')
+        
+        if len(entries) != n_columns + 2:
+            raise ValueError("Expected {} columns in table row "
+                             "'{}'".format(n_columns + 1, line))
+        
+        values = [None if entry.isspace() else float(entry)
+                                        for entry in entries[1:-1]]
+        rows.append((entries[0].strip(), values))
+    
+    # Skip the blank line after the closing rule
+    if linedex < len(get_strings) and not get_strings[linedex].strip():
+        linedex += 1
+    
+    return row_type, col_names, rows, linedex
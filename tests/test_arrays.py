@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from convergence.arrays import (CONVERGED,
+                                INVALID,
+                                DIVERGED,
+                                DEGENERATE,
+                                DIVERGENT,
+                                MONOTONIC,
+                                OSCILLATORY,
+                                classify_array,
+                                order_of_convergence_array,
+                                triplet_values_array)
+from convergence.functions import (convergence_class,
+                                   order_of_convergence,
+                                   triplet_values)
+
+
+def test_order_of_convergence_array():
+    
+    value_1 = [0.9705, 0.9705, 1.0]
+    value_2 = [0.96854, 0.9705, 1.1]
+    value_3 = [0.96178, 0.96178, 1.3]
+    ratio_21 = [2.0, 2.0, 1.5]
+    ratio_32 = [2.0, 2.0, 1.8]
+    
+    p, status = order_of_convergence_array(value_1,
+                                           value_2,
+                                           value_3,
+                                           ratio_21,
+                                           ratio_32)
+    
+    assert status.tolist() == [CONVERGED, INVALID, CONVERGED]
+    assert np.isclose(p[0],
+                      order_of_convergence(0.9705, 0.96854, 0.96178, 2.0, 2.0),
+                      rtol=1e-12)
+    assert np.isnan(p[1])
+    assert np.isclose(p[2], order_of_convergence(1.0, 1.1, 1.3, 1.5, 1.8),
+                      rtol=1e-12)
+
+
+def test_order_of_convergence_array_matches_scalar():
+    
+    rng = np.random.default_rng(42)
+    n = 500
+    
+    value_1 = 1 + rng.normal(0, 0.01, n)
+    value_2 = value_1 + rng.normal(0.01, 0.01, n)
+    value_3 = value_2 + rng.normal(0.03, 0.02, n)
+    ratio_21 = rng.uniform(1.3, 2.5, n)
+    ratio_32 = rng.uniform(1.3, 2.5, n)
+    
+    p, status = order_of_convergence_array(value_1,
+                                           value_2,
+                                           value_3,
+                                           ratio_21,
+                                           ratio_32)
+    
+    for i in range(n):
+        
+        try:
+            expected = order_of_convergence(float(value_1[i]),
+                                            float(value_2[i]),
+                                            float(value_3[i]),
+                                            float(ratio_21[i]),
+                                            float(ratio_32[i]))
+        except (ArithmeticError, RuntimeError, ValueError):
+            assert status[i] != CONVERGED
+            continue
+        
+        assert status[i] == CONVERGED
+        assert np.isclose(p[i], expected, rtol=1e-6)
+
+
+def test_order_of_convergence_array_diverged():
+    
+    p, status = order_of_convergence_array([0.9705, 0.9705],
+                                           [0.96854, 0.96854],
+                                           [0.96178, 0.96178],
+                                           2.0,
+                                           1.9,
+                                           tol=-1,
+                                           max_iter=10)
+    
+    assert status.tolist() == [DIVERGED, DIVERGED]
+    assert np.isnan(p).all()
+
+
+def test_order_of_convergence_array_shape():
+    
+    value_1 = np.full((2, 3), 0.9705)
+    
+    p, status = order_of_convergence_array(value_1,
+                                           0.96854,
+                                           0.96178,
+                                           2.0,
+                                           2.0)
+    
+    assert p.shape == (2, 3)
+    assert status.shape == (2, 3)
+    assert (status == CONVERGED).all()
+
+
+def test_triplet_values_array():
+    
+    fine, coarse, ratio = triplet_values_array([0.9705, 1.0],
+                                               [0.96854, 1.0],
+                                               [0.96178, 1.3],
+                                               2.0,
+                                               2.0,
+                                               [1.7861695921669198, np.nan])
+    
+    expected = triplet_values(0.9705, 0.96854, 0.96178, 2.0, 2.0,
+                              1.7861695921669198)
+    
+    assert [x[0] for x in fine] == list(expected[0])
+    assert [x[0] for x in coarse] == list(expected[1])
+    assert ratio[0] == expected[2]
+    assert not np.isfinite(ratio[1])
+
+
+def test_classify_array_matches_scalar():
+    
+    rng = np.random.default_rng(5)
+    values = rng.uniform(0.9, 1.1, (3, 500))
+    values[1, :10] = values[0, :10]
+    values[2, 10:20] = values[1, 10:20]
+    values[1, 20] = np.nan
+    
+    classes = classify_array(values[0], values[1], values[2])
+    expected = [convergence_class(*point) for point in values.T]
+    
+    assert classes.dtype == np.int8
+    assert classes.tolist() == expected
+    assert set(expected) == {MONOTONIC, OSCILLATORY, DIVERGENT, DEGENERATE}
+
+
+def test_order_of_convergence_array_degenerate(mocker):
+    
+    spy = mocker.spy(np, "log")
+    
+    # Tiny changes in the fine values would otherwise be iterated
+    p, status = order_of_convergence_array([1.0, 0.9705],
+                                           [1.0 + 1e-14, 0.96854],
+                                           [1.1, 0.96178],
+                                           [2.0, 2.0],
+                                           [1.5, 1.9])
+    
+    assert status.tolist() == [INVALID, CONVERGED]
+    assert np.isnan(p[0])
+    assert spy.call_args_list[-1][0][0].shape == (1,)
+
+
+def test_order_of_convergence_array_classes():
+    
+    classes = np.array([DEGENERATE, MONOTONIC], dtype=np.int8)
+    
+    p, status = order_of_convergence_array(0.9705,
+                                           0.96854,
+                                           0.96178,
+                                           2.0,
+                                           2.0,
+                                           classes=classes)
+    
+    assert status.tolist() == [INVALID, CONVERGED]
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sqlite3
+import warnings
+
+import pytest
+
+from convergence.cache import (ResultCache,
+                               default_cache_dir,
+                               make_key,
+                               pack,
+                               unpack)
+from convergence.diagnostics import Diagnostics
+from convergence.interface import cl_interface, simple_read, Convergence
+
+THIS_DIR_PATH = os.path.dirname(__file__)
+DATA_DIR_PATH = os.path.join(THIS_DIR_PATH, "..", "data")
+
+
+@pytest.fixture
+def cache(tmpdir):
+    
+    cache = ResultCache(str(tmpdir.join("cache", "results.sqlite")))
+    yield cache
+    cache.close()
+
+
+def test_result_cache_get_set(cache):
+    
+    assert cache.get("a") is None
+    
+    cache.set("a", b"value")
+    
+    assert len(cache) == 1
+    assert cache.size() == 5
+    assert cache.get("a") == b"value"
+
+
+def test_result_cache_eviction(cache):
+    
+    value = bytes(1000)
+    
+    cache.set("a", value)
+    cache.max_size = 2500
+    cache.set("b", value)
+    
+    # Using a makes b the least recently used
+    cache.get("a")
+    cache.set("c", value)
+    
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.get("c") == value
+
+
+def test_result_cache_clear(cache):
+    
+    cache.set("a", b"value")
+    cache.clear()
+    
+    assert len(cache) == 0
+
+
+def _fill_cache(path, prefix):
+    
+    cache = ResultCache(path, max_size=5000)
+    
+    for i in range(50):
+        key = "{}{}".format(prefix, i)
+        cache.set(key, bytes(1000))
+        cache.get(key)
+    
+    cache.close()
+
+
+def test_result_cache_processes(tmpdir):
+    
+    from multiprocessing import Pool
+    
+    path = str(tmpdir.join("cache", "results.sqlite"))
+    ResultCache(path).close()
+    
+    # Lookups and evictions from other processes must not interleave
+    with Pool(2) as pool:
+        pool.starmap(_fill_cache, [(path, "a"), (path, "b")])
+    
+    cache = ResultCache(path, max_size=5000)
+    
+    assert len(cache) == 5
+    assert cache.size() == 5000
+    
+    cache.close()
+
+
+def test_result_cache_locked(tmpdir):
+    
+    path = str(tmpdir.join("cache", "results.sqlite"))
+    cache = ResultCache(path)
+    other = ResultCache(path, timeout=0.1)
+    
+    with cache._transaction():
+        
+        # The lookup waits for the lock, rather than reading stale values
+        with pytest.raises(sqlite3.OperationalError) as excinfo:
+            other.get("a")
+    
+    assert "locked" in str(excinfo.value)
+    
+    cache.close()
+    other.close()
+
+
+def test_pack_unpack():
+    
+    rows = [[1.0, None, float("inf")], [None, None, -2.5]]
+    records = [["gci", 0, "fine", "mock"]]
+    
+    assert unpack(pack(rows, records)) == (rows, records)
+    assert unpack(pack([], [])) == ([], [])
+
+
+def test_make_key():
+    
+    grids = [(1.0, 0.9705), (2.0, 0.96854), (4.0, 0.96178)]
+    key = make_key(grids, None, 1E-4, "fixed-point")
+    
+    assert make_key([list(grid) for grid in grids],
+                    None,
+                    1E-4,
+                    "fixed-point") == key
+    assert make_key(grids, "1.0", 1E-4, "fixed-point") == make_key(
+                                                            grids,
+                                                            1.0,
+                                                            1E-4,
+                                                            "fixed-point")
+    assert make_key(grids, 1.0, 1E-4, "fixed-point") != key
+    assert make_key(grids, None, 1E-3, "fixed-point") != key
+    assert make_key(grids, None, 1E-4, "newton") != key
+    assert make_key(grids[:2], None, 1E-4, "fixed-point") != key
+
+
+def test_default_cache_dir(monkeypatch, tmpdir):
+    
+    monkeypatch.setenv("CONVERGENCE_CACHE_DIR", str(tmpdir))
+    
+    assert default_cache_dir() == str(tmpdir)
+
+
+@pytest.mark.parametrize("f_anal", [None, 0.9713])
+def test_convergence_cache(mocker, cache, f_anal):
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    main_list = simple_read(in_path)
+    
+    expected = Convergence(f_anal=f_anal)
+    expected.add_grids(main_list)
+    
+    first = Convergence(f_anal=f_anal, cache=cache)
+    first.add_grids(main_list)
+    
+    second = Convergence(f_anal=f_anal, cache=cache)
+    spy = mocker.spy(second, "_calculate_pending")
+    second.add_grids(main_list)
+    
+    assert spy.call_count == 0
+    assert len(cache) == 1
+    assert str(first) == str(expected)
+    assert str(second) == str(expected)
+    assert vars(second[0].coarse) == vars(expected[0].coarse)
+
+
+def test_convergence_cache_diagnostics(mocker, cache):
+    
+    mocker.patch('convergence.interface.gci',
+                 side_effect=ArithmeticError("mock"))
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    main_list = simple_read(in_path)
+    
+    records = []
+    
+    for _ in range(2):
+        
+        convergence = Convergence(diagnostics="aggregated", cache=cache)
+        convergence.add_grids(main_list)
+        
+        records.append(list(convergence.diagnostics))
+    
+    assert len(records[0]) == 3
+    assert records[1] == records[0]
+
+
+def test_convergence_cache_incremental(mocker, cache):
+    
+    grids = [(1.0, 0.9705), (2.0, 0.96854), (4.0, 0.96178), (8.0, 0.9480)]
+    
+    convergence = Convergence(cache=cache)
+    convergence.add_grids(grids[:3])
+    
+    # Triplets added to an existing study are calculated as usual
+    spy = mocker.spy(convergence, "_calculate_pending")
+    convergence.add_grids(grids[3:])
+    
+    expected = Convergence()
+    expected.add_grids(grids)
+    
+    assert spy.call_count == 1
+    assert len(cache) == 1
+    assert str(convergence) == str(expected)
+
+
+@pytest.mark.parametrize("cache_args, cache_name", [
+                                ([], None),
+                                (["--cache"], "results.sqlite"),
+                                (["--cache-path", "custom.sqlite"],
+                                 "custom.sqlite")])
+def test_cl_interface_cache(mocker, monkeypatch, tmpdir, cache_args,
+                                                         cache_name):
+    
+    cache_dir = str(tmpdir.mkdir("cache"))
+    monkeypatch.setenv("CONVERGENCE_CACHE_DIR", cache_dir)
+    monkeypatch.chdir(cache_dir)
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    out_path = str(tmpdir.join("test_cl.txt"))
+    argv = ["grid-convergence", "-o", out_path] + cache_args + [in_path]
+    
+    mocker.patch("sys.argv", argv)
+    cl_interface()
+    
+    assert os.path.isfile(out_path)
+    
+    # The cache is only used when requested
+    if cache_name is None:
+        assert not os.listdir(cache_dir)
+    else:
+        assert os.listdir(cache_dir) == [cache_name]
+
+
+@pytest.mark.parametrize("cache_args", [["--cache"],
+                                        ["--cache-path", "wide.sqlite"]])
+def test_cl_interface_cache_wide(mocker, monkeypatch, tmpdir, cache_args):
+    
+    monkeypatch.chdir(tmpdir)
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    argv = ["grid-convergence", "-w"] + cache_args + [in_path]
+    
+    mocker.patch("sys.argv", argv)
+    
+    # Wide studies are not cached, so asking for the cache is an error
+    with pytest.raises(SystemExit):
+        cl_interface()
+    
+    assert not tmpdir.listdir()
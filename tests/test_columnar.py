@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from convergence.columnar import results_schema, write_results
+from convergence.interface import (batch_main,
+                                   cl_interface,
+                                   main,
+                                   simple_read,
+                                   Convergence)
+from convergence.sets import ConvergenceSet
+
+THIS_DIR_PATH = os.path.dirname(__file__)
+DATA_DIR_PATH = os.path.join(THIS_DIR_PATH, "..", "data")
+
+
+@pytest.fixture(scope="module")
+def convergence():
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    convergence = Convergence(met_name="speed")
+    convergence.add_grids(simple_read(in_path))
+    return convergence
+
+
+def read_feather(path):
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+
+def test_results_schema():
+    
+    schema = results_schema()
+    
+    assert schema.names[:5] == ["input", "metric", "grid_1", "grid_2",
+                                "grid_3"]
+    assert schema.field("grid_1").type == pa.int64()
+    assert schema.field("p").type == pa.float64()
+    assert "fine_f_analytic" not in schema.names
+    assert "fine_f_analytic" in results_schema(True).names
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 65536])
+def test_write_results_feather(tmpdir, convergence, batch_size):
+    
+    out_path = str(tmpdir.join("results.feather"))
+    
+    write_results(out_path,
+                  [("prD.do", convergence)],
+                  batch_size=batch_size)
+    
+    table = read_feather(out_path)
+    array = convergence.to_numpy()
+    
+    assert table.num_rows == len(convergence)
+    assert table.column("input").to_pylist() == ["prD.do"] * len(array)
+    assert table.column("metric").to_pylist() == ["speed"] * len(array)
+    
+    for name in array.dtype.names:
+        assert table.column(name).to_pylist() == array[name].tolist()
+
+
+def test_write_results_parquet(tmpdir, convergence):
+    
+    out_path = str(tmpdir.join("results.parquet"))
+    
+    write_results(out_path,
+                  [("a.do", convergence), ("b.do", convergence)],
+                  "parquet")
+    
+    table = pq.read_table(out_path)
+    
+    assert table.num_rows == 2 * len(convergence)
+    assert table.column("p").to_pylist() == \
+                                    2 * convergence.to_numpy()["p"].tolist()
+
+
+def test_write_results_missing(tmpdir):
+    
+    convergence = Convergence(diagnostics="silent")
+    convergence.add_grids([(1.0, 0.9705),
+                           (2.0, 0.9705),
+                           (4.0, 0.96178)])
+    
+    out_path = str(tmpdir.join("results.feather"))
+    write_results(out_path, [("a.do", convergence)])
+    
+    table = read_feather(out_path)
+    
+    assert table.column("r21").to_pylist() == [2.0]
+    assert table.column("p").to_pylist() == [None]
+    assert table.column("metric").to_pylist() == [None]
+
+
+def test_write_results_set(tmpdir):
+    
+    convergence_set = ConvergenceSet(["drag", "lift"])
+    convergence_set.add_grids([[1.0, 0.9705, 0.5],
+                               [2.0, 0.96854, 0.6],
+                               [4.0, 0.96178, 0.65]])
+    
+    out_path = str(tmpdir.join("results.feather"))
+    write_results(out_path, [("wide.do", convergence_set)])
+    
+    table = read_feather(out_path)
+    
+    assert table.column("metric").to_pylist() == ["drag", "lift"]
+
+
+def test_write_results_bad_format(tmpdir, convergence):
+    
+    with pytest.raises(ValueError):
+        write_results(str(tmpdir.join("results.csv")),
+                      [("prD.do", convergence)],
+                      "csv")
+
+
+def test_main_feather(tmpdir):
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    out_path = str(tmpdir.join("results.feather"))
+    
+    main(in_path, out_path, analytical="0.9713", out_format="feather")
+    
+    table = read_feather(out_path)
+    
+    assert table.column("input").to_pylist() == [in_path]
+    assert table.column("fine_f_analytic").to_pylist() == [0.9713]
+
+
+@pytest.fixture
+def batch_paths(tmpdir):
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    
+    with open(in_path) as f:
+        text = f.read()
+    
+    paths = []
+    
+    for name in ("a.do", "b.do", "c.do"):
+        path = tmpdir.join(name)
+        path.write(text)
+        paths.append(str(path))
+    
+    return paths
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_batch_main_feather(tmpdir, batch_paths, jobs):
+    
+    out_path = str(tmpdir.join("results.feather"))
+    
+    batch_main(batch_paths, out_path, jobs=jobs, out_format="feather")
+    
+    table = read_feather(out_path)
+    
+    assert table.column("input").to_pylist() == batch_paths
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_batch_main_parquet_out_dir(tmpdir, batch_paths, jobs):
+    
+    out_dir = str(tmpdir.join("results"))
+    
+    batch_main(batch_paths, out_dir=out_dir, jobs=jobs, out_format="parquet")
+    
+    assert sorted(os.listdir(out_dir)) == ["a_results.parquet",
+                                           "b_results.parquet",
+                                           "c_results.parquet"]
+
+
+def test_cl_interface_format(mocker, monkeypatch, tmpdir, batch_paths):
+    
+    monkeypatch.chdir(tmpdir)
+    
+    mocker.patch("sys.argv", ["grid-convergence",
+                              "-f", "feather",
+                              batch_paths[0]])
+    cl_interface()
+    
+    table = read_feather(str(tmpdir.join("verify_results.feather")))
+    
+    assert table.num_rows == 1
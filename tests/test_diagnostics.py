@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import warnings
+
+import pytest
+
+from convergence.diagnostics import GCI, Diagnostic, Diagnostics
+
+
+def test_diagnostics_bad_mode():
+    
+    with pytest.raises(ValueError):
+        Diagnostics("loud")
+
+
+def test_diagnostics_warnings():
+    
+    diagnostics = Diagnostics()
+    
+    with pytest.warns(UserWarning, match="mock"):
+        diagnostics.record(GCI, 0, "fine", "mock")
+    
+    assert list(diagnostics) == [Diagnostic(GCI, 0, "fine", "mock")]
+    assert diagnostics.summary() == {GCI: 1}
+
+
+def test_diagnostics_aggregated():
+    
+    diagnostics = Diagnostics("aggregated")
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        diagnostics.record(GCI, 0, "fine", "mock")
+        diagnostics.record(GCI, 0, "coarse", "mock")
+    
+    assert len(diagnostics) == 2
+    assert [record.stage for record in diagnostics] == ["fine", "coarse"]
+    assert diagnostics.summary() == {GCI: 2}
+
+
+def test_diagnostics_silent():
+    
+    diagnostics = Diagnostics("silent")
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        diagnostics.record(GCI, 0, "fine", "mock")
+    
+    assert len(diagnostics) == 1
+    assert list(diagnostics) == []
+    assert diagnostics.summary() == {GCI: 1}
+
+
+def test_diagnostics_clear():
+    
+    diagnostics = Diagnostics("aggregated")
+    diagnostics.record(GCI, 0, "fine", "mock")
+    diagnostics.clear()
+    
+    assert len(diagnostics) == 0
+    assert diagnostics.summary() == {}
+
+
+def test_diagnostics_str():
+    
+    diagnostics = Diagnostics("silent")
+    diagnostics.record(GCI, 0, "fine", "mock")
+    
+    assert str(diagnostics) == ("Failures: 1 \n"
+                                "                     gci: 1 ")
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from convergence.arrays import (CONVERGED,
+                                INVALID,
+                                DEGENERATE,
+                                DIVERGENT,
+                                MONOTONIC,
+                                OSCILLATORY)
+from convergence.fields import FieldConvergence, memmap_convergence
+from convergence.interface import simple_read, Convergence
+
+THIS_DIR_PATH = os.path.dirname(__file__)
+DATA_DIR_PATH = os.path.join(THIS_DIR_PATH, "..", "data")
+
+
+@pytest.fixture(scope="module")
+def grids():
+    
+    rng = np.random.default_rng(7)
+    n_points = 50
+    
+    spacings = np.array([1.0, 1.5, 2.4, 4.0])
+    exact = rng.uniform(1, 2, n_points)
+    coeff = rng.uniform(0.01, 0.05, n_points)
+    order = rng.uniform(1, 2, n_points)
+    values = exact + coeff * spacings[:, None] ** order
+    
+    return spacings, values
+
+
+@pytest.fixture(scope="module")
+def field_convergence(grids):
+    
+    spacings, values = grids
+    convergence = FieldConvergence(f_anal=1.5)
+    convergence.add_grids(spacings, values)
+    
+    return convergence
+
+
+def test_field_convergence_len(field_convergence):
+    assert len(field_convergence) == 2
+
+
+@pytest.mark.parametrize("analysis", ["fine", "coarse"])
+@pytest.mark.parametrize("name", ["e_analytic",
+                                  "e_approx",
+                                  "e_extrap",
+                                  "f_delta",
+                                  "f_exact",
+                                  "gci_coarse",
+                                  "gci_fine",
+                                  "p"])
+def test_field_convergence_matches_convergence(grids,
+                                               field_convergence,
+                                               analysis,
+                                               name):
+    
+    spacings, values = grids
+    
+    for point in range(values.shape[1]):
+        
+        convergence = Convergence(f_anal=1.5)
+        convergence.add_grids(list(zip(spacings, values[:, point])))
+        
+        for tripdex in range(len(convergence)):
+            
+            expected = getattr(getattr(convergence[tripdex], analysis), name)
+            field = getattr(field_convergence[tripdex], analysis)
+            
+            assert np.isclose(getattr(field, name)[point],
+                              expected,
+                              rtol=1e-8)
+
+
+def test_field_convergence_asymptotic_ratio(grids, field_convergence):
+    
+    spacings, values = grids
+    
+    for point in range(values.shape[1]):
+        
+        convergence = Convergence()
+        convergence.add_grids(list(zip(spacings, values[:, point])))
+        
+        for tripdex in range(len(convergence)):
+            
+            expected = convergence[tripdex].asymptotic_ratio
+            test = field_convergence[tripdex].asymptotic_ratio[point]
+            
+            assert np.isclose(test, expected, rtol=1e-8)
+
+
+def test_field_convergence_prD():
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    main_list = simple_read(in_path)
+    
+    convergence = Convergence()
+    convergence.add_grids(main_list)
+    
+    spacings = [grid[0] for grid in main_list]
+    values = np.array([[grid[1]] * 4 for grid in main_list]).reshape(3, 2, 2)
+    
+    field_convergence = FieldConvergence()
+    field_convergence.add_grids(spacings, values)
+    
+    assert field_convergence[0].fine.p.shape == (2, 2)
+    assert (field_convergence[0].status == CONVERGED).all()
+    assert np.allclose(field_convergence[0].fine.gci_fine,
+                       convergence[0].fine.gci_fine)
+    assert np.allclose(field_convergence[0].asymptotic_ratio,
+                       convergence[0].asymptotic_ratio)
+
+
+def test_field_convergence_add_grids_sorted(grids, field_convergence):
+    
+    spacings, values = grids
+    
+    convergence = FieldConvergence(f_anal=1.5)
+    
+    with pytest.warns(UserWarning):
+        convergence.add_grids(spacings[2:], values[2:])
+    
+    convergence.add_grids(spacings[1::-1], values[1::-1])
+    
+    assert len(convergence) == 2
+    assert np.array_equal(convergence[0].fine.p,
+                          field_convergence[0].fine.p)
+
+
+def test_field_convergence_invalid_points():
+    
+    values = [[1.0, 1.0, 0.0],
+              [1.1, 1.0, 0.1],
+              [1.3, 1.2, 0.3]]
+    
+    convergence = FieldConvergence()
+    convergence.add_grids([1., 2., 4.], values)
+    
+    assert convergence[0].status.tolist() == [CONVERGED, INVALID, INVALID]
+    assert np.isnan(convergence[0].fine.gci_fine[1:]).all()
+
+
+def test_field_convergence_bad_shape():
+    
+    convergence = FieldConvergence()
+    
+    with pytest.raises(ValueError):
+        convergence.add_grids([1., 2.], np.ones((3, 4)))
+
+
+def test_field_convergence_no_grids():
+    
+    convergence = FieldConvergence()
+    
+    assert len(convergence) == 0
+    
+    with pytest.raises(IndexError):
+        convergence[0]
+
+
+@pytest.mark.parametrize("chunk_size", [None, 7, 1000])
+def test_field_convergence_jobs(grids, field_convergence, chunk_size):
+    
+    spacings, values = grids
+    
+    convergence = FieldConvergence(f_anal=1.5, jobs=2, chunk_size=chunk_size)
+    convergence.add_grids(spacings, values)
+    
+    assert len(convergence) == len(field_convergence)
+    
+    for tripdex in range(len(convergence)):
+        
+        test = convergence[tripdex]
+        expected = field_convergence[tripdex]
+        
+        assert np.array_equal(test.status, expected.status)
+        assert np.array_equal(test.asymptotic_ratio,
+                              expected.asymptotic_ratio,
+                              equal_nan=True)
+        
+        for analysis in ("fine", "coarse"):
+            for name, value in vars(getattr(expected, analysis)).items():
+                assert np.array_equal(getattr(getattr(test, analysis), name),
+                                      value,
+                                      equal_nan=True)
+
+
+def test_field_convergence_jobs_shape():
+    
+    values = np.array([[[1.0, 1.0], [1.0, 0.0]],
+                       [[1.1, 1.0], [1.1, 0.1]],
+                       [[1.3, 1.2], [1.3, 0.3]]])
+    
+    serial = FieldConvergence()
+    serial.add_grids([1., 2., 4.], values)
+    parallel = FieldConvergence(jobs=2, chunk_size=1)
+    parallel.add_grids([1., 2., 4.], values)
+    
+    assert parallel[0].fine.p.shape == (2, 2)
+    assert np.array_equal(parallel[0].status, serial[0].status)
+    assert np.array_equal(parallel[0].fine.gci_fine,
+                          serial[0].fine.gci_fine,
+                          equal_nan=True)
+
+
+def test_field_convergence_bad_chunk_size():
+    
+    with pytest.raises(ValueError):
+        FieldConvergence(chunk_size=0)
+
+
+@pytest.fixture
+def grid_paths(tmpdir, grids):
+    
+    spacings, values = grids
+    paths = []
+    
+    for i, field in enumerate(values):
+        path = str(tmpdir.join("grid_{}.npy".format(i)))
+        np.save(path, field)
+        paths.append(path)
+    
+    return paths
+
+
+@pytest.mark.parametrize("memory_budget", [1, 8 * 40 * 7, 256 * 1024 ** 2])
+def test_memmap_convergence(tmpdir, grids, grid_paths, memory_budget):
+    
+    spacings, values = grids
+    out_dir = str(tmpdir.join("results"))
+    
+    # Sources are given in any order, like the grids of FieldConvergence
+    triplets = memmap_convergence(spacings[::-1],
+                                  grid_paths[::-1],
+                                  out_dir,
+                                  memory_budget=memory_budget)
+    
+    expected = FieldConvergence()
+    expected.add_grids(spacings, values)
+    
+    assert len(triplets) == len(expected)
+    
+    for tripdex, triplet in enumerate(triplets):
+        
+        fine = expected[tripdex].fine
+        
+        assert triplet.grids == expected[tripdex].grids
+        assert triplet.sizes == expected[tripdex].sizes
+        assert isinstance(triplet.p, np.memmap)
+        assert np.array_equal(triplet.status, expected[tripdex].status)
+        assert np.array_equal(triplet.p, fine.p, equal_nan=True)
+        assert np.array_equal(triplet.f_exact, fine.f_exact, equal_nan=True)
+        assert np.array_equal(triplet.gci_fine,
+                              fine.gci_fine,
+                              equal_nan=True)
+        assert np.array_equal(triplet.gci_coarse,
+                              fine.gci_coarse,
+                              equal_nan=True)
+        assert np.array_equal(triplet.asymptotic_ratio,
+                              expected[tripdex].asymptotic_ratio,
+                              equal_nan=True)
+    
+    saved = np.load(os.path.join(out_dir, "gci_fine_2_3_4.npy"))
+    
+    assert np.array_equal(saved, triplets[1].gci_fine, equal_nan=True)
+
+
+def test_memmap_convergence_arrays(tmpdir):
+    
+    values = [np.array([[1.0, 1.0], [1.0, 0.0]]),
+              np.array([[1.1, 1.0], [1.1, 0.1]]),
+              np.array([[1.3, 1.2], [1.3, 0.3]])]
+    
+    triplets = memmap_convergence([1., 2., 4.],
+                                  values,
+                                  str(tmpdir),
+                                  memory_budget=1)
+    
+    assert triplets[0].p.shape == (2, 2)
+    assert triplets[0].status.tolist() == [[CONVERGED, INVALID],
+                                           [CONVERGED, INVALID]]
+
+
+@pytest.mark.parametrize("fortran", [(True, True, True), (True, False, True)])
+def test_memmap_convergence_fortran(tmpdir, grids, fortran):
+    
+    spacings, values = grids
+    fields = [field.reshape(5, 10) for field in values[:3]]
+    paths = []
+    
+    for i, (field, is_fortran) in enumerate(zip(fields, fortran)):
+        path = str(tmpdir.join("grid_{}.npy".format(i)))
+        np.save(path, np.asfortranarray(field) if is_fortran else field)
+        paths.append(path)
+    
+    triplet, = memmap_convergence(spacings[:3],
+                                  paths,
+                                  str(tmpdir.join("results")),
+                                  memory_budget=8 * 14 * 7)
+    
+    expected = FieldConvergence()
+    expected.add_grids(spacings[:3], values[:3])
+    
+    # The results follow the layout of the fields, if they all agree
+    assert np.isfortran(triplet.p) is all(fortran)
+    assert np.array_equal(triplet.p,
+                          expected[0].fine.p.reshape(5, 10),
+                          equal_nan=True)
+    assert np.array_equal(triplet.status,
+                          expected[0].status.reshape(5, 10))
+
+
+def test_memmap_convergence_no_copy(tmpdir, grids, monkeypatch):
+    
+    spacings, values = grids
+    paths = []
+    
+    for i, field in enumerate(values[:3]):
+        path = str(tmpdir.join("grid_{}.npy".format(i)))
+        np.save(path, np.asfortranarray(field.reshape(5, 10)))
+        paths.append(path)
+    
+    def no_copy(*args, **kwargs):
+        raise AssertionError("Fields must not be indexed point by point")
+    
+    monkeypatch.setattr("convergence.fields.np.unravel_index", no_copy)
+    
+    memmap_convergence(spacings[:3], paths, str(tmpdir.join("results")))
+
+
+def test_memmap_convergence_bad_shape(tmpdir):
+    
+    with pytest.raises(ValueError):
+        memmap_convergence([1., 2., 4.],
+                           [np.ones(3), np.ones(3), np.ones(4)],
+                           str(tmpdir))
+
+
+def test_memmap_convergence_bad_sources(tmpdir):
+    
+    with pytest.raises(ValueError):
+        memmap_convergence([1., 2., 4.],
+                           [np.ones(3), np.ones(3)],
+                           str(tmpdir))
+
+
+def test_field_convergence_classes():
+    
+    values = [[1.0, 1.0, 0.9705, 1.0],
+              [1.1, 1.1, 0.9705, 1.3],
+              [1.3, 0.8, 0.96178, 1.1]]
+    
+    convergence = FieldConvergence()
+    convergence.add_grids([1., 2., 4.], values)
+    
+    assert convergence[0].classes.tolist() == [MONOTONIC,
+                                               OSCILLATORY,
+                                               DEGENERATE,
+                                               DIVERGENT]
+    assert convergence[0].status[2] == INVALID
+
+
+def test_memmap_convergence_classes(tmpdir, grids, grid_paths,
+                                    field_convergence):
+    
+    spacings, _ = grids
+    triplets = memmap_convergence(spacings, grid_paths, str(tmpdir))
+    
+    assert np.array_equal(triplets[0].classes, field_convergence[0].classes)
@@ -9,16 +9,94 @@ import pytest
 
 
 from convergence.functions import (order_of_convergence,
-                                   required_resolution)
+                                   richardson_extrapolate,
+                                   error_estimates,
+                                   gci,
+                                   asymptotic_ratio,
+                                   triplet_values,
+                                   required_resolution,
+                                   convergence_class,
+                                   MONOTONIC,
+                                   OSCILLATORY,
+                                   DIVERGENT,
+                                   DEGENERATE)
 
 
 def test_order_of_convergence_runtimeerror():
     
     with pytest.raises(RuntimeError):
-        order_of_convergence (0.9705, 0.96854, 0.96178, 2.0, 2.0,
+        order_of_convergence (0.9705, 0.96854, 0.96178, 2.0, 1.9,
                               tol=-1, max_iter=10)
 
 
+@pytest.mark.parametrize("method", ["fixed-point", "newton", "brent"])
+def test_order_of_convergence_method(method):
+    
+    p, iterations = order_of_convergence(1.0, 1.1, 1.3, 1.5, 1.8,
+                                         method=method,
+                                         full_output=True)
+    
+    assert abs(p - 0.6418) < 1e-3
+    assert 0 < iterations < 20
+
+
+@pytest.mark.parametrize("method", ["newton", "brent"])
+def test_order_of_convergence_method_converges(method):
+    
+    # The fixed-point iteration needs hundreds of iterations for this triplet
+    p_fixed, it_fixed = order_of_convergence(1.0, 1.113, 1.175, 1.5, 2.2,
+                                             full_output=True)
+    p, iterations = order_of_convergence(1.0, 1.113, 1.175, 1.5, 2.2,
+                                         method=method,
+                                         full_output=True)
+    
+    assert abs(p - p_fixed) < 1e-2
+    assert iterations < it_fixed / 10
+
+
+@pytest.mark.parametrize("method", ["fixed-point", "newton", "brent"])
+def test_order_of_convergence_large_p(method):
+    
+    # Powers of the refinement ratios overflow while bracketing the root
+    p = order_of_convergence(0.0, 1e-200, 1e38, 4.0, 3.0, method=method)
+    
+    assert abs(p - 498.825) < 1e-2
+
+
+@pytest.mark.parametrize("method", ["fixed-point", "newton", "brent"])
+def test_order_of_convergence_narrow_bracket(method):
+    
+    # Doubling from the initial guess steps over the root near p = 1.8
+    p = order_of_convergence(0.8411164905909305,
+                             1.1406903245153797,
+                             1.748798296977844,
+                             1.5325012439743684,
+                             2.7215179282543325,
+                             method=method)
+    
+    assert abs(p - 1.8046) < 1e-3
+
+
+@pytest.mark.parametrize("method", ["fixed-point", "newton", "brent"])
+def test_order_of_convergence_constant_ratio(method):
+    
+    p, iterations = order_of_convergence(0.9705, 0.96854, 0.96178, 2.0, 2.0,
+                                         method=method,
+                                         full_output=True)
+    
+    assert p == 1.7861695921669198
+    assert iterations == 0
+
+
+def test_order_of_convergence_bad_method():
+    
+    with pytest.raises(ValueError) as excinfo:
+        order_of_convergence(0.9705, 0.96854, 0.96178, 2.0, 2.0,
+                             method="mock")
+    
+    assert "Unrecognised value passed to method" in str(excinfo)
+
+
 def test_required_resolution():
     
     gci = 0.1
@@ -30,3 +108,36 @@ def test_required_resolution():
     expected = 2
     
     assert abs(test - expected) < 1e-10
+
+
+def test_triplet_values():
+    
+    values = (0.9705, 0.96854, 0.96178)
+    p = 1.7861695921669198
+    
+    fine, coarse, ratio = triplet_values(*values, 2.0, 2.0, p)
+    
+    for grid_one, grid_two, results in ((values[0], values[1], fine),
+                                        (values[1], values[2], coarse)):
+        
+        f_exact = richardson_extrapolate(grid_one, grid_two, 2.0, p)
+        e_a, e_ext = error_estimates(grid_one, grid_two, f_exact)
+        gci_f, gci_c = gci(2.0, e_a, p)
+        
+        assert results == (f_exact, e_a, e_ext, gci_f, gci_c)
+    
+    assert ratio == asymptotic_ratio(fine[3], coarse[3], 2.0, p)
+
+
+@pytest.mark.parametrize("values, expected", [
+                        ((0.9705, 0.96854, 0.96178), MONOTONIC),
+                        ((1.0, 1.1, 0.8), OSCILLATORY),
+                        ((1.0, 1.3, 1.1), DIVERGENT),
+                        ((1.0, 1.1, 1.15), DIVERGENT),
+                        ((1.0, 1.1, 1.1), DIVERGENT),
+                        ((0.9705, 0.9705, 0.96178), DEGENERATE),
+                        ((1.0, 1.0 + 1e-14, 1.1), DEGENERATE),
+                        ((0.0, 0.0, 0.0), DEGENERATE),
+                        ((1.0, float("nan"), 1.1), DEGENERATE)])
+def test_convergence_class(values, expected):
+    assert convergence_class(*values) == expected
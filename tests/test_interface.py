@@ -18,10 +18,21 @@
 #    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import warnings
 
 import pytest
 
-from convergence.interface import main, simple_read, Convergence
+import convergence.interface as convergence_module
+from convergence.interface import (main,
+                                   batch_main,
+                                   expand_paths,
+                                   cl_interface,
+                                   simple_read,
+                                   iter_grids,
+                                   simple_read_array,
+                                   wide_read,
+                                   Convergence)
+from convergence.diagnostics import Diagnostics
 
 THIS_DIR_PATH = os.path.dirname(__file__)
 DATA_DIR_PATH = os.path.join(THIS_DIR_PATH, "..", "data")
@@ -70,6 +81,237 @@ def test_main(tmpdir):
     main(in_path, out_path)
     
     assert os.path.isfile(out_path)
+    
+    convergence = Convergence()
+    convergence.add_grids(simple_read(in_path))
+    
+    with open(out_path) as f:
+        assert f.read() == str(convergence)
+
+
+@pytest.fixture
+def batch_paths(tmpdir):
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    
+    with open(in_path) as f:
+        text = f.read()
+    
+    paths = []
+    
+    for name in ("a.do", "b.do", "c.do"):
+        path = tmpdir.join(name)
+        path.write(text)
+        paths.append(str(path))
+    
+    return paths
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_batch_main_aggregate(tmpdir, batch_paths, jobs):
+    
+    out_path = str(tmpdir.join("test_batch.txt"))
+    single_path = str(tmpdir.join("test_single.txt"))
+    
+    batch_main(batch_paths, out_path, jobs=jobs)
+    main(batch_paths[0], single_path)
+    
+    with open(out_path) as f:
+        report = f.read()
+    
+    with open(single_path) as f:
+        single_report = f.read()
+    
+    expected = "".join("\n=== Input file: {} === \n{}".format(path,
+                                                           single_report)
+                                                for path in batch_paths)
+    
+    assert report == expected
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_batch_main_out_dir(tmpdir, batch_paths, jobs):
+    
+    out_dir = str(tmpdir.join("reports"))
+    
+    batch_main(batch_paths, out_dir=out_dir, jobs=jobs)
+    
+    assert sorted(os.listdir(out_dir)) == ["a_report.txt",
+                                           "b_report.txt",
+                                           "c_report.txt"]
+
+
+def test_batch_main_out_dir_clash(tmpdir, batch_paths):
+    
+    with pytest.raises(ValueError):
+        batch_main([batch_paths[0], batch_paths[0]],
+                   out_dir=str(tmpdir.join("reports")))
+
+
+def test_expand_paths(tmpdir, batch_paths):
+    
+    manifest = tmpdir.join("manifest.txt")
+    manifest.write("# Input files\nc.do\n\n[ab].do  # Glob\n")
+    
+    in_paths = expand_paths([os.path.join(str(tmpdir), "*.do")],
+                            str(manifest))
+    
+    assert in_paths == batch_paths + [batch_paths[2]] + batch_paths[:2]
+
+
+def test_expand_paths_no_match(tmpdir):
+    
+    with pytest.raises(ValueError):
+        expand_paths([os.path.join(str(tmpdir), "*.do")])
+
+
+def test_cl_interface_batch(mocker, tmpdir, batch_paths):
+    
+    out_path = str(tmpdir.join("test_cl.txt"))
+    pattern = os.path.join(str(tmpdir), "*.do")
+    
+    mocker.patch("sys.argv", ["grid-convergence", "-o", out_path, pattern])
+    cl_interface()
+    
+    with open(out_path) as f:
+        report = f.read()
+    
+    assert report.count("=== Input file:") == 3
+
+
+GRIDS_TEXT = """# Grid size   Quantity
+1.0 0.9705
+
+2.0 0.96854 extra 1  # Trailing columns are ignored
+   # Indented comment
+4.0 0.96178
+"""
+
+
+def test_simple_read():
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    main_list = simple_read(in_path)
+    
+    assert main_list == [[1.0, 0.9705], [2.0, 0.96854], [4.0, 0.96178]]
+
+
+def test_iter_grids():
+    
+    import io
+    
+    grids = iter_grids(io.StringIO(GRIDS_TEXT))
+    
+    assert next(grids) == (1.0, 0.9705)
+    assert list(grids) == [(2.0, 0.96854), (4.0, 0.96178)]
+
+
+def test_iter_grids_path(tmpdir):
+    
+    in_path = tmpdir.join("grids.do")
+    in_path.write(GRIDS_TEXT)
+    
+    assert list(iter_grids(str(in_path))) == [(1.0, 0.9705),
+                                              (2.0, 0.96854),
+                                              (4.0, 0.96178)]
+
+
+def test_iter_grids_missing_value():
+    
+    import io
+    
+    with pytest.raises(ValueError) as excinfo:
+        list(iter_grids(io.StringIO("1.0 0.9705\n2.0\n")))
+    
+    assert "Line 2" in str(excinfo)
+
+
+def test_iter_grids_bad_value():
+    
+    import io
+    
+    with pytest.raises(ValueError) as excinfo:
+        list(iter_grids(io.StringIO("1.0 0.9705\n2.0 O.96854\n")))
+    
+    assert "Line 2" in str(excinfo.value)
+    assert "'2.0 O.96854'" in str(excinfo.value)
+
+
+def test_simple_read_array():
+    
+    np = pytest.importorskip("numpy")
+    
+    import io
+    
+    grids = simple_read_array(io.StringIO("1.0 0.9705\n"
+                                          "2.0 0.96854 3.0 # Comment\n"
+                                          "\n"
+                                          "4.0 0.96178\n"))
+    
+    assert grids.shape == (3, 2)
+    assert np.array_equal(grids, [[1.0, 0.9705],
+                                  [2.0, 0.96854],
+                                  [4.0, 0.96178]])
+
+
+def test_wide_read():
+    
+    import io
+    
+    names, grids = wide_read(io.StringIO("# Comment\n"
+                                         "spacing drag lift\n"
+                                         "1.0 0.9705 0.5 # Comment\n"
+                                         "\n"
+                                         "2.0 0.96854 0.6\n"))
+    
+    assert names == ["drag", "lift"]
+    assert grids == [[1.0, 0.9705, 0.5], [2.0, 0.96854, 0.6]]
+
+
+def test_wide_read_bad_row():
+    
+    import io
+    
+    with pytest.raises(ValueError) as excinfo:
+        wide_read(io.StringIO("spacing drag lift\n1.0 0.9705\n"))
+    
+    assert "Line 2" in str(excinfo)
+
+
+@pytest.mark.parametrize("f_anal", [None, 1.0])
+def test_convergence_write_report(f_anal):
+    
+    import io
+    
+    # Enough grids for the labels of the triplets to sort out of order
+    grids = [(1. + 0.1 * i, 1. + 0.01 * (1. + 0.1 * i) ** 1.5)
+                                                    for i in range(25)]
+    
+    convergence = Convergence(met_name="metric", f_anal=f_anal)
+    convergence.add_grids(grids)
+    
+    report = io.StringIO()
+    convergence.write_report(report)
+    
+    assert report.getvalue() == str(convergence)
+
+
+def test_convergence_write_report_chunks(mocker):
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    convergence = Convergence()
+    convergence.add_grids(simple_read(in_path))
+    
+    fileobj = mocker.Mock()
+    convergence_module._write_lines(fileobj,
+                                    convergence._iter_report(),
+                                    chunk_size=10)
+    
+    chunks = [call[0][0] for call in fileobj.write.call_args_list]
+    
+    assert len(chunks) > 1
+    assert all(chunk.count("\n") <= 10 for chunk in chunks)
+    assert "".join(chunks) == str(convergence)
 
 
 def test_convergence_str(convergence):
@@ -293,6 +535,84 @@ def test_convergence_iter_bad_key(convergence):
         convergence["a"]
 
 
+def test_convergence_negative_index():
+    
+    grids = [(1.0, 0.9705),
+             (2.0, 0.96854),
+             (4.0, 0.96178),
+             (8.0, 0.9502)]
+    
+    convergence = Convergence()
+    convergence.add_grids(grids)
+    
+    assert convergence[-1] == convergence[1]
+    assert convergence[-2] == convergence[0]
+    
+    with pytest.raises(IndexError):
+        convergence[-3]
+
+
+def test_convergence_slice():
+    
+    grids = [(1.0, 0.9705),
+             (2.0, 0.96854),
+             (4.0, 0.96178),
+             (8.0, 0.9502),
+             (16.0, 0.93)]
+    
+    convergence = Convergence(lazy=True)
+    convergence.add_grids(grids)
+    
+    view = convergence[1:]
+    
+    assert len(view) == 2
+    assert convergence._grid_results == [None, None, None]
+    assert view[0].grids == '2 3 4'
+    assert view[-1] == convergence[2]
+    assert view[::-1][0] == convergence[2]
+    assert [x.grids for x in convergence[::2]] == ['1 2 3', '3 4 5']
+    
+    with pytest.raises(IndexError):
+        view[2]
+
+
+def test_convergence_no_p(mocker):
+    
+    mocker.patch('convergence.interface.order_of_convergence',
+                 side_effect=RuntimeError("mock"))
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    main_list = simple_read(in_path)
+    convergence = Convergence()
+    
+    with pytest.warns(UserWarning):
+        convergence.add_grids(main_list)
+    
+    assert vars(convergence[0].fine) == {"r21": 2.0, "r32": 2.0}
+    
+    with pytest.raises(AttributeError):
+        convergence[0].fine.p
+
+
+@pytest.mark.parametrize("fixture", ["convergence", "convergence_anal"])
+def test_grid_results_attributes(request, fixture):
+    
+    grid = request.getfixturevalue(fixture)[0].fine
+    attributes = vars(grid)
+    
+    assert ("f_analytic" in attributes) is (fixture == "convergence_anal")
+    
+    for name, value in attributes.items():
+        assert getattr(grid, name) == value
+    
+    with pytest.raises(AttributeError):
+        grid.not_a_result
+    
+    if fixture == "convergence":
+        with pytest.raises(AttributeError):
+            grid.f_analytic
+
+
 def test_get_shared_order_of_convergence_error(mocker):
     
     mocker.patch('convergence.interface.order_of_convergence',
@@ -307,7 +627,7 @@ def test_get_shared_order_of_convergence_error(mocker):
     with pytest.warns(UserWarning):
         convergence._get_shared()
     
-    assert convergence._grid_shared[0]["p"] is None
+    assert convergence._grid_results[0].p is None
 
 
 def test_get_fine_values_richardson_extrapolate_error(mocker):
@@ -325,8 +645,8 @@ def test_get_fine_values_richardson_extrapolate_error(mocker):
     with pytest.warns(UserWarning):
         convergence._get_fine_values()
     
-    assert convergence._grid_fine[0]["f_exact"] is None
-    assert convergence._grid_fine[0]["f_delta"] is None
+    assert convergence._grid_results[0].fine.f_exact is None
+    assert convergence._grid_results[0].fine.f_delta is None
 
 
 def test_get_fine_values_error_estimates_error(mocker):
@@ -344,8 +664,8 @@ def test_get_fine_values_error_estimates_error(mocker):
     with pytest.warns(UserWarning):
         convergence._get_fine_values()
     
-    assert convergence._grid_fine[0]["e_a"] is None
-    assert convergence._grid_fine[0]["e_anal"] is None
+    assert convergence._grid_results[0].fine.e_a is None
+    assert convergence._grid_results[0].fine.e_anal is None
 
 
 def test_get_fine_values_gci_error(mocker):
@@ -363,7 +683,7 @@ def test_get_fine_values_gci_error(mocker):
     with pytest.warns(UserWarning):
         convergence._get_fine_values()
     
-    assert convergence._grid_fine[0]["gci_f"] is None
+    assert convergence._grid_results[0].fine.gci_f is None
 
 
 def test_get_coarse_values_richardson_extrapolate_error(mocker):
@@ -381,8 +701,8 @@ def test_get_coarse_values_richardson_extrapolate_error(mocker):
     with pytest.warns(UserWarning):
         convergence._get_coarse_values()
     
-    assert convergence._grid_coarse[0]["f_exact"] is None
-    assert convergence._grid_coarse[0]["f_delta"] is None
+    assert convergence._grid_results[0].coarse.f_exact is None
+    assert convergence._grid_results[0].coarse.f_delta is None
 
 
 def test_get_coarse_values_error_estimates_error(mocker):
@@ -400,8 +720,8 @@ def test_get_coarse_values_error_estimates_error(mocker):
     with pytest.warns(UserWarning):
         convergence._get_coarse_values()
     
-    assert convergence._grid_coarse[0]["e_a"] is None
-    assert convergence._grid_coarse[0]["e_anal"] is None
+    assert convergence._grid_results[0].coarse.e_a is None
+    assert convergence._grid_results[0].coarse.e_anal is None
 
 
 def test_get_coarse_values_gci_error(mocker):
@@ -419,7 +739,7 @@ def test_get_coarse_values_gci_error(mocker):
     with pytest.warns(UserWarning):
         convergence._get_coarse_values()
     
-    assert convergence._grid_coarse[0]["gci_f"] is None
+    assert convergence._grid_results[0].coarse.gci_f is None
 
 
 @pytest.mark.parametrize("test_input",
@@ -442,7 +762,66 @@ def test_get_ratios_error(mocker, test_input):
         convergence._get_coarse_values()
         convergence._get_ratios()
     
-    assert convergence._grid_ratios[0]['assym_ratio'] is None
+    assert convergence._grid_results[0].assym_ratio is None
+
+
+@pytest.mark.parametrize("mode", ["aggregated", "silent"])
+def test_convergence_diagnostics(mocker, mode):
+    
+    mocker.patch('convergence.interface.gci',
+                 side_effect=ArithmeticError("mock"))
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    main_list = simple_read(in_path)
+    convergence = Convergence(diagnostics=mode)
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        convergence.add_grids(main_list)
+    
+    assert convergence.diagnostics.summary() == {"gci": 2,
+                                                 "missing_result": 1}
+    
+    if mode == "silent":
+        assert list(convergence.diagnostics) == []
+        return
+    
+    records = [(record.code, record.tripdex, record.stage)
+                                    for record in convergence.diagnostics]
+    
+    assert records == [("gci", 0, "fine"),
+                       ("gci", 0, "coarse"),
+                       ("missing_result", 0, "ratios")]
+
+
+@pytest.mark.parametrize("method", ["fixed-point", "newton", "brent"])
+def test_convergence_repeated_spacing(method):
+    
+    convergence = Convergence(method=method, diagnostics="aggregated")
+    convergence.add_grids([[1.0, 1.0], [2.0, 1.1], [2.0, 1.3]])
+    
+    # The refinement ratio of one is recorded as a failure of the triplet
+    assert vars(convergence[0].fine) == {"r21": 2.0, "r32": 1.0}
+    assert convergence.diagnostics.summary() == {"order_invalid": 1,
+                                                 "missing_result": 1}
+
+
+def test_convergence_diagnostics_order(mocker):
+    
+    mocker.patch('convergence.interface.order_of_convergence',
+                 side_effect=RuntimeError("mock"))
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    main_list = simple_read(in_path)
+    
+    diagnostics = Diagnostics("aggregated")
+    
+    for _ in range(2):
+        convergence = Convergence(diagnostics=diagnostics)
+        convergence.add_grids(main_list)
+    
+    assert diagnostics.summary() == {"order_diverged": 2,
+                                     "missing_result": 2}
 
 
 def test_convergence_gci_error(mocker):
@@ -532,6 +911,100 @@ def test_order_of_convergence_runtimeerror(mocker):
     assert str(convergence)
 
 
+@pytest.mark.parametrize("order", [[0, 1, 2, 3, 4, 5, 6],
+                                   [6, 5, 4, 3, 2, 1, 0],
+                                   [3, 0, 6, 1, 5, 2, 4]])
+def test_convergence_add_grids_incremental(order):
+    
+    grids = [(1.0, 0.9705),
+             (1.5, 0.9698),
+             (2.0, 0.96854),
+             (2.0, 0.00001),
+             (3.0, 0.9661),
+             (4.0, 0.96178),
+             (8.0, 0.9502)]
+    
+    convergence = Convergence(f_anal=0.9713)
+    convergence.add_grids([grids[i] for i in order])
+    
+    incremental = Convergence(f_anal=0.9713)
+    
+    with pytest.warns(UserWarning):
+        for i in order:
+            incremental.add_grids([grids[i]])
+    
+    assert len(incremental) == len(convergence) == 4
+    assert str(incremental) == str(convergence)
+    
+    for tripdex in range(len(convergence)):
+        assert incremental[tripdex] == convergence[tripdex]
+
+
+def test_convergence_add_grids_recomputes_affected(mocker):
+    
+    grids = [(1.0, 0.9705),
+             (2.0, 0.96854),
+             (4.0, 0.96178),
+             (8.0, 0.9502)]
+    
+    convergence = Convergence()
+    convergence.add_grids(grids)
+    
+    spy = mocker.spy(convergence, "_get_values")
+    convergence.add_grids([(16.0, 0.93)])
+    
+    # Only the new triplet is calculated, for fine and coarse grids
+    assert len(convergence) == 3
+    assert spy.call_count == 2
+
+
+def test_convergence_lazy(mocker):
+    
+    grids = [(1.0, 0.9705),
+             (2.0, 0.96854),
+             (4.0, 0.96178),
+             (8.0, 0.9502)]
+    
+    convergence = Convergence(f_anal=0.9713)
+    convergence.add_grids(grids)
+    
+    spy = mocker.spy(convergence_module, "order_of_convergence")
+    
+    lazy = Convergence(f_anal=0.9713, lazy=True)
+    lazy.add_grids(grids)
+    
+    assert len(lazy) == 2
+    assert spy.call_count == 0
+    
+    assert lazy[1] == convergence[1]
+    assert spy.call_count == 1
+    
+    assert lazy.get_resolution(0.001) == convergence.get_resolution(0.001)
+    assert spy.call_count == 2
+    
+    assert str(lazy) == str(convergence)
+    assert spy.call_count == 2
+
+
+def test_convergence_lazy_add_grids():
+    
+    grids = [(1.0, 0.9705),
+             (2.0, 0.96854),
+             (4.0, 0.96178),
+             (8.0, 0.9502)]
+    
+    convergence = Convergence()
+    convergence.add_grids(grids)
+    
+    lazy = Convergence(lazy=True)
+    lazy.add_grids(grids[1:])
+    lazy[0]
+    lazy.add_grids(grids[:1])
+    
+    assert lazy[0] == convergence[0]
+    assert lazy[1] == convergence[1]
+
+
 def test_convergence_name():
     
     in_path = os.path.join(DATA_DIR_PATH, "prD.do")
@@ -583,3 +1056,154 @@ def test_convergence_two_grids():
     assert len(lines) == 10
     assert lines[1] == "Number of grids to be examined = 2 "
     assert lines[-2] == " *** Insufficient grids for analysis *** "
+
+
+def test_convergence_to_numpy(convergence):
+    
+    np = pytest.importorskip("numpy")
+    
+    array = convergence.to_numpy()
+    
+    assert len(array) == len(convergence)
+    assert "fine_f_analytic" not in array.dtype.names
+    
+    for i, row in enumerate(array):
+        
+        results = convergence[i]
+        
+        assert (row["grid_1"], row["grid_2"], row["grid_3"]) == (i + 1,
+                                                                  i + 2,
+                                                                  i + 3)
+        assert [row["size_1"], row["size_2"], row["size_3"]] == results.sizes
+        assert [row["value_1"],
+                row["value_2"],
+                row["value_3"]] == results.values
+        assert row["p"] == results.fine.p
+        assert row["r21"] == results.fine.r21
+        assert row["asymptotic_ratio"] == results.asymptotic_ratio
+        assert row["fine_gci_fine"] == results.fine.gci_fine
+        assert row["coarse_f_exact"] == results.coarse.f_exact
+        assert row["coarse_e_extrap"] == results.coarse.e_extrap
+
+
+def test_convergence_to_numpy_anal(convergence_anal):
+    
+    np = pytest.importorskip("numpy")
+    
+    array = convergence_anal.to_numpy()
+    
+    assert array["fine_f_analytic"][0] == 0.9713
+    assert array["coarse_e_analytic"][0] == \
+                                    convergence_anal[0].coarse.e_analytic
+    assert array["fine_f_delta"][0] == convergence_anal[0].fine.f_delta
+
+
+def test_convergence_to_numpy_missing():
+    
+    np = pytest.importorskip("numpy")
+    
+    convergence = Convergence(diagnostics="silent", lazy=True)
+    convergence.add_grids([(1.0, 0.9705),
+                           (2.0, 0.9705),
+                           (4.0, 0.96178)])
+    
+    array = convergence.to_numpy()
+    
+    assert array["r21"][0] == 2.0
+    assert np.isnan(array["p"][0])
+    assert np.isnan(array["fine_gci_fine"][0])
+
+
+def test_convergence_to_numpy_no_triplets():
+    
+    np = pytest.importorskip("numpy")
+    
+    convergence = Convergence()
+    
+    with pytest.warns(UserWarning):
+        convergence.add_grids([(1, 0.5)])
+    
+    array = convergence.to_numpy()
+    
+    assert len(array) == 0
+    assert "p" in array.dtype.names
+
+
+def test_convergence_to_dataframe(convergence):
+    
+    pytest.importorskip("pandas")
+    
+    frame = convergence.to_dataframe()
+    
+    assert list(frame.columns) == list(convergence.to_numpy().dtype.names)
+    assert frame["fine_gci_fine"][0] == convergence[0].fine.gci_fine
+
+
+def test_convergence_get_distribution(convergence):
+    
+    np = pytest.importorskip("numpy")
+    
+    sketches = convergence.get_distribution(chunk_size=1)
+    
+    assert sorted(sketches) == ["gci_coarse", "gci_fine", "p"]
+    assert sketches["p"].count == len(convergence)
+    assert sketches["gci_fine"].max == convergence[0].fine.gci_fine
+
+
+def test_convergence_distribution_report():
+    
+    np = pytest.importorskip("numpy")
+    
+    grids = [(1.0, 0.9705),
+             (2.0, 0.96854),
+             (4.0, 0.96178),
+             (8.0, 0.94),
+             (16.0, 0.9)]
+    
+    convergence = Convergence(distribution=True)
+    convergence.add_grids(grids)
+    expected = Convergence()
+    expected.add_grids(grids)
+    
+    report = str(convergence)
+    lines = report.split("\n")
+    start = lines.index("Distribution over triplets for fine grids: ")
+    
+    assert report.startswith(str(expected))
+    assert lines[start + 2].split() == ["Statistic", "|",
+                                        "gci_coarse", "|",
+                                        "gci_fine", "|",
+                                        "p", "|"]
+    assert [line.split()[0] for line in lines[start + 4:start + 9]] == \
+                                        ["min", "p50", "p95", "p99", "max"]
+    assert lines[start + 8].split()[-2] == "%.6f" % max(
+                                        results.fine.p
+                                            for results in convergence)
+
+
+def test_convergence_get_classes():
+    
+    convergence = Convergence(diagnostics="silent")
+    convergence.add_grids([(1.0, 0.9705),
+                           (2.0, 0.96854),
+                           (4.0, 0.96178),
+                           (8.0, 0.97),
+                           (16.0, 0.9),
+                           (32.0, 0.9)])
+    
+    assert convergence.get_classes() == {"monotonic": 1,
+                                         "oscillatory": 2,
+                                         "divergent": 1,
+                                         "degenerate": 0}
+    assert convergence[0].convergence_class == "monotonic"
+    assert convergence[1].convergence_class == "oscillatory"
+
+
+def test_convergence_classes_report(convergence):
+    
+    lines = str(convergence).split("\n")
+    start = lines.index("Convergence classes: ")
+    
+    assert lines[start + 2].split() == ["Class", "|", "Triplets", "|"]
+    assert lines[start + 4].split() == ["monotonic", "|", "1", "|"]
+    assert lines[start + 7].split() == ["degenerate", "|", "0", "|"]
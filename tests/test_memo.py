@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from convergence.diagnostics import Diagnostics
+from convergence.interface import Convergence
+from convergence.memo import TripletMemo
+
+
+@pytest.fixture
+def grids():
+    return [(1.0, 0.9705), (2.0, 0.96854), (4.0, 0.96178), (8.0, 0.9500)]
+
+
+def test_TripletMemo_lookup():
+    
+    memo = TripletMemo()
+    calls = []
+    
+    def func(x):
+        calls.append(x)
+        return x * 2
+    
+    assert memo.lookup("a", func, 1) == 2
+    assert memo.lookup("a", func, 1) == 2
+    assert memo.lookup("b", func, 2) == 4
+    
+    assert calls == [1, 2]
+    assert memo.info() == {"hits": 1,
+                           "misses": 2,
+                           "maxsize": 4096,
+                           "currsize": 2}
+
+
+def test_TripletMemo_maxsize():
+    
+    memo = TripletMemo(maxsize=2)
+    
+    memo.lookup("a", str, 1)
+    memo.lookup("b", str, 2)
+    memo.lookup("a", str, 1)
+    memo.lookup("c", str, 3)
+    
+    assert len(memo) == 2
+    
+    # "b" was least recently used, so was removed
+    memo.lookup("a", str, 1)
+    memo.lookup("b", str, 2)
+    
+    assert memo.hits == 2
+    assert memo.misses == 4
+
+
+def test_TripletMemo_unbounded():
+    
+    memo = TripletMemo(maxsize=None)
+    
+    for i in range(5000):
+        memo.lookup(i, str, i)
+    
+    assert len(memo) == 5000
+    assert memo.info()["maxsize"] is None
+
+
+def test_TripletMemo_bad_maxsize():
+    
+    with pytest.raises(ValueError):
+        TripletMemo(maxsize=-1)
+
+
+def test_TripletMemo_clear():
+    
+    memo = TripletMemo()
+    memo.lookup("a", str, 1)
+    memo.lookup("a", str, 1)
+    memo.clear()
+    
+    assert memo.info() == {"hits": 0,
+                           "misses": 0,
+                           "maxsize": 4096,
+                           "currsize": 0}
+
+
+def test_Convergence_memo(grids):
+    
+    memo = TripletMemo()
+    
+    first = Convergence(memo=memo)
+    first.add_grids(grids)
+    
+    misses = memo.misses
+    
+    assert memo.hits == 0
+    assert misses == 6
+    
+    second = Convergence(memo=memo)
+    second.add_grids(grids)
+    
+    assert memo.hits == misses
+    assert memo.misses == misses
+    assert str(first) == str(second)
+
+
+def test_Convergence_memo_f_anal(grids):
+    
+    memo = TripletMemo()
+    
+    first = Convergence(memo=memo)
+    first.add_grids(grids)
+    second = Convergence(f_anal=0.97, memo=memo)
+    second.add_grids(grids)
+    expected = Convergence(f_anal=0.97)
+    expected.add_grids(grids)
+    
+    assert memo.hits == memo.misses
+    assert str(second) == str(expected)
+
+
+def test_Convergence_memo_diagnostics():
+    
+    memo = TripletMemo()
+    grids = [(1.0, 0.9705), (2.0, 0.9705), (4.0, 0.96178)]
+    
+    first = Convergence(diagnostics="aggregated", memo=memo)
+    first.add_grids(grids)
+    second = Convergence(diagnostics="aggregated", memo=memo)
+    second.add_grids(grids)
+    
+    assert memo.hits == 1
+    assert list(first.diagnostics) == list(second.diagnostics)
+    assert second.diagnostics.summary() == {"order_invalid": 1,
+                                            "missing_result": 1}
+
+
+def test_Convergence_memo_shared_diagnostics(grids):
+    
+    memo = TripletMemo()
+    diagnostics = Diagnostics("silent")
+    
+    for _ in range(2):
+        convergence = Convergence(diagnostics=diagnostics, memo=memo)
+        convergence.add_grids([(1.0, 0.9705),
+                               (2.0, 0.9705),
+                               (4.0, 0.96178)])
+    
+    assert len(diagnostics) == 4
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from convergence.fields import FieldConvergence
+from convergence.norms import FieldNorms
+
+
+@pytest.fixture(scope="module")
+def grids():
+    
+    rng = np.random.default_rng(11)
+    n_points = 200
+    
+    spacings = np.array([1.0, 1.5, 2.4, 4.0])
+    exact = rng.uniform(1, 2, n_points)
+    coeff = rng.uniform(-0.05, 0.05, n_points)
+    order = rng.uniform(1, 2, n_points)
+    values = exact + coeff * spacings[:, None] ** order
+    volumes = rng.uniform(0.5, 1.5, (len(spacings), n_points))
+    
+    return spacings, values, volumes
+
+
+@pytest.fixture(scope="module")
+def field_convergence(grids):
+    
+    spacings, values, _ = grids
+    convergence = FieldConvergence()
+    convergence.add_grids(spacings, values)
+    
+    return convergence
+
+
+def get_norms(values, weights):
+    
+    values = np.abs(values)
+    valid = np.isfinite(values)
+    values = values[valid]
+    weights = weights[valid]
+    
+    l1 = np.sum(weights * values) / weights.sum()
+    l2 = np.sqrt(np.sum(weights * values ** 2) / weights.sum())
+    
+    return l1, l2, values.max(), len(values)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 33, 200])
+@pytest.mark.parametrize("analysis", ["fine", "coarse"])
+@pytest.mark.parametrize("name", ["e_approx",
+                                  "e_extrap",
+                                  "gci_fine",
+                                  "gci_coarse"])
+def test_field_norms(grids, field_convergence, chunk_size, analysis, name):
+    
+    spacings, values, volumes = grids
+    
+    norms = FieldNorms(spacings)
+    
+    for start in range(0, values.shape[1], chunk_size):
+        stop = start + chunk_size
+        norms.add_chunk(values[:, start:stop], volumes[0, start:stop])
+    
+    assert len(norms) == len(field_convergence)
+    
+    for tripdex in range(len(norms)):
+        
+        field = getattr(getattr(field_convergence[tripdex], analysis), name)
+        l1, l2, linf, n_points = get_norms(field, volumes[0])
+        test = getattr(getattr(norms[tripdex], analysis), name)
+        
+        assert np.isclose(test.l1, l1, rtol=1e-10)
+        assert np.isclose(test.l2, l2, rtol=1e-10)
+        assert test.linf == linf
+        assert test.n_points == n_points
+
+
+def test_field_norms_grid_volumes(grids, field_convergence):
+    
+    spacings, values, volumes = grids
+    
+    # Volumes are given in the order of the grid spacings
+    norms = FieldNorms(spacings[::-1])
+    norms.add_chunk(values[::-1], volumes[::-1])
+    
+    fine = field_convergence[1].fine.gci_fine
+    coarse = field_convergence[1].coarse.gci_fine
+    
+    assert np.isclose(norms[1].fine.gci_fine.l2,
+                      get_norms(fine, volumes[1])[1])
+    assert np.isclose(norms[1].coarse.gci_fine.l2,
+                      get_norms(coarse, volumes[2])[1])
+
+
+def test_field_norms_asymptotic_fraction(grids, field_convergence):
+    
+    spacings, values, _ = grids
+    
+    norms = FieldNorms(spacings, asymptotic_tol=0.01)
+    norms.add_chunk(values)
+    
+    for tripdex in range(len(norms)):
+        
+        ratio = field_convergence[tripdex].asymptotic_ratio
+        
+        with np.errstate(invalid="ignore"):
+            expected = np.mean(np.abs(ratio - 1) <= 0.01)
+        
+        assert norms[tripdex].asymptotic_fraction == expected
+        assert norms[tripdex].n_points == values.shape[1]
+
+
+def test_field_norms_merge(grids):
+    
+    spacings, values, volumes = grids
+    
+    norms = FieldNorms(spacings)
+    norms.add_chunk(values, volumes[0])
+    
+    first = FieldNorms(spacings)
+    first.add_chunk(values[:, :50], volumes[0, :50])
+    second = FieldNorms(spacings)
+    second.add_chunk(values[:, 50:], volumes[0, 50:])
+    first.merge(second)
+    
+    assert first[0].fine.gci_fine.linf == norms[0].fine.gci_fine.linf
+    assert np.isclose(first[0].fine.gci_fine.l2, norms[0].fine.gci_fine.l2)
+    assert first[0].asymptotic_fraction == norms[0].asymptotic_fraction
+
+
+def test_field_norms_merge_bad_grids(grids):
+    
+    spacings, _, _ = grids
+    
+    with pytest.raises(ValueError):
+        FieldNorms(spacings).merge(FieldNorms(spacings * 2))
+
+
+def test_field_norms_invalid_points():
+    
+    norms = FieldNorms([1., 2., 4.])
+    norms.add_chunk([[1.0, 1.0, 0.0],
+                     [1.1, 1.0, 0.1],
+                     [1.3, 1.2, 0.3]])
+    
+    assert norms[0].fine.gci_fine.n_points == 1
+    assert norms[0].n_points == 3
+
+
+def test_field_norms_no_points():
+    
+    norms = FieldNorms([1., 2., 4.])
+    
+    assert np.isnan(norms[0].fine.gci_fine.l2)
+    assert np.isnan(norms[0].asymptotic_fraction)
+
+
+def test_field_norms_bad_values():
+    
+    norms = FieldNorms([1., 2., 4.])
+    
+    with pytest.raises(ValueError):
+        norms.add_chunk(np.ones((2, 4)))
+    
+    with pytest.raises(ValueError):
+        norms.add_chunk(np.ones((3, 4)), np.ones(3))
+
+
+def test_field_norms_bad_key():
+    
+    norms = FieldNorms([1., 2., 4.])
+    
+    with pytest.raises(IndexError):
+        norms[1]
+    
+    with pytest.raises(TypeError):
+        norms["a"]
+
+
+def test_field_norms_distribution(grids, field_convergence):
+    
+    spacings, values, _ = grids
+    
+    norms = FieldNorms(spacings, distribution=True)
+    norms.add_chunk(values[:, :50])
+    
+    other = FieldNorms(spacings, distribution=True)
+    other.add_chunk(values[:, 50:])
+    norms.merge(other)
+    
+    for tripdex in range(len(norms)):
+        
+        distribution = norms[tripdex].distribution
+        fine = field_convergence[tripdex].fine
+        
+        assert distribution.p.count == np.isfinite(fine.p).sum()
+        assert distribution.p.max == np.nanmax(fine.p)
+        assert distribution.gci_fine.min == np.nanmin(fine.gci_fine)
+        gci_coarse = fine.gci_coarse[np.isfinite(fine.gci_coarse)]
+        median = distribution.gci_coarse.quantile(0.5)
+        
+        assert abs(np.mean(gci_coarse <= median) - 0.5) < 0.02
+
+
+def test_field_norms_no_distribution(grids):
+    
+    spacings, values, _ = grids
+    
+    norms = FieldNorms(spacings)
+    norms.add_chunk(values)
+    
+    assert not hasattr(norms[0], "distribution")
+    
+    with pytest.raises(ValueError):
+        norms.merge(FieldNorms(spacings, distribution=True))
+
+
+def test_field_norms_class_counts(grids, field_convergence):
+    
+    spacings, values, _ = grids
+    
+    norms = FieldNorms(spacings)
+    norms.add_chunk(values[:, :50])
+    other = FieldNorms(spacings)
+    other.add_chunk(values[:, 50:])
+    norms.merge(other)
+    
+    for tripdex in range(len(norms)):
+        
+        classes = field_convergence[tripdex].classes
+        counts = norms[tripdex].class_counts
+        
+        assert list(counts) == ["monotonic",
+                                "oscillatory",
+                                "divergent",
+                                "degenerate"]
+        assert sum(counts.values()) == values.shape[1]
+        assert counts["oscillatory"] == np.count_nonzero(classes == 1)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import importlib
+import subprocess
+import sys
+
+import pytest
+
+import convergence
+
+
+def test_import_is_lazy():
+    
+    code = ("import sys; import convergence; "
+            "print('convergence.interface' in sys.modules, "
+            "'argparse' in sys.modules)")
+    
+    result = subprocess.run([sys.executable, "-c", code],
+                            check=True,
+                            stdout=subprocess.PIPE,
+                            universal_newlines=True)
+    
+    assert result.stdout.split() == ["False", "False"]
+
+
+@pytest.mark.parametrize("name", convergence.__all__)
+def test_lazy_names(name):
+    
+    from convergence import interface
+    
+    assert getattr(convergence, name) is getattr(interface, name)
+    assert name in dir(convergence)
+
+
+@pytest.mark.parametrize("name", ["cache", "functions", "reports"])
+def test_lazy_submodule(name):
+    
+    module = importlib.import_module("convergence." + name)
+    
+    assert getattr(convergence, name) is module
+    assert name in dir(convergence)
+
+
+def test_missing_name():
+    
+    with pytest.raises(AttributeError):
+        convergence.not_a_name
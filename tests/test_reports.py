@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import io
+import os
+import warnings
+
+import pytest
+
+from convergence.interface import batch_main, simple_read, Convergence
+from convergence.reports import read_report, merge_reports
+
+THIS_DIR_PATH = os.path.dirname(__file__)
+DATA_DIR_PATH = os.path.join(THIS_DIR_PATH, "..", "data")
+
+
+def make_grids(n_grids):
+    
+    # Values are rounded to the precision of the report
+    spacings = [round(1. + 0.1 * i, 6) for i in range(n_grids)]
+    
+    return [(spacing, round(1. + 0.01 * spacing ** 1.5, 6))
+                                                    for spacing in spacings]
+
+
+@pytest.mark.parametrize("n_grids", [0, 2, 3, 25])
+@pytest.mark.parametrize("f_anal", [None, 1.0])
+@pytest.mark.parametrize("met_name", [None, "metric"])
+def test_read_report_roundtrip(n_grids, f_anal, met_name):
+    
+    convergence = Convergence(met_name=met_name, f_anal=f_anal)
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        convergence.add_grids(make_grids(n_grids))
+    
+    reports = read_report(io.StringIO(str(convergence)))
+    
+    assert len(reports) == 1
+    assert reports[0].met_name == met_name
+    assert reports[0].grids == make_grids(n_grids)
+    assert str(reports[0]) == str(convergence)
+
+
+def test_read_report_values():
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    convergence = Convergence()
+    convergence.add_grids(simple_read(in_path))
+    
+    report = read_report(io.StringIO(str(convergence)))[0]
+    record = next(report.fine.iter_records())
+    
+    assert record.data_point == "1 2 3"
+    assert dict(record.col_pairs)["p"] == round(convergence[0].fine.p, 6)
+
+
+def test_read_report_distribution():
+    
+    pytest.importorskip("numpy")
+    
+    grids = make_grids(5)
+    
+    convergence = Convergence(met_name="metric", distribution=True)
+    convergence.add_grids(grids)
+    
+    report = read_report(io.StringIO(str(convergence)))[0]
+    
+    assert len(report.distribution) == 5
+    assert str(report) == str(convergence)
+    
+    # The distribution of the merged triplets is unknown
+    other = Convergence(met_name="metric")
+    other.add_grids(grids)
+    
+    report.merge(read_report(io.StringIO(str(convergence)))[0])
+    
+    assert not len(report.distribution)
+    assert str(report) == str(other)
+
+
+def test_read_report_batch(tmpdir):
+    
+    in_path = os.path.join(DATA_DIR_PATH, "prD.do")
+    out_path = str(tmpdir.join("batch.txt"))
+    
+    batch_main([in_path, in_path], out_path)
+    
+    reports = read_report(out_path)
+    
+    assert len(reports) == 2
+    assert [report.input_path for report in reports] == [in_path, in_path]
+
+
+def test_merge_reports():
+    
+    grids = make_grids(6)
+    
+    convergence = Convergence(met_name="metric")
+    convergence.add_grids(grids[:4])
+    
+    analytic = Convergence(met_name="metric", f_anal=1.0)
+    analytic.add_grids(grids)
+    
+    other = Convergence(met_name="other")
+    other.add_grids(grids)
+    
+    merged = merge_reports(read_report(io.StringIO(str(convergence))),
+                           read_report(io.StringIO(str(analytic) + "\n" +
+                                                   str(other))))
+    
+    assert [report.met_name for report in merged] == ["metric", "other"]
+    assert str(merged[0]) == str(analytic)
+    assert str(merged[1]) == str(other)
+
+
+def test_merge_reports_batch(tmpdir):
+    
+    in_paths = []
+    
+    # The input files have different grids and unnamed metrics
+    for name, grids in (("a.do", make_grids(3)), ("b.do", make_grids(5))):
+        in_path = tmpdir.join(name)
+        in_path.write("\n".join("{} {}".format(*grid) for grid in grids))
+        in_paths.append(str(in_path))
+    
+    first_path = str(tmpdir.join("first.txt"))
+    second_path = str(tmpdir.join("second.txt"))
+    
+    batch_main(in_paths, first_path)
+    batch_main(in_paths, second_path, analytical=1.0)
+    
+    merged = merge_reports(read_report(first_path), read_report(second_path))
+    second = read_report(second_path)
+    
+    assert [report.input_path for report in merged] == in_paths
+    assert [str(report) for report in merged] == \
+                                        [str(report) for report in second]
+
+
+def test_merge_reports_classes():
+    
+    grids = make_grids(4)
+    grids[-1] = (grids[-1][0], 2.)
+    
+    first = Convergence(met_name="metric")
+    first.add_grids(grids[:3])
+    
+    second = Convergence(met_name="metric")
+    second.add_grids(grids)
+    
+    # The counts cover the triplets of both reports, whichever is merged in
+    for left, right in ((first, second), (second, first)):
+        
+        report = read_report(io.StringIO(str(left)))[0]
+        report.merge(read_report(io.StringIO(str(right)))[0])
+        
+        assert str(report) == str(second)
+        assert sum(report.classes._columns["Triplets"]) == 2
+
+
+def test_merge_reports_conflicting_grids():
+    
+    grids = make_grids(6)
+    
+    # The grids overlap, but the triplet labels refer to different grids
+    first = Convergence(met_name="metric")
+    first.add_grids(grids[:4])
+    
+    second = Convergence(met_name="metric")
+    second.add_grids(grids[1:5])
+    
+    report = read_report(io.StringIO(str(first)))[0]
+    expected = str(report)
+    
+    with pytest.raises(ValueError) as excinfo:
+        report.merge(read_report(io.StringIO(str(second)))[0])
+    
+    assert "metric" in str(excinfo.value)
+    assert str(report) == expected
+
+
+def test_merge_keeps_existing_values():
+    
+    grids = make_grids(4)
+    
+    convergence = Convergence(met_name="metric")
+    convergence.add_grids(grids)
+    
+    report = read_report(io.StringIO(str(convergence)))[0]
+    empty = read_report(io.StringIO(str(convergence)))[0]
+    
+    # Blank values in the merged report do not replace existing values
+    for table in (empty.fine, empty.coarse, empty.ratios):
+        for column in table._columns.values():
+            column[:] = [None] * len(column)
+    
+    report.merge(empty)
+    
+    assert str(report) == str(convergence)
+
+
+def test_table_read_bad_row():
+    
+    from convergence.tables import Table
+    
+    lines = ['       Grids |            a | ',
+             ' ========================== ',
+             '       1 2 3 |     1.000000 |     2.000000 | ',
+             ' -------------------------- ',
+             '']
+    
+    with pytest.raises(ValueError):
+        Table().read(lines)
+
+
+def test_read_report_no_classes():
+    
+    convergence = Convergence()
+    convergence.add_grids(make_grids(4))
+    
+    # Reports written before the classes were added end at the ratios
+    lines = str(convergence).split("\n")
+    text = "\n".join(lines[:lines.index("Convergence classes: ") - 1])
+    
+    report = read_report(io.StringIO(text))[0]
+    
+    assert not len(report.classes)
+    assert str(report) == text
+    
+    report.merge(read_report(io.StringIO(str(convergence)))[0])
+    
+    assert str(report) == str(convergence)
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import io
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from convergence.interface import main, wide_read, Convergence
+from convergence.sets import ConvergenceSet
+
+WIDE_TEXT = """# A wide file
+spacing  drag   lift   moment
+1.0      0.9705 0.5    0.0
+2.0      0.9685 0.6    0.0
+4.0      0.9618 0.7    1.0
+8.0      0.9480 0.75   1.1
+16.0     0.9200 0.9    1.5
+"""
+
+
+@pytest.fixture
+def wide_grids():
+    return wide_read(io.StringIO(WIDE_TEXT))
+
+
+@pytest.fixture
+def convergence_set(wide_grids):
+    
+    names, grids = wide_grids
+    
+    convergence_set = ConvergenceSet(names, f_anal=1.0)
+    convergence_set.add_grids(grids)
+    
+    return convergence_set
+
+
+def test_convergence_set_names(convergence_set):
+    
+    assert len(convergence_set) == 3
+    assert list(convergence_set) == ["drag", "lift", "moment"]
+
+
+@pytest.mark.parametrize("column, name", [(1, "drag"),
+                                          (2, "lift"),
+                                          (3, "moment")])
+def test_convergence_set_matches_convergence(wide_grids,
+                                             convergence_set,
+                                             column,
+                                             name):
+    
+    _, grids = wide_grids
+    
+    convergence = Convergence(met_name=name, f_anal=1.0)
+    convergence.add_grids([(grid[0], grid[column]) for grid in grids])
+    
+    metric = convergence_set[name]
+    
+    assert len(metric) == len(convergence)
+    assert str(metric) == str(convergence)
+    
+    for expected, result in zip(convergence, metric):
+        
+        assert result.grids == expected.grids
+        
+        for key, value in vars(expected.fine).items():
+            if value is None:
+                assert getattr(result.fine, key) is None
+            else:
+                assert getattr(result.fine, key) == pytest.approx(value)
+
+
+def test_convergence_set_str(convergence_set):
+    
+    report = str(convergence_set)
+    
+    for name in convergence_set:
+        assert name in report
+        assert str(convergence_set[name]) in report
+
+
+def test_convergence_set_write_report(convergence_set):
+    
+    report = io.StringIO()
+    convergence_set.write_report(report)
+    
+    assert report.getvalue() == str(convergence_set)
+
+
+def test_convergence_set_add_grids_incremental(wide_grids):
+    
+    names, grids = wide_grids
+    
+    convergence_set = ConvergenceSet(names)
+    convergence_set.add_grids(grids[::2])
+    convergence_set.add_grids(grids[1::2])
+    
+    expected = ConvergenceSet(names)
+    expected.add_grids(grids)
+    
+    assert str(convergence_set) == str(expected)
+
+
+def test_convergence_set_add_grids_bad_row():
+    
+    convergence_set = ConvergenceSet(["drag", "lift"])
+    
+    with pytest.raises(ValueError):
+        convergence_set.add_grids([[1.0, 0.9705]])
+
+
+def test_convergence_set_insufficient_grids():
+    
+    convergence_set = ConvergenceSet(["drag", "lift"])
+    
+    with pytest.warns(UserWarning) as record:
+        convergence_set.add_grids([[1.0, 0.9705, 0.5]])
+    
+    assert len(record) == 1
+
+
+def test_main_wide(tmpdir):
+    
+    in_path = tmpdir.join("wide.do")
+    in_path.write(WIDE_TEXT)
+    out_path = str(tmpdir.join("test_main_wide.txt"))
+    
+    main(str(in_path), out_path, wide=True)
+    
+    assert os.path.isfile(out_path)
+    
+    with open(out_path) as f:
+        report = f.read()
+    
+    assert report.count("--- Examining metric:") == 3
+
+
+def test_convergence_set_diagnostics():
+    
+    from convergence.diagnostics import Diagnostics
+    
+    grids = [[1.0, 0.9705, 0.5],
+             [2.0, 0.9705, 0.6],
+             [4.0, 0.9618, 0.7]]
+    
+    diagnostics = Diagnostics("aggregated")
+    
+    convergence_set = ConvergenceSet(["drag", "lift"],
+                                     diagnostics=diagnostics)
+    convergence_set.add_grids(grids)
+    
+    expected = Diagnostics("aggregated")
+    
+    for column in (1, 2):
+        convergence = Convergence(diagnostics=expected)
+        convergence.add_grids([(grid[0], grid[column]) for grid in grids])
+    
+    assert convergence_set["drag"].diagnostics is diagnostics
+    assert diagnostics.summary() == expected.summary()
+    assert [tuple(record[:3]) for record in diagnostics] == [
+                                    tuple(record[:3]) for record in expected]
+    assert diagnostics.summary() == {"order_invalid": 1,
+                                     "extrapolation": 2,
+                                     "missing_result": 2}
+
+
+def test_convergence_set_matches_convergence_degenerate():
+    
+    grids = [(1.0, 1.0), (2.0, 1.0 + 5e-13), (4.0, 1.0 + 1e-3)]
+    
+    convergence = Convergence(met_name="value", diagnostics="aggregated")
+    convergence.add_grids(grids)
+    
+    convergence_set = ConvergenceSet(["value"], diagnostics="aggregated")
+    convergence_set.add_grids([list(grid) for grid in grids])
+    metric = convergence_set["value"]
+    
+    assert "p" not in vars(convergence[0].fine)
+    assert vars(metric[0].fine) == vars(convergence[0].fine)
+    assert str(metric) == str(convergence)
+    assert metric.diagnostics.summary() == convergence.diagnostics.summary()
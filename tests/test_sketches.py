@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import pickle
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from convergence.sketches import QuantileSketch
+
+
+@pytest.fixture(scope="module")
+def values():
+    rng = np.random.default_rng(3)
+    return rng.lognormal(0, 1, 200000)
+
+
+def get_rank_errors(sketch, values, quantiles):
+    
+    ordered = np.sort(values)
+    estimates = sketch.quantile(quantiles)
+    ranks = np.searchsorted(ordered, estimates) / len(ordered)
+    
+    return np.abs(ranks - quantiles)
+
+
+@pytest.mark.parametrize("n_chunks", [1, 7, 100])
+def test_quantile_sketch(values, n_chunks):
+    
+    sketch = QuantileSketch()
+    
+    for chunk in np.array_split(values, n_chunks):
+        sketch.add(chunk)
+    
+    quantiles = np.array([0.01, 0.5, 0.95, 0.99, 0.999])
+    
+    assert sketch.count == len(values)
+    assert sketch.min == values.min()
+    assert sketch.max == values.max()
+    assert (get_rank_errors(sketch, values, quantiles) < 1e-3).all()
+    assert sketch.quantile(0.) == values.min()
+    assert sketch.quantile(1.) == values.max()
+
+
+def test_quantile_sketch_bounded(values):
+    
+    sketch = QuantileSketch(compression=100)
+    sketch.add(values)
+    sketch.quantile(0.5)
+    
+    assert len(sketch._means) <= 100
+
+
+def test_quantile_sketch_merge(values):
+    
+    sketches = []
+    
+    for chunk in np.array_split(values, 8):
+        sketch = QuantileSketch()
+        sketch.add(chunk)
+        sketches.append(pickle.loads(pickle.dumps(sketch)))
+    
+    merged = sketches[0]
+    for sketch in sketches[1:]: merged.merge(sketch)
+    
+    quantiles = np.array([0.5, 0.95, 0.99])
+    
+    assert merged.count == len(values)
+    assert merged.max == values.max()
+    assert (get_rank_errors(merged, values, quantiles) < 1e-3).all()
+
+
+def test_quantile_sketch_merge_empty():
+    
+    sketch = QuantileSketch()
+    sketch.add([1., 2.])
+    sketch.merge(QuantileSketch())
+    
+    assert sketch.count == 2
+
+
+def test_quantile_sketch_non_finite():
+    
+    sketch = QuantileSketch()
+    sketch.add([np.nan, 1., np.inf, 3.])
+    
+    assert sketch.count == 2
+    assert sketch.quantile(0.5) == 2.
+
+
+def test_quantile_sketch_empty():
+    
+    sketch = QuantileSketch()
+    
+    assert np.isnan(sketch.quantile(0.5))
+    assert np.isnan(sketch.quantile([0.5, 0.9])).all()
+    assert sketch.summary() == [("min", None),
+                                ("p50", None),
+                                ("p95", None),
+                                ("p99", None),
+                                ("max", None)]
+
+
+def test_quantile_sketch_summary():
+    
+    sketch = QuantileSketch()
+    sketch.add(np.arange(101.))
+    
+    summary = dict(sketch.summary())
+    
+    assert summary["min"] == 0.
+    assert summary["max"] == 100.
+    assert np.isclose(summary["p50"], 50.)
+    assert np.isclose(summary["p95"], 95., atol=0.5)
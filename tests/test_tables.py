@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2017-2020 Mathew Topper
+#
+# This file is part of convergence.
+#
+#    convergence is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    convergence is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with convergence.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from convergence.tables import Record, Table
+
+
+def test_record_add_values():
+    
+    record = Record(["a", "b", "c"], [1.0, 2.0], "1 2 3")
+    
+    assert record.col_pairs == [("a", 1.0), ("b", 2.0), ("c", None)]
+
+
+def test_record_add_values_too_many():
+    
+    with pytest.raises(ValueError):
+        Record(["a"], [1.0, 2.0])
+
+
+def test_record_update_byrecord():
+    
+    record = Record(["a", "b"], [1.0, 2.0])
+    record.update_byrecord(Record(["c", "a"], [3.0, 4.0]))
+    
+    assert record.col_pairs == [("a", 4.0), ("b", 2.0), ("c", 3.0)]
+
+
+def test_table_write():
+    
+    table = Table('Grids')
+    table.add_record(Record(['b', 'a'], [2.0, 1.0], '2 3 4'))
+    table.add_record(Record(['a', 'c'], [0.5], '1 2 3'))
+    table.add_record(Record(['c'], [3.0], '2 3 4'))
+    
+    expected = ['   Grids |        a |        b | ',
+                ' =============================== ',
+                '   1 2 3 |    0.500 |          | ',
+                '   2 3 4 |    1.000 |    2.000 | ',
+                ' ------------------------------- ',
+                '',
+                '   Grids |        c | ',
+                ' ==================== ',
+                '   1 2 3 |          | ',
+                '   2 3 4 |    3.000 | ',
+                ' -------------------- ',
+                '']
+    
+    assert table.write(col_width=8, dec_places=3, tab_width=40) == expected
+
+
+def test_table_write_unsorted():
+    
+    table = Table('Grids')
+    table.add_record(Record(['a'], [2.0], '2 3 4'))
+    table.add_record(Record(['a'], [1.0], '1 2 3'))
+    
+    result = table.write(col_width=8, dec_places=3, row_sort=False)
+    
+    assert result[2:4] == ['   2 3 4 |    2.000 | ',
+                           '   1 2 3 |    1.000 | ']
+
+
+def test_table_write_empty():
+    assert Table('Grids').write() == []
+
+
+def test_table_column_read():
+    
+    table = Table('Grids')
+    table.add_record(Record(['b', 'a'], [2.0, 1.0], '2 3 4'))
+    table.add_record(Record(['a'], [0.5], '1 2 3'))
+    
+    col_names, col_list = Table().column_read(table.write(col_width=8,
+                                                          dec_places=3))
+    
+    assert col_names == ['Grids', 'a', 'b']
+    assert col_list == [['1 2 3', '2 3 4'], [0.5, 1.0], [None, 2.0]]
+
+
+def test_table_read_merge():
+    
+    table = Table('Grids')
+    table.add_record(Record(['b', 'a'], [2.0, 1.0], '2 3 4'))
+    table.add_record(Record(['a', 'c'], [0.5], '1 2 3'))
+    table.add_record(Record(['c'], [3.0], '2 3 4'))
+    
+    lines = table.write(col_width=8, dec_places=3, tab_width=40)
+    
+    read_table = Table()
+    
+    assert read_table.read(lines) == len(lines)
+    assert read_table.row_type == 'Grids'
+    assert read_table.write(col_width=8, dec_places=3, tab_width=40) == lines
+    
+    other = Table('Grids')
+    other.add_record(Record(['a', 'd'], [4.0, 5.0], '3 4 5'))
+    other.add_record(Record(['a'], [6.0], '1 2 3'))
+    
+    read_table.merge(other)
+    
+    records = {record.data_point: dict(record.col_pairs)
+                                    for record in read_table.iter_records()}
+    
+    assert records == {'1 2 3': {'a': 6.0},
+                       '2 3 4': {'a': 1.0, 'b': 2.0, 'c': 3.0},
+                       '3 4 5': {'a': 4.0, 'd': 5.0}}